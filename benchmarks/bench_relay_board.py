@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""bench_relay_board.py module: benchmarks against emulated relay-boards (Linux/macOS)."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# run from a source checkout without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from relay_board_py.relay_board import RelayBoard  # noqa: E402
+from relay_board_py.relay_board_emulator import RelayBoardEmulator  # noqa: E402
+from relay_board_py.relay_board_pattern import RelayBoardPattern  # noqa: E402
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Call function repeat times, return min/median/mean/max duration in seconds."""
+    durations: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {"min": min(durations), "median": statistics.median(durations),
+            "mean": statistics.mean(durations), "max": max(durations)}
+
+
+def bench_request(emulators: List[RelayBoardEmulator], repeat: int) -> Dict[str, Any]:
+    """Request round trips per second on one relay-board."""
+    relay_board = RelayBoard(emulators[0].serial_number)
+    relay_board.open()
+    results: Dict[str, Any] = {}
+    for header, payload in [("GET", ""), ("SET", "1-C,2-O"), ("FW", "")]:
+        duration = measure(lambda: relay_board.request(header, payload), repeat)
+        results[header] = {"round_trips_per_second": 1.0 / duration["mean"], **duration}
+    duration = measure(lambda: relay_board.write_relay_state(
+        {"open": "all", "close": [1, 2, 3]}), repeat)
+    results["write_relay_state"] = duration
+    duration = measure(relay_board.read_info, repeat)
+    results["read_info"] = duration
+    relay_board.close()
+    return results
+
+
+def bench_open_reset(emulators: List[RelayBoardEmulator], repeat: int) -> Dict[str, Any]:
+    """Cost of creating, opening, resetting and closing a relay-board."""
+    serial_number = emulators[0].serial_number
+    results: Dict[str, Any] = {}
+    results["create"] = measure(lambda: RelayBoard(serial_number), repeat)
+    relay_board = RelayBoard(serial_number)
+
+    def open_close() -> None:
+        relay_board.open()
+        relay_board.close()
+
+    results["open_close"] = measure(open_close, repeat)
+    relay_board.open()
+    results["reset"] = measure(relay_board.reset, repeat)
+    relay_board.close()
+    return results
+
+
+def bench_pattern(emulators: List[RelayBoardEmulator], repeat: int) -> Dict[str, Any]:
+    """Pattern execution time against the number of relay-boards."""
+    results: Dict[str, Any] = {}
+    board_count = 1
+    while (board_count <= len(emulators)):
+        aliases = {f"A{i}": emulators[i].serial_number for i in range(board_count)}
+        patterns = {"P": {alias: {"open": "all", "close": [1, 3, 5]} for alias in aliases}}
+        relay_board_pattern = RelayBoardPattern(aliases, patterns)
+        results[str(board_count)] = {}
+        for jobs in sorted(set([1, board_count])):
+            results[str(board_count)][f"jobs_{jobs}"] = measure(
+                lambda: RelayBoard.raise_for_results(
+                    RelayBoard.run_pattern(relay_board_pattern, "P", jobs=jobs)), repeat)
+        board_count *= 2
+    return results
+
+
+def bench_cli(emulators: List[RelayBoardEmulator], repeat: int) -> Dict[str, Any]:
+    """Startup time of the command line interface (new interpreter each time).
+
+    "switch" is a complete relay switch addressed by port (no enumeration, no daemon).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    results: Dict[str, Any] = {}
+    results["python"] = measure(lambda: subprocess.run(
+        [sys.executable, "-c", "pass"], env=env, check=True), repeat)
+    results["import"] = measure(lambda: subprocess.run(
+        [sys.executable, "-c", "import relay_board_py.relay_board"], env=env, check=True), repeat)
+    results["help"] = measure(lambda: subprocess.run(
+        [sys.executable, "-m", "relay_board_py", "-h"], env=env, check=True,
+        stdout=subprocess.DEVNULL), repeat)
+    results["switch"] = measure(lambda: subprocess.run(
+        [sys.executable, "-m", "relay_board_py", "--no-daemon", "-s", emulators[0].serial_number,
+         "-P", emulators[0].port, "-c", "1"], env=env, check=True), repeat)  # type: ignore
+    return results
+
+
+def main(args_list: List[str]) -> None:
+    """Run the selected benchmarks and print (or write) the results as json."""
+    benchmarks = ["request", "open_reset", "pattern", "cli"]
+    parser = argparse.ArgumentParser(prog="bench_relay_board.py",
+                                     description="Benchmark relay_board_py against emulators")
+    parser.add_argument('-b', '--benchmark', action='append', choices=benchmarks,
+                        help="Benchmark to run (default: all)")
+    parser.add_argument('-n', '--boards', type=int, default=16,
+                        help="Number of emulated relay-boards (default: 16)")
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help="Emulated response latency in seconds (default: 0)")
+    parser.add_argument('-r', '--repeat', type=int, default=20,
+                        help="Repetitions per measurement (default: 20)")
+    parser.add_argument('-o', '--output', help="Write the json results to this file")
+    args = parser.parse_args(args_list)
+
+    emulators = RelayBoardEmulator.start_many(args.boards, args.latency)
+    results: Dict[str, Any] = {"boards": args.boards, "latency": args.latency,
+                               "repeat": args.repeat}
+    try:
+        for benchmark in (args.benchmark or benchmarks):
+            if (benchmark == "request"):
+                results[benchmark] = bench_request(emulators, args.repeat)
+            elif (benchmark == "open_reset"):
+                results[benchmark] = bench_open_reset(emulators, args.repeat)
+            elif (benchmark == "pattern"):
+                results[benchmark] = bench_pattern(emulators, args.repeat)
+            elif (benchmark == "cli"):
+                results[benchmark] = bench_cli(emulators, args.repeat)
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+    output = json.dumps(results, indent=4)
+    if (args.output is not None):
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
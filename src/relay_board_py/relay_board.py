@@ -1,17 +1,30 @@
 #!/usr/bin/python3
 """relay_board.py module."""
+from __future__ import annotations
 if __package__ is None or __package__ == "":
     from serial_number import SerialNumber  # type: ignore
     from relay_board_hardware import RelayBoardHardware  # type: ignore
     from relay_board_pattern import RelayBoardPattern  # type: ignore
+    from relay_board_stats import stats  # type: ignore
+    from serial_interface import Device, device_registry  # type: ignore
+    from relay_state import RelayState, RelayStateException  # type: ignore
+    from relay_board_timeout import AdaptiveTimeout  # type: ignore
 else:
     from .serial_number import SerialNumber
     from .relay_board_hardware import RelayBoardHardware
     from .relay_board_pattern import RelayBoardPattern
-import argparse
+    from .relay_board_stats import stats
+    from .serial_interface import Device, device_registry
+    from .relay_state import RelayState, RelayStateException
+    from .relay_board_timeout import AdaptiveTimeout
+import importlib
+import os
 import sys
 import logging
-from typing import Dict, List, Optional, Union
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+if TYPE_CHECKING:
+    import argparse
 
 # create a module_logger and add sys.stdout handler
 module_logger = logging.getLogger("relay_board.py")
@@ -20,20 +33,63 @@ module_logger.addHandler(logging.StreamHandler(sys.stdout))
 
 
 class RelayBoard():
-    """RelayBoard class."""
+    """RelayBoard class.
+
+    Requests hold the lock of the port (see Device.lock), so relay-board objects of the
+    same relay-board, in threads or processes, can be used concurrently.
+
+    Subscribers (subscribe, events) receive RelayBoardEvent objects from the background
+    reader of the port: frames no request waited for, and relay state changes which were
+    not written by this object, as seen in GET responses.
+    """
 
     REQUEST_PREFIX = "RB+"
     RESPONSE_PREFIX = "+"
     PAYLOAD_SEPARATOR = "="
     MESSAGE_SEPARATOR = "\n"
+    # response to an invalid request, belongs to the pending request
+    ERROR_HEADER = "ERR"
+
+    # readiness probe after open and reset: wait for a response before probing again,
+    # doubled after each unanswered probe up to READY_WAIT_MAX, until READY_TIMEOUT
+    READY_PROBE = "FW"
+    READY_WAIT = 0.01
+    READY_WAIT_MAX = 0.1
+    READY_TIMEOUT = 2.0
+
+    # maximum time a request waits for the other users of the port
+    LOCK_TIMEOUT = 10.0
+
+    # retries of a request without response, by header (all requests are idempotent)
+    RETRIES = {"GET": 1, "SET": 1, "ALL": 1, "SERIAL": 1, "HW": 1, "FW": 1}
 
-    def __init__(self, serial_number: str):
-        """Init a RelayBoard object."""
+    # prebuilt encoded "RB+HEADER" requests and "+HEADER" response prefixes, by header
+    request_templates: Dict[str, bytes] = {}
+    response_templates: Dict[str, bytes] = {}
+
+    def __init__(self, serial_number: str, shadow: bool = False):
+        """Init a RelayBoard object.
+
+        With shadow, the relay state is cached (seeded by a GET request at open and reset),
+        only changed relays are written and reads are served from the cache.
+        """
         self.serial_number = serial_number
         decoded_serial_number = SerialNumber.decode(serial_number)
         config_identifier = decoded_serial_number[2:4]
         serial_device_number = decoded_serial_number[4:12]
         self.hardware = RelayBoardHardware(config_identifier, serial_device_number)
+        # by the board-config, None if unknown
+        self.relay_count = RelayBoardHardware.RELAY_COUNTS.get(config_identifier)
+        self.shadow = shadow
+        self.shadow_state: Optional[RelayState] = None
+        self.timed_out = False
+        self.boot_time: Optional[float] = None
+        # response timeout from the round trip times, shared by the objects of the relay-board
+        self.timeout = AdaptiveTimeout.by_serial_number(serial_number)
+        self.subscribers: List[Callable[[RelayBoardEvent], None]] = []
+        # relay state as last read or written, while subscribed
+        self.known_state: Optional[RelayState] = None
+        self.poll_interval: Optional[float] = None
 
     def __repr__(self) -> str:
         """Return string representation of RelayBoard object."""
@@ -43,46 +99,371 @@ class RelayBoard():
         """Return serial-number of the relay-board."""
         return self.serial_number
 
+    def get_relay_count(self) -> int:
+        """Return the number of relays of the relay-board (by its board-config)."""
+        if (self.relay_count is None):
+            raise RelayBoardException(f"Unknown board-config {self.hardware.config_identifier} " +
+                                      f"of {self.serial_number}")
+        return self.relay_count
+
     def open(self) -> None:
-        """Open the relay-board."""
-        self.hardware.open()
+        """Open the relay-board, return when it's ready (closed again if it fails)."""
+        try:
+            self.hardware.open()
+            self.wait_ready()
+            if (self.shadow):
+                self.read_relay_state(refresh=True)
+            if (len(self.subscribers) > 0):
+                self.start_reader(self.poll_interval)
+        except Exception:
+            # e.g. not ready: don't keep the port (and its lock)
+            if (self.hardware.is_open()):
+                try:
+                    self.close()
+                except Exception:
+                    pass
+            raise
 
     def close(self) -> None:
-        """Close the relay-board."""
+        """Close the relay-board (the subscribers are kept for the next open)."""
+        self.shadow_state = None
+        self.known_state = None
         self.hardware.close()
 
     def reset(self) -> None:
-        """Reset the relay-board."""
-        self.hardware.reset()
+        """Reset the relay-board, return when it's ready."""
+        self.shadow_state = None
+        # no requests of others while the relay-board boots
+        with self.hardware.locked(RelayBoard.LOCK_TIMEOUT):
+            self.hardware.reset()
+            self.wait_ready()
+        if (self.shadow):
+            self.read_relay_state(refresh=True)
+        if (self.known_state is not None):
+            # the reset is no change of others
+            self.known_state = RelayBoard.parse_relay_state(self.request("GET"))
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> float:
+        """Probe the relay-board until it responds, return (and keep) the boot time."""
+        start = time.monotonic()
+        deadline = start + timeout
+        probe = RelayBoard.encode_request(RelayBoard.READY_PROBE)
+        prefix = (RelayBoard.RESPONSE_PREFIX + RelayBoard.READY_PROBE).encode("ascii")
+        wait = RelayBoard.READY_WAIT
+        probes = 0
+        with self.hardware.locked(RelayBoard.LOCK_TIMEOUT):
+            # drop anything received while booting
+            self.hardware.reset_input_buffer()
+            while (not self.probe_ready(probe, prefix, min(time.monotonic() + wait, deadline),
+                                        probes == 0)):
+                probes += 1
+                self.check_port()
+                if (time.monotonic() >= deadline):
+                    if (stats.enabled):
+                        stats.count("error.ready")
+                    raise RelayBoardTimeoutException(
+                        f"Relay-board {self.serial_number} not ready after {timeout} s " +
+                        f"({probes} probes)")
+                wait = min(wait * 2, RelayBoard.READY_WAIT_MAX)
+        self.boot_time = time.monotonic() - start
+        # unanswered probes may still be answered (late)
+        self.timed_out = (probes > 0)
+        if (stats.enabled):
+            stats.record("relay_board.ready", self.boot_time)
+            stats.count("relay_board.probe", probes + 1)
+        return self.boot_time
+
+    def probe_ready(self, probe: bytes, prefix: bytes, deadline: float,
+                    record: bool = False) -> bool:
+        """Send a probe, return whether it's answered until deadline (monotonic clock).
+
+        With record, the round trip is recorded (a first probe isn't delayed by a boot).
+        """
+        self.hardware.write(probe)
+        sent = time.monotonic()
+        while True:
+            response = self.hardware.read_frame(deadline)
+            if (not response.endswith(b"\n")):
+                return False
+            # any response to a probe means ready, other frames are noise of the boot
+            if (response.startswith(prefix)):
+                if (record):
+                    self.timeout.record(time.monotonic() - sent)
+                return True
+
+    def check_port(self) -> None:
+        """Fail fast if the port of the relay-board is gone (e.g. unplugged), after timeouts."""
+        if (not self.hardware.is_present()):
+            if (stats.enabled):
+                stats.count("error.disconnected")
+            raise RelayBoardException(f"Relay-board {self.serial_number} disconnected " +
+                                      f"({self.hardware.serial_device.port} is gone)")
+
+    def read_info(self) -> Dict[str, str]:
+        """Read meta-data information of the relay-board."""
+        results = self.request_batch([("SERIAL", ""), ("HW", ""), ("FW", "")])
+        RelayBoard.raise_for_batch(results)
+        return {"serial_number": str(results[0]),
+                "hardware_version": str(results[1]),
+                "firmware_version": str(results[2])}
 
     def print_info(self) -> None:
         """Print meta-data information of the relay-board."""
-        module_logger.info(f"Serial-number:    {self.read_serial_number()}")
-        module_logger.info(f"Hardware-version: {self.read_hardware_version()}")
-        module_logger.info(f"Firmware-version: {self.read_firmware_version()}")
-
-    def request(self, request_header: str, request_payload: str = "", timeout: float = 0.5) -> str:
-        """Send request to relay-board and receive response."""
-        # create the request string
-        request_str = RelayBoard.REQUEST_PREFIX + request_header
+        RelayBoard.log_info(self.read_info())
+
+    @staticmethod
+    def log_info(info: Dict[str, str]) -> None:
+        """Log meta-data information as returned by read_info."""
+        module_logger.info(f"Serial-number:    {info['serial_number']}")
+        module_logger.info(f"Hardware-version: {info['hardware_version']}")
+        module_logger.info(f"Firmware-version: {info['firmware_version']}")
+
+    @staticmethod
+    def encode_request(request_header: str, request_payload: str = "") -> bytes:
+        """Encode a request (including message separator) from its prebuilt template."""
+        template = RelayBoard.request_templates.get(request_header)
+        if (template is None):
+            template = (RelayBoard.REQUEST_PREFIX + request_header).encode("ascii")
+            RelayBoard.request_templates[request_header] = template
         if (len(request_payload) > 0):
-            request_str += RelayBoard.PAYLOAD_SEPARATOR + request_payload
-        module_logger.debug("request:\n" + request_str)
-        request_str += RelayBoard.MESSAGE_SEPARATOR
-        # write request string and read response string
-        self.hardware.write_str(request_str)
-        response_str = self.hardware.read_until_str(
-            expected=RelayBoard.MESSAGE_SEPARATOR, timeout=timeout)
-        response_str = response_str.replace(RelayBoard.MESSAGE_SEPARATOR, "")
-        # process the response string
-        module_logger.debug("response:\n" + response_str)
-        if (not response_str.startswith(RelayBoard.RESPONSE_PREFIX + request_header)):
-            raise RelayBoardException(f"Invalid response: \"{response_str}\"")
-        # extract the payload (if available)
-        if (RelayBoard.PAYLOAD_SEPARATOR not in response_str):
-            return ""
+            request = b"%s=%s\n" % (template, request_payload.encode("ascii"))
         else:
-            return response_str.split(RelayBoard.PAYLOAD_SEPARATOR)[1]
+            request = template + b"\n"
+        if (module_logger.isEnabledFor(logging.DEBUG)):
+            module_logger.debug(f"request: {request!r}")
+        return request
+
+    @staticmethod
+    def decode_response(request_header: str, response: bytes) -> str:
+        """Check the response (frame) of a request and return its payload."""
+        if (module_logger.isEnabledFor(logging.DEBUG)):
+            module_logger.debug(f"response: {response!r}")
+        prefix = RelayBoard.get_response_prefix(request_header)
+        if (not response.startswith(prefix)):
+            raise RelayBoardException(f"Invalid response: \"{RelayBoard.frame_str(response)}\"")
+        # extract the payload (if available), only the payload is decoded
+        start = response.find(b"=", len(prefix))
+        if (start < 0):
+            return ""
+        end = response.find(b"=", start + 1)
+        if (end < 0):
+            end = len(response) - 1 if response.endswith(b"\n") else len(response)
+        return response[start + 1:end].decode("ascii", errors="ignore")
+
+    @staticmethod
+    def get_response_prefix(request_header: str) -> bytes:
+        """Return the encoded "+HEADER" prefix of the responses to request_header."""
+        prefix = RelayBoard.response_templates.get(request_header)
+        if (prefix is None):
+            prefix = (RelayBoard.RESPONSE_PREFIX + request_header).encode("ascii")
+            RelayBoard.response_templates[request_header] = prefix
+        return prefix
+
+    @staticmethod
+    def frame_str(response: bytes) -> str:
+        """Return a response (frame) as string for messages."""
+        return response.decode("ascii", errors="ignore").strip()
+
+    def drop_late_responses(self) -> None:
+        """After a timeout, drop late responses which would be taken for the next responses."""
+        if (self.timed_out):
+            self.timed_out = False
+            self.hardware.reset_input_buffer()
+
+    def request(self, request_header: str, request_payload: str = "",
+                timeout: Optional[float] = None) -> str:
+        """Send request to relay-board and receive response.
+
+        Without timeout, the adaptive timeout of the relay-board is used. A request without
+        response is retried RETRIES[request_header] times, unless the port is gone. A retry
+        waits as long as the explicit timeout, or longer than the adaptive timeout before
+        (see AdaptiveTimeout.get_retry).
+        """
+        start = time.perf_counter() if stats.enabled else 0.0
+        request = RelayBoard.encode_request(request_header, request_payload)
+        attempt_timeout = self.timeout.get() if (timeout is None) else timeout
+        retries = RelayBoard.RETRIES.get(request_header, 0)
+        while True:
+            with self.hardware.locked(RelayBoard.LOCK_TIMEOUT):
+                self.drop_late_responses()
+                # write request and read response frame
+                self.hardware.write(request)
+                sent = time.monotonic()
+                response = self.read_response(sent + attempt_timeout, [request_header])
+                received = time.monotonic()
+            if (response.endswith(b"\n")):
+                self.timeout.record(received - sent)
+                break
+            self.timed_out = True
+            self.check_port()
+            if (retries == 0):
+                break
+            retries -= 1
+            if (stats.enabled):
+                stats.count("retry." + request_header)
+            if (timeout is None):
+                attempt_timeout = self.timeout.get_retry(attempt_timeout)
+        if (stats.enabled):
+            stats.record("request." + request_header, time.perf_counter() - start)
+        try:
+            if (not response.endswith(b"\n")):
+                raise RelayBoardTimeoutException(f"No response to {request_header}: " +
+                                                 f"\"{RelayBoard.frame_str(response)}\"")
+            return RelayBoard.decode_response(request_header, response)
+        except RelayBoardException:
+            if (stats.enabled):
+                stats.count("error." + request_header)
+            raise
+
+    def request_batch(self, requests: List[Tuple[str, str]], timeout: Optional[float] = None) \
+            -> List[Union[str, RelayBoardException]]:
+        """Send requests back to back and receive their responses afterwards (pipelined).
+
+        Each request is a (request_header, request_payload) tuple. The responses are
+        matched in order against the +HEADER prefix of the requests. The payload of
+        each successful request, or the RelayBoardException of each failed request,
+        is returned in request order. timeout and retries: see request and send_batch.
+        """
+        return self.send_batch([header for (header, payload) in requests],
+                               b"".join([RelayBoard.encode_request(header, payload)
+                                         for (header, payload) in requests]),
+                               timeout)
+
+    def send_batch(self, headers: List[str], data: bytes, timeout: Optional[float] = None) \
+            -> List[Union[str, RelayBoardException]]:
+        """Send already encoded requests (data) and receive the responses to their headers.
+
+        timeout applies to each response (default: the adaptive timeout). The requests from
+        the first one without response on are retried in order (SET/ALL requests are
+        idempotent, but their order matters), if all of them have RETRIES left.
+        """
+        return self.retry_batch(headers, data, self.exchange_batch(headers, data, timeout),
+                                timeout)
+
+    def retry_batch(self, headers: List[str], data: bytes,
+                    results: List[Union[str, RelayBoardException]],
+                    timeout: Optional[float] = None) -> List[Union[str, RelayBoardException]]:
+        """Retry the requests of a batch from the first one without response on (see send_batch).
+
+        Return the results with those of the retried requests replaced.
+        """
+        attempt = 1
+        attempt_timeout = self.timeout.get() if (timeout is None) else timeout
+        while True:
+            first = next((j for j in range(len(results))
+                          if isinstance(results[j], RelayBoardTimeoutException)), None)
+            if ((first is None) or
+                    any([RelayBoard.RETRIES.get(header, 0) < attempt
+                         for header in headers[first:]])):
+                return results
+            self.check_port()
+            lines = data.split(b"\n")[:-1]
+            if (len(lines) != len(headers)):
+                return results
+            if (stats.enabled):
+                for header in headers[first:]:
+                    stats.count("retry." + header)
+            if (timeout is None):
+                attempt_timeout = self.timeout.get_retry(attempt_timeout)
+            results[first:] = self.exchange_batch(
+                headers[first:], b"".join([line + b"\n" for line in lines[first:]]),
+                attempt_timeout)
+            attempt += 1
+
+    def exchange_batch(self, headers: List[str], data: bytes, timeout: Optional[float] = None) \
+            -> List[Union[str, RelayBoardException]]:
+        """Send encoded requests once and receive the responses (see send_batch)."""
+        if (len(headers) == 0):
+            return []
+        start = time.perf_counter() if stats.enabled else 0.0
+        with self.hardware.locked(RelayBoard.LOCK_TIMEOUT):
+            self.drop_late_responses()
+            # write all requests at once
+            self.hardware.write(data)
+            return self.receive_batch(headers, timeout, start)
+
+    def receive_batch(self, headers: List[str], timeout: Optional[float] = None,
+                      start: float = 0.0, sent: Optional[float] = None) \
+            -> List[Union[str, RelayBoardException]]:
+        """Read and match the responses to written requests (port lock held).
+
+        start: perf_counter before the write (latency statistics), sent: monotonic clock
+        after the write (default: now).
+        """
+        results: List[Union[str, RelayBoardException]] = []
+        if (timeout is None):
+            timeout = self.timeout.get()
+        # read and match the response frames
+        previous = time.monotonic() if (sent is None) else sent
+        i = 0
+        while (i < len(headers)):
+            response = self.read_response(previous + timeout, headers[i:])
+            if (not response.endswith(b"\n")):
+                self.timed_out = True
+            else:
+                # round trip: the time between consecutive responses
+                received = time.monotonic()
+                self.timeout.record(received - previous)
+                previous = received
+            matched = i
+            i = RelayBoard.match_response(headers, i, response, results)
+            if (stats.enabled):
+                # latency of each request: from writing the batch until its response
+                latency = time.perf_counter() - start
+                for j in range(matched, i):
+                    stats.record("request." + headers[j], latency)
+                    if (isinstance(results[j], RelayBoardException)):
+                        stats.count("error." + headers[j])
+        return results
+
+    def read_response(self, deadline: float, headers: List[str]) -> bytes:
+        """Read the next response frame to one of headers (port lock held).
+
+        While subscribed, other frames are passed to the reader (see handle_frame).
+        """
+        while True:
+            response = self.hardware.read_frame(deadline)
+            if ((len(self.subscribers) == 0) or (not response.endswith(b"\n")) or
+                    response.startswith(RelayBoard.get_response_prefix(RelayBoard.ERROR_HEADER))):
+                return response
+            for header in headers:
+                if (response.startswith(RelayBoard.get_response_prefix(header))):
+                    return response
+            self.hardware.post_frame(response)
+
+    @staticmethod
+    def match_response(headers: List[str], i: int, response: bytes,
+                       results: List[Union[str, RelayBoardException]]) -> int:
+        """Match a response (frame) of a batch, starting at request i, append to results.
+
+        Return the index of the next request waiting for its response.
+        """
+        if (not response.endswith(b"\n")):
+            # timeout: no (complete) responses for the remaining requests
+            for header in headers[i:]:
+                results.append(RelayBoardTimeoutException(
+                    f"No response to {header}: \"{RelayBoard.frame_str(response)}\""))
+            return len(headers)
+        # the response belongs to the next request with matching header
+        for j in range(i, len(headers)):
+            try:
+                payload = RelayBoard.decode_response(headers[j], response)
+            except RelayBoardException:
+                continue
+            for header in headers[i:j]:
+                results.append(RelayBoardTimeoutException(f"Missing response to {header}"))
+            results.append(payload)
+            return j + 1
+        results.append(RelayBoardException(
+            f"Invalid response: \"{RelayBoard.frame_str(response)}\""))
+        return i + 1
+
+    @staticmethod
+    def raise_for_batch(results: List[Union[str, RelayBoardException]]) -> None:
+        """Raise the first RelayBoardException of the results of request_batch, if any."""
+        for result in results:
+            if (isinstance(result, RelayBoardException)):
+                raise result
 
     def read_serial_number(self) -> str:
         """Read serial-number from relay-board."""
@@ -96,49 +477,286 @@ class RelayBoard():
         """Read firmware-version from relay-board."""
         return self.request("FW")
 
-    def write_relay_state(self, state: Dict[str, Union[str, List[int]]]) -> None:
-        """Write the relay state."""
-        keys = {"open": "O", "close": "C"}
-        module_logger.debug(f"write relay state: {state}")
-        # first check all keys in state
+    @staticmethod
+    def assert_state_keys(state: Dict[str, Union[str, List[int]]]) -> None:
+        """Assert that all keys of a relay state are known."""
         for key in state:
-            if key not in keys:
+            if key not in ["open", "close"]:
                 raise RelayBoardException(f"Unknown key \"{key}\"")
-        # create the commands
-        set_cmd: List[str] = []
+
+    @staticmethod
+    def create_requests(state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                        relay_count: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Create the fewest SET/ALL requests resulting in the relay state.
+
+        The keys are applied in order, a later key overrides an earlier one: overridden
+        entries are dropped and open/close are merged into one SET request. With the
+        relay_count of the board-config, "all" is expanded and the state is written by at
+        most one request, an ALL request if it sets all relays to the same value. Without
+        it, the last "all" entry stays an ALL request, followed by a SET request of the
+        relays differing from it.
+        """
+        all_mask = None if (relay_count is None) else RelayState.get_mask(relay_count)
+        if (isinstance(state, RelayState)):
+            return state.to_requests(all_mask)
+        # first check all keys in state
+        RelayBoard.assert_state_keys(state)
+        keys = list(state)
+        alls = [i for i, key in enumerate(keys) if isinstance(state[key], str)]
+        for i in alls:
+            if (state[keys[i]] != "all"):
+                raise RelayBoardException(f"Invalid entry \"{state[keys[i]]}\" of {keys[i]}")
+        try:
+            if ((all_mask is not None) or (len(alls) == 0)):
+                return RelayState.from_dict(state, all_mask).to_requests(all_mask)
+            # the entries before the last "all" entry are overridden by it
+            key = keys[alls[-1]]
+            overrides = RelayState.from_dict({k: state[k] for k in keys[alls[-1] + 1:]})
+        except RelayStateException as e:
+            raise RelayBoardException(str(e)) from None
+        if (key == "close"):
+            differing = RelayState(overrides.mask & ~overrides.closed)
+        else:
+            differing = RelayState(overrides.closed, overrides.closed)
+        return [("ALL", "C" if (key == "close") else "O")] + differing.to_requests()
+
+    @staticmethod
+    def count_uncoalesced_requests(state: Union[Dict[str, Union[str, List[int]]], RelayState]) \
+            -> int:
+        """Return the number of requests of a relay state without coalescing.
+
+        That is one ALL request per "all" entry and one SET request per run of list entries
+        (see create_requests for the coalesced requests).
+        """
+        if (isinstance(state, RelayState)):
+            return 1 if (state.mask != 0) else 0
+        count = 0
+        pending = 0
         for key in state:
-            entry = state[key]
-            if type(entry) is list:
-                for relay in entry:
-                    set_cmd.append(str(relay) + "-" + keys[key])
-            elif (type(entry) is str) and (entry == "all"):
-                # send a potential pending SET request
-                if (len(set_cmd) > 0):
-                    self.request("SET", ",".join(set_cmd))
-                    set_cmd = []
-                # send ALL request
-                self.request("ALL", keys[key])
-        # send SET request
-        if (len(set_cmd) > 0):
-            self.request("SET", ",".join(set_cmd))
-            set_cmd = []
-
-    def read_relay_state(self) -> Dict[str, List[int]]:
-        """Read the relay state."""
-        response = self.request("GET")
-        state: Dict[str, List[int]] = {"open": [], "close": []}
-        relays = response.split(",")
-        for relay in relays:
-            relay_id = int(relay.split("-")[0])
-            key = "close" if relay.split("-")[1] == "C" else "open"
-            state[key].append(relay_id)
+            if (isinstance(state[key], str)):
+                count += pending + 1
+                pending = 0
+            elif (len(state[key]) > 0):
+                pending = 1
+        return count + pending
+
+    @staticmethod
+    def get_board_relay_count(serial_number: str) -> Optional[int]:
+        """Return the number of relays by the board-config of serial_number (None if unknown)."""
+        return RelayBoardHardware.RELAY_COUNTS.get(SerialNumber.decode(serial_number)[2:4])
+
+    @staticmethod
+    def compile_state(state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                      relay_count: Optional[int] = None) -> RelayBoardCommands:
+        """Compile a relay state into its encoded SET/ALL requests (see create_requests)."""
+        requests = RelayBoard.create_requests(state, relay_count)
+        commands = RelayBoardCommands(state, [header for (header, payload) in requests],
+                                      b"".join([RelayBoard.encode_request(header, payload)
+                                                for (header, payload) in requests]))
+        commands.saved = RelayBoard.count_uncoalesced_requests(state) - len(requests)
+        return commands
+
+    def write_relay_state(self, state: Union[Dict[str, Union[str, List[int]]], RelayState,
+                                             RelayBoardCommands],
+                          verify: bool = False) -> None:
+        """Write the relay state (and verify it by reading it back, if requested)."""
+        commands, expected = self.prepare_relay_state(state, verify)
+        if (len(commands.headers) == 0):
+            module_logger.debug("write relay state: unchanged")
+            return
+        # the cache is invalid until the write succeeded
+        self.shadow_state = None
+        results = self.send_batch(commands.headers, commands.data)
+        self.finish_relay_state(commands.state, results, verify, expected)
+
+    def prepare_relay_state(self, state: Union[Dict[str, Union[str, List[int]]], RelayState,
+                                               RelayBoardCommands],
+                            verify: bool = False) \
+            -> Tuple[RelayBoardCommands, Optional[RelayState]]:
+        """Compile the requests writing a relay state (see write_relay_state).
+
+        Return the commands (no requests if unchanged) and the expected shadow state.
+        """
+        if (isinstance(state, RelayBoardCommands)):
+            if ((not verify) and (self.shadow_state is None)):
+                # send the precompiled requests as they are
+                return (state, None)
+            state = state.state
+        if (module_logger.isEnabledFor(logging.DEBUG)):
+            module_logger.debug(f"write relay state: {state}")
+        expected: Optional[RelayState] = None
+        if (self.shadow_state is not None):
+            # only write the relays whose state changes
+            RelayBoard.assert_state_keys(state)  # type: ignore
+            target = RelayState.from_dict(state, self.shadow_state.mask)  # type: ignore
+            expected = self.shadow_state.union(target)
+            # the shadow state covers all relays
+            requests = self.shadow_state.diff(target).to_requests(self.shadow_state.mask)
+        else:
+            requests = RelayBoard.create_requests(state, self.relay_count)  # type: ignore
+        if (stats.enabled):
+            uncoalesced = RelayBoard.count_uncoalesced_requests(state)  # type: ignore
+            stats.count("optimizer.saved", uncoalesced - len(requests))
+        if (verify):
+            requests.append(("GET", ""))
+        commands = RelayBoardCommands(state, [header for (header, payload) in requests],
+                                      b"".join([RelayBoard.encode_request(header, payload)
+                                                for (header, payload) in requests]))
+        return (commands, expected)
+
+    def finish_relay_state(self, state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                           results: List[Union[str, RelayBoardException]],
+                           verify: bool = False, expected: Optional[RelayState] = None) -> None:
+        """Check the results of writing a relay state, update the known and shadow state."""
+        RelayBoard.raise_for_batch(results)
+        self.track_relay_state(state)
+        if (verify):
+            read_state = RelayBoard.parse_relay_state(str(results[-1]))
+            RelayBoard.verify_relay_state(state, read_state)
+            if (self.shadow):
+                self.shadow_state = read_state
+            self.observe_relay_state(read_state)
+        elif (expected is not None):
+            self.shadow_state = expected
+
+    def track_relay_state(self, state: Union[Dict[str, Union[str, List[int]]], RelayState]) \
+            -> None:
+        """Apply a written relay state to the known state (writes of this object are no events)."""
+        if (self.known_state is not None):
+            self.known_state = self.known_state.union(
+                RelayState.from_dict(state, self.known_state.mask))
+
+    @staticmethod
+    def verify_relay_state(state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                           read_state: Union[Dict[str, List[int]], RelayState]) -> None:
+        """Assert that read_state is the result of writing state."""
+        actual = RelayState.from_dict(read_state)
+        expected = RelayState.from_dict(state, actual.mask)
+        if (not expected.issubset(actual)):
+            relay = RelayState.get_relays(actual.diff(expected).mask)[0]
+            raise RelayBoardException(f"Verify failed: relay {relay} not " +
+                                      f"{expected.get_relay(relay)} in {actual}")
+
+    def read_relay_state(self, refresh: bool = False) -> RelayState:
+        """Read the relay state (from the shadow state, unless refresh is requested)."""
+        if ((self.shadow_state is not None) and (not refresh)):
+            return self.shadow_state
+        state = RelayBoard.parse_relay_state(self.request("GET"))
+        if (self.shadow):
+            self.shadow_state = state
+        self.observe_relay_state(state)
         return state
 
+    def observe_relay_state(self, state: RelayState) -> None:
+        """Compare a read relay state with the known state, publish a "state" event on change."""
+        previous = self.known_state
+        if (previous is None):
+            return
+        self.known_state = state
+        if (state != previous):
+            if (self.shadow_state is not None):
+                # changed by others, e.g. the user button
+                self.shadow_state = state
+            self.publish(RelayBoardEvent("state", self.serial_number, state=state,
+                                         previous=previous))
+
+    def subscribe(self, callback: Callable[[RelayBoardEvent], None]) -> None:
+        """Call callback with each event (see class), starts the reader if required.
+
+        Callbacks are called from the reader thread, or from the thread reading a changed
+        relay state, and must not block.
+        """
+        self.subscribers.append(callback)
+        if (self.hardware.is_open() and (self.known_state is None)):
+            self.start_reader(self.poll_interval)
+
+    def unsubscribe(self, callback: Callable[[RelayBoardEvent], None]) -> None:
+        """Stop calling callback, the reader is stopped with the last subscriber."""
+        self.subscribers.remove(callback)
+        if (len(self.subscribers) == 0):
+            self.stop_reader()
+
+    def events(self, timeout: Optional[float] = None) -> Iterator[RelayBoardEvent]:
+        """Iterate over the events, until timeout seconds pass without event (if given)."""
+        import queue
+        events: queue.Queue = queue.Queue()
+        self.subscribe(events.put)
+        try:
+            while True:
+                try:
+                    yield events.get(timeout=timeout)
+                except queue.Empty:
+                    return
+        finally:
+            self.unsubscribe(events.put)
+
+    def start_reader(self, poll_interval: Optional[float] = None) -> None:
+        """Start the background reader (done by subscribe) on the opened relay-board.
+
+        The reader costs nothing while the relay-board is idle. Relay-boards report no
+        relay changes by themselves (e.g. by the user button), with poll_interval the
+        relay state is read after each poll_interval seconds without data.
+        """
+        self.poll_interval = poll_interval
+        self.known_state = RelayBoard.parse_relay_state(self.request("GET"))
+        self.hardware.start_reader(self.handle_frame,
+                                   None if (poll_interval is None) else self.poll_relay_state,
+                                   poll_interval, self.handle_reader_exit)
+
+    def stop_reader(self) -> None:
+        """Stop the background reader."""
+        self.hardware.stop_reader()
+        self.known_state = None
+
+    def handle_frame(self, frame: bytes) -> None:
+        """Publish a frame no request waited for (reader thread), check GET responses."""
+        self.publish(RelayBoardEvent("frame", self.serial_number,
+                                     frame=RelayBoard.frame_str(frame)))
+        if (frame.startswith(RelayBoard.get_response_prefix("GET"))):
+            try:
+                self.observe_relay_state(RelayBoard.parse_relay_state(
+                    RelayBoard.decode_response("GET", frame)))
+            except RelayBoardException:
+                pass
+
+    def handle_reader_exit(self) -> None:
+        """Publish an "error" event when the reader stopped by itself (reader thread).
+
+        The next subscribe starts it again.
+        """
+        self.known_state = None
+        self.publish(RelayBoardEvent("error", self.serial_number, error=RelayBoardException(
+            f"Reader of {self.serial_number} stopped, port failed or gone")))
+
+    def poll_relay_state(self) -> None:
+        """Read the relay state when idle (reader thread), publish an "error" event on failure."""
+        try:
+            self.read_relay_state(refresh=True)
+        except Exception as e:
+            self.publish(RelayBoardEvent("error", self.serial_number, error=e))
+
+    def publish(self, event: RelayBoardEvent) -> None:
+        """Call the subscribers with event (errors of subscribers are logged)."""
+        for callback in list(self.subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                module_logger.warning(f"Subscriber of {self.serial_number} failed: {e}")
+
+    @staticmethod
+    def parse_relay_state(response: str) -> RelayState:
+        """Parse the payload of a GET response."""
+        try:
+            return RelayState.parse(response)
+        except RelayStateException as e:
+            raise RelayBoardException(str(e)) from None
+
     @staticmethod
     def assert_subset(subset: List[int], superset: List[int]):
         """Assert that all entries of subset are in superset."""
+        superset_set = set(superset)
         for entry in subset:
-            if (entry not in superset):
+            if (entry not in superset_set):
                 raise RelayBoardException(f"Entry {entry} not present in {superset}")
 
     @staticmethod
@@ -150,30 +768,365 @@ class RelayBoard():
             return state
         return list(map(int, state.split(",")))
 
+    @staticmethod
+    def register_port(serial_number: str, port: str) -> None:
+        """Use port for the relay-board with serial_number, skipping the device enumeration."""
+        serial_device_number = SerialNumber.decode(serial_number)[4:12]
+        device_registry.register(Device(port, serial_number=serial_device_number))
+
+    @staticmethod
+    def run_alias(alias: str, serial_number: str,
+                  state: Union[Dict[str, Union[str, List[int]]], RelayState, RelayBoardCommands],
+                  reset: bool = False, info: bool = False,
+                  verify: bool = False) -> RelayBoardResult:
+        """Open, (optionally) reset, write and close a single relay-board of a pattern."""
+        result = RelayBoardResult(alias, serial_number)
+        start = time.monotonic()
+        try:
+            # create relay_board object by serial_number
+            relay_board = RelayBoard(serial_number)
+            try:
+                # open the relay board
+                relay_board.open()
+                # print info if required
+                if (info):
+                    relay_board.print_info()
+                # reset if required
+                if (reset):
+                    relay_board.reset()
+                # set the relay-board state
+                relay_board.write_relay_state(state, verify)
+            finally:
+                # close the relay board (if open() failed, it's closed already)
+                if (relay_board.hardware.is_open()):
+                    relay_board.close()
+        except Exception as e:
+            result.error = e
+        result.duration = time.monotonic() - start
+        return result
+
+    @staticmethod
+    def run_pattern(relay_board_pattern: RelayBoardPattern, pattern_str: Optional[str] = None,
+                    reset: bool = False, info: bool = False, jobs: int = 1,
+                    verify: bool = False) -> Dict[str, RelayBoardResult]:
+        """Execute a pattern and return the result of each alias.
+
+        With jobs == 1 the aliases are executed one after another in definition order,
+        stopping at the first failing alias. With jobs > 1 up to jobs relay-boards are
+        driven concurrently, each by its own worker. The states of a single relay-board
+        are always written in definition order.
+        """
+        if (jobs < 1):
+            raise RelayBoardException(f"Invalid number of jobs {jobs}, must be at least 1")
+        # get the pattern in the form written to the relay-boards (compiled by a plan)
+        pattern = relay_board_pattern.get_commands(pattern_str)
+        results: Dict[str, RelayBoardResult] = {}
+        if (jobs == 1):
+            # iterate over all aliases in the pattern
+            for alias in pattern:
+                serial_number = relay_board_pattern.get_serial_number(alias)
+                result = RelayBoard.run_alias(alias, serial_number, pattern[alias],
+                                              reset, info, verify)
+                results[alias] = result
+                if (result.error is not None):
+                    break
+            return results
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(jobs, len(pattern))) as executor:
+            futures = {}
+            for alias in pattern:
+                serial_number = relay_board_pattern.get_serial_number(alias)
+                futures[alias] = executor.submit(RelayBoard.run_alias, alias, serial_number,
+                                                 pattern[alias], reset, info, verify)
+            # collect the results in definition order
+            for alias in futures:
+                results[alias] = futures[alias].result()
+        return results
+
+    @staticmethod
+    def raise_for_results(results: Dict[str, RelayBoardResult]) -> None:
+        """Raise the error of a failed alias, if any."""
+        failed = [alias for alias in results if results[alias].error is not None]
+        if (len(failed) == 0):
+            return
+        error = results[failed[0]].error
+        if (len(failed) == 1):
+            raise error  # type: ignore
+        raise RelayBoardException(f"Pattern failed for aliases {failed}: {error}") from error
+
+    @staticmethod
+    def import_module(name: str) -> Any:
+        """Import a module of this package on demand (not needed by most invocations)."""
+        if __package__ is None or __package__ == "":
+            return importlib.import_module(name)
+        return importlib.import_module("." + name, __package__)
+
+    @staticmethod
+    def configure_timeouts(serial_numbers: List[str], floor: Optional[float],
+                           ceiling: Optional[float]) -> None:
+        """Set the bounds of the adaptive timeouts of relay-boards (None: unchanged)."""
+        if ((floor is None) and (ceiling is None)):
+            return
+        for serial_number in serial_numbers:
+            AdaptiveTimeout.by_serial_number(serial_number).configure(floor, ceiling)
+
+    @staticmethod
+    def is_forwardable(args: argparse.Namespace) -> bool:
+        """Return True if the parsed arguments can be executed by a running daemon.
+
+        Only -s, -o, -c, -f, -p, -r, -i, -v, --compiled and --library are passed to the
+        daemon, any other option (e.g. statistics, timeouts, jobs) requires direct mode.
+        """
+        return (((args.serial_number is not None) or (args.file is not None)) and
+                (args.sequence is None) and (args.port is None) and (not args.no_daemon) and
+                (not args.sync) and (args.record is None) and (args.jobs == 1) and
+                (args.stats is None) and (args.stats_prometheus is None) and
+                (args.timeout_floor is None) and (args.timeout_ceiling is None))
+
+    @staticmethod
+    def main_client(client: Any, args: argparse.Namespace) -> None:
+        """Execute the parsed arguments by a running daemon."""
+        session_class = RelayBoard.import_module("relay_board_session").RelayBoardSession
+        commands = session_class.commands_from_args(
+            args.serial_number, RelayBoard.parse_state_arg(args.open),
+            RelayBoard.parse_state_arg(args.close), args.file, args.pattern,
+            args.reset, args.info, args.verify)
+        for command in commands:
+            if (args.compiled and (command["cmd"] == "pattern")):
+                command["compiled"] = True
+            if (args.library and (command["cmd"] == "pattern")):
+                command["library"] = True
+            result = client.request(command)
+            if (not result["ok"]):
+                raise RelayBoardException(f"Daemon: {result['error']}")
+            results = [result] if ("aliases" not in result) else result["aliases"].values()
+            for r in results:
+                if ("info" in r):
+                    RelayBoard.log_info(r["info"])
+
+    @staticmethod
+    def main_sequence(relay_board_pattern: RelayBoardPattern, args: argparse.Namespace) -> None:
+        """Run a sequence and log the planned vs. actual start time of each step."""
+        sequencer_class = RelayBoard.import_module("relay_board_sequence").RelayBoardSequencer
+        results = sequencer_class.run_sequence(relay_board_pattern, args.sequence,
+                                               reset=args.reset, info=args.info,
+                                               synchronized=args.sync)
+        for result in results:
+            module_logger.info(f"Step {result.index} {result.pattern}: " +
+                               f"planned {result.planned:.3f} s, actual {result.actual:.3f} s, " +
+                               f"jitter {result.get_jitter() * 1000:+.2f} ms, " +
+                               f"duration {result.duration * 1000:.2f} ms" +
+                               ("" if (result.skew is None) else
+                                f", skew {result.skew * 1e6:.1f} us"))
+            if (result.error is not None):
+                raise result.error
+
+    @staticmethod
+    def main_stream(args: argparse.Namespace) -> None:
+        """Execute json commands from stdin with the relay-boards kept open, until end of input.
+
+        One json result per line is written to stdout (flushed), e.g.
+        {"cmd": "set", "serial_number": "RB00D30GR9J5", "state": {"close": [1]}, "id": 7}
+        -> {"ok": true, "cmd": "set", "id": 7, "duration": 0.0021}
+        """
+        session = RelayBoard.import_module("relay_board_session").RelayBoardSession(
+            args.shadow, args.timeout_floor, args.timeout_ceiling)
+        try:
+            for line in sys.stdin.buffer:
+                if (len(line.strip()) == 0):
+                    continue
+                sys.stdout.write(session.execute_json(line) + "\n")
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            session.close()
+
+    @staticmethod
+    def main_sync(relay_board_pattern: RelayBoardPattern, pattern_str: Optional[str],
+                  args: argparse.Namespace) -> None:
+        """Execute a pattern by a synchronized commit and log the write skew."""
+        group_class = RelayBoard.import_module("relay_board_group").RelayBoardGroup
+        pattern = relay_board_pattern.get_commands(pattern_str)
+        group = group_class({alias: relay_board_pattern.get_serial_number(alias)
+                             for alias in pattern})
+        try:
+            group.open()
+            if (args.info):
+                for alias in pattern:
+                    group.relay_boards[alias].print_info()
+            if (args.reset):
+                group.run(lambda alias: group.relay_boards[alias].reset(), list(pattern))
+            report = group.commit(pattern, args.verify)
+        finally:
+            group.close()
+        module_logger.info(f"Write skew {report.skew * 1e6:.1f} us " +
+                           f"({len(report.writes)} relay-boards), " +
+                           f"prepare {report.prepare * 1000:.2f} ms, " +
+                           f"duration {report.duration * 1000:.2f} ms")
+
+    @staticmethod
+    def main_validate(args: argparse.Namespace) -> None:
+        """Validate all patterns of a pattern file (library), report the coalesced requests."""
+        if (args.library):
+            library = RelayBoard.import_module("relay_board_library").RelayBoardLibrary
+            relay_board_pattern = library.from_file(args.file)
+            count = relay_board_pattern.validate()
+        else:
+            relay_board_pattern = RelayBoardPattern.from_file(args.file)
+            count = len(relay_board_pattern.patterns)
+        plan = RelayBoard.import_module("relay_board_plan").RelayBoardPlan.compile(
+            relay_board_pattern)
+        module_logger.info(f"{args.file}: {count} patterns valid, " +
+                           f"{plan.saved} requests saved by coalescing")
+
     @staticmethod
     def main(args_list: List[str]):
         """Execute argument parsing and the requested operations."""
+        import argparse
         parser = argparse.ArgumentParser(prog="relay_board.py",
                                          description="Control relay-boards: " +
                                          "by serial-number (arguments: -s, -o, -c), " +
                                          "or by json pattern file (argumments: -f, -p)",
                                          epilog="")
         parser.add_argument('-s', '--serial-number', help="Serial-number in single operation mode")
+        parser.add_argument('-P', '--port',
+                            help="Serial port of the relay-board in single operation mode " +
+                            "(skips the device enumeration)")
         parser.add_argument('-o', '--open',
                             help="Relay ids to be opened \"-o 1,2,3\" or \"-o all\"")
         parser.add_argument('-c', '--close',
                             help="Relay ids to be closed \"-c 1,2,3\" or \"-c all\"")
         parser.add_argument('-f', '--file', help="File path to json file containing the patterns")
         parser.add_argument('-p', '--pattern', help="Pattern to be used in provided json file")
+        parser.add_argument('-q', '--sequence',
+                            help="Sequence to be run from provided json file")
         parser.add_argument('-r', '--reset', action='store_true',
                             help="Reset relay-board(s) first, before executing the operations")
         parser.add_argument('-i', '--info', action='store_true',
                             help="Print info about relay-board(s)")
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help="Number of relay-boards driven in parallel (default: 1)")
+        parser.add_argument('--compiled', action='store_true',
+                            help="Use compiled pattern plans, cached by pattern file content")
+        parser.add_argument('--library', action='store_true',
+                            help="Load the pattern file as library (includes, patterns parsed " +
+                            "on demand)")
+        parser.add_argument('--validate', action='store_true',
+                            help="Validate all patterns of the pattern file and exit")
+        parser.add_argument('--sync', action='store_true',
+                            help="Switch the relay-boards of a pattern at almost the same " +
+                            "moment (synchronized commit) and log the write skew")
+        parser.add_argument('-v', '--verify', action='store_true',
+                            help="Verify the relay state by reading it back after writing")
+        parser.add_argument('--timeout-floor', type=float, metavar='SECONDS',
+                            help="Lower bound of the adaptive response timeout " +
+                            f"(default: {AdaptiveTimeout.FLOOR})")
+        parser.add_argument('--timeout-ceiling', type=float, metavar='SECONDS',
+                            help="Upper bound of the adaptive response timeout " +
+                            f"(default: {AdaptiveTimeout.CEILING})")
+        parser.add_argument('--record', metavar='DIR',
+                            help="Record the serial traffic of each relay-board to a trace " +
+                            "file in DIR (created if missing, implies --no-daemon)")
+        parser.add_argument('--replay', action='append', metavar='FILE',
+                            help="Run against a recorded trace file instead of the relay-board " +
+                            "(repeatable, implies --no-daemon)")
+        parser.add_argument('--replay-speed', type=float, default=1.0, metavar='FACTOR',
+                            help="Replay speed relative to the recording, 0: as fast as " +
+                            "possible (default: 1)")
+        parser.add_argument('--stats', nargs='?', const='-', metavar='FILE',
+                            help="Print latency statistics as json (to FILE if given)")
+        parser.add_argument('--stats-prometheus', metavar='FILE',
+                            help="Write latency statistics to FILE in prometheus text format")
+        parser.add_argument('--stream', action='store_true',
+                            help="Execute json commands from stdin (one per line, see " +
+                            "RelayBoardSession), write one json result per line to stdout")
+        parser.add_argument('--daemon', action='store_true',
+                            help="Run as daemon keeping the relay-boards open")
+        parser.add_argument('--no-daemon', action='store_true',
+                            help="Don't forward the operations to a running daemon")
+        parser.add_argument('--socket', help="Unix socket path of the daemon")
+        parser.add_argument('--shadow', action='store_true',
+                            help="Daemon/stream caches the relay states and writes changed " +
+                            "relays only")
         args = parser.parse_args(args_list)
 
+        if ((args.stats is None) and (args.stats_prometheus is None)):
+            RelayBoard.main_args(parser, args)
+            return
+        stats.enable()
+        try:
+            RelayBoard.main_args(parser, args)
+        finally:
+            stats.enable(False)
+            if (args.stats == '-'):
+                module_logger.info(stats.to_json())
+            elif (args.stats is not None):
+                stats.write_file(args.stats, stats.to_json())
+            if (args.stats_prometheus is not None):
+                stats.write_file(args.stats_prometheus, stats.to_prometheus())
+
+    @staticmethod
+    def main_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+        """Execute the requested operations of the parsed arguments."""
+        if ((args.timeout_floor is not None) or (args.timeout_ceiling is not None)):
+            floor = AdaptiveTimeout.FLOOR if (args.timeout_floor is None) else args.timeout_floor
+            ceiling = AdaptiveTimeout.CEILING if (args.timeout_ceiling is None) \
+                else args.timeout_ceiling
+            try:
+                AdaptiveTimeout.assert_bounds(floor, ceiling)
+            except Exception as e:
+                parser.error(f"argument --timeout-floor/--timeout-ceiling: {e}")
+            # applied to the timeout of each relay-board used (see configure_timeouts)
+            args.timeout_floor = floor
+            args.timeout_ceiling = ceiling
+
+        if (args.record is not None):
+            try:
+                os.makedirs(args.record, exist_ok=True)
+            except OSError as e:
+                parser.error(f"argument --record: {e}")
+            Device.trace_dir = args.record
+        if (args.replay is not None):
+            serial_trace_module = RelayBoard.import_module("serial_trace")
+            for file in args.replay:
+                serial_trace_module.ReplayDevice.from_file(file, args.replay_speed).register()
+            args.no_daemon = True
+
+        if (args.daemon):
+            daemon_module = RelayBoard.import_module("relay_board_daemon")
+            daemon_module.RelayBoardDaemon(args.socket, args.shadow, args.timeout_floor,
+                                           args.timeout_ceiling).serve_forever()
+            return
+
+        if (args.compiled and args.library):
+            parser.error("argument --library: not allowed with argument --compiled")
+
+        if (args.validate):
+            if (args.file is None):
+                parser.error("argument --validate: requires -f/--file")
+            RelayBoard.main_validate(args)
+            return
+
         relay_board_pattern: Optional[RelayBoardPattern] = None
         pattern_str: Optional[str] = None
 
+        if (args.port is not None):
+            if (args.serial_number is None):
+                parser.error("argument -P/--port: requires -s/--serial-number")
+            RelayBoard.register_port(args.serial_number, args.port)
+
+        if (args.stream):
+            RelayBoard.main_stream(args)
+            return
+
+        if (RelayBoard.is_forwardable(args)):
+            # forward the operations to a running daemon, if available
+            client = RelayBoard.import_module("relay_board_daemon").RelayBoardClient(args.socket)
+            if (client.is_available()):
+                RelayBoard.main_client(client, args)
+                return
+
         if (args.serial_number is not None):
             # create a RelayBoardPattern object from the serial number
             open = RelayBoard.parse_state_arg(args.open)
@@ -183,32 +1136,95 @@ class RelayBoard():
             pattern_str = None  # uses first pattern by default
         elif (args.file is not None):
             # create a RelayBoardPattern object from the provided file
-            relay_board_pattern = RelayBoardPattern.from_file(args.file)
+            if (args.compiled):
+                relay_board_pattern = \
+                    RelayBoard.import_module("relay_board_plan").RelayBoardPlan.from_file(args.file)
+            elif (args.library):
+                relay_board_pattern = RelayBoard.import_module(
+                    "relay_board_library").RelayBoardLibrary.from_file(args.file)
+            else:
+                relay_board_pattern = RelayBoardPattern.from_file(args.file)
             pattern_str = args.pattern
         else:
             parser.print_help()
             sys.exit(1)
+        RelayBoard.configure_timeouts(relay_board_pattern.get_serial_numbers(),
+                                      args.timeout_floor, args.timeout_ceiling)
+
+        if (args.sequence is not None):
+            # run the sequence with the relay-boards kept open
+            RelayBoard.main_sequence(relay_board_pattern, args)
+            return
+
+        if (args.sync):
+            RelayBoard.main_sync(relay_board_pattern, pattern_str, args)
+            return
+
+        # execute the pattern, one worker per relay-board if requested
+        results = RelayBoard.run_pattern(relay_board_pattern, pattern_str,
+                                         reset=args.reset, info=args.info, jobs=args.jobs,
+                                         verify=args.verify)
+        RelayBoard.raise_for_results(results)
+
+
+class RelayBoardCommands():
+    """RelayBoardCommands class: a relay state compiled into encoded requests."""
+
+    def __init__(self, state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                 headers: List[str], data: bytes):
+        """Init a RelayBoardCommands object."""
+        self.state = state
+        self.headers = headers
+        self.data = data
+        # requests saved by coalescing (see RelayBoard.compile_state)
+        self.saved = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardCommands object."""
+        return str(self.__dict__)
 
-        # get the actual pattern (dict) from the relay_board_pattern object
-        pattern = relay_board_pattern.get_pattern(pattern_str)
-        # iterate over all aliases in the pattern
-        for alias in pattern:
-            # create relay_board object by serial_number
-            serial_number = relay_board_pattern.get_serial_number(alias)
-            relay_board = RelayBoard(serial_number)
-            # open the relay boards
-            relay_board.open()
-            # print info if required
-            if (args.info):
-                relay_board.print_info()
-            # reset if required
-            if (args.reset):
-                relay_board.reset()
-            # set the relay-board state
-            state = pattern[alias]
-            relay_board.write_relay_state(state)
-            # close the relay boards
-            relay_board.close()
+
+class RelayBoardEvent():
+    """RelayBoardEvent class.
+
+    kind "frame": a frame no request waited for (frame), "state": a relay state change
+    not written by the RelayBoard object (state, previous), "error": a failed poll (error).
+    """
+
+    def __init__(self, kind: str, serial_number: str, frame: Optional[str] = None,
+                 state: Optional[RelayState] = None, previous: Optional[RelayState] = None,
+                 error: Optional[Exception] = None):
+        """Init a RelayBoardEvent object."""
+        self.kind = kind
+        self.serial_number = serial_number
+        self.timestamp = time.time()
+        self.frame = frame
+        self.state = state
+        self.previous = previous
+        self.error = error
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardEvent object."""
+        return str(self.__dict__)
+
+
+class RelayBoardResult():
+    """RelayBoardResult class."""
+
+    def __init__(self, alias: str, serial_number: str):
+        """Init a RelayBoardResult object."""
+        self.alias = alias
+        self.serial_number = serial_number
+        self.error: Optional[Exception] = None
+        self.duration: float = 0.0
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardResult object."""
+        return str(self.__dict__)
+
+    def ok(self) -> bool:
+        """Return True if the alias was executed without error."""
+        return self.error is None
 
 
 class RelayBoardException(Exception):
@@ -217,5 +1233,11 @@ class RelayBoardException(Exception):
     pass
 
 
+class RelayBoardTimeoutException(RelayBoardException):
+    """RelayBoard exception class of a request without response."""
+
+    pass
+
+
 if __name__ == "__main__":
     RelayBoard.main(sys.argv[1:])
@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+"""relay_board_async.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from serial_number import SerialNumber  # type: ignore
+    from serial_interface_async import AsyncDevice  # type: ignore
+    from relay_board import (RelayBoard, RelayBoardException,  # type: ignore
+                             RelayBoardTimeoutException)
+    from relay_board_hardware import RelayBoardHardware  # type: ignore
+    from relay_board_timeout import AdaptiveTimeout  # type: ignore
+    from relay_state import RelayState  # type: ignore
+else:
+    from .serial_number import SerialNumber
+    from .serial_interface_async import AsyncDevice
+    from .relay_board import RelayBoard, RelayBoardException, RelayBoardTimeoutException
+    from .relay_board_hardware import RelayBoardHardware
+    from .relay_board_timeout import AdaptiveTimeout
+    from .relay_state import RelayState
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+
+class AsyncRelayBoard():
+    """AsyncRelayBoard class.
+
+    asyncio counterpart of RelayBoard, many relay-boards can be driven concurrently
+    from a single event loop (e.g. with asyncio.gather). Timeouts cancel the pending read.
+    Requests take the port lock like RelayBoard (see locked), RelayBoard and AsyncRelayBoard
+    objects of the same relay-board can be used together.
+    """
+
+    def __init__(self, serial_number: str):
+        """Init an AsyncRelayBoard object."""
+        self.serial_number = serial_number
+        decoded_serial_number = SerialNumber.decode(serial_number)
+        self.config_identifier = decoded_serial_number[2:4]
+        self.serial_device = AsyncDevice.by_serial_number(decoded_serial_number[4:12])
+        self.lock = asyncio.Lock()
+        self.timed_out = False
+        self.boot_time: Optional[float] = None
+        # shared with RelayBoard objects of the same relay-board
+        self.timeout = AdaptiveTimeout.by_serial_number(serial_number)
+
+    def __repr__(self) -> str:
+        """Return string representation of AsyncRelayBoard object."""
+        return str(self.__dict__)
+
+    def get_serial_number(self) -> str:
+        """Return serial-number of the relay-board."""
+        return self.serial_number
+
+    async def open(self) -> None:
+        """Open the relay-board, return when it's ready (closed again if it fails)."""
+        await self.serial_device.open(baudrate=115200)
+        try:
+            # rts before dtr, otherwise a reset occurs
+            self.serial_device.set_rts(True)
+            self.serial_device.set_dtr(True)
+            async with self.locked():
+                await self.wait_ready()
+        except BaseException:
+            # e.g. not ready or cancelled: don't keep the port
+            await self.serial_device.close()
+            raise
+
+    async def close(self) -> None:
+        """Close the relay-board."""
+        await self.serial_device.close()
+
+    async def reset(self) -> None:
+        """Reset the relay-board."""
+        async with self.locked():
+            self.serial_device.set_parity_none()
+            self.serial_device.set_dtr(True)
+            self.serial_device.set_rts(False)
+            await asyncio.sleep(RelayBoardHardware.RESET_PULSE)
+            self.serial_device.set_dtr(True)
+            self.serial_device.set_rts(True)
+            await self.wait_ready()
+
+    @asynccontextmanager
+    async def locked(self) -> AsyncIterator[None]:
+        """Hold the lock of this object and the port lock (see AsyncDevice.lock)."""
+        async with self.lock:
+            await self.serial_device.lock(RelayBoard.LOCK_TIMEOUT)
+            try:
+                yield
+            finally:
+                self.serial_device.unlock()
+
+    async def wait_ready(self, timeout: float = RelayBoard.READY_TIMEOUT) -> float:
+        """Probe the relay-board until it responds, return (and keep) the boot time.
+
+        See RelayBoard.wait_ready, the caller holds the lock.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        probe = RelayBoard.encode_request(RelayBoard.READY_PROBE)
+        prefix = (RelayBoard.RESPONSE_PREFIX + RelayBoard.READY_PROBE).encode("ascii")
+        wait = RelayBoard.READY_WAIT
+        probes = 0
+        self.serial_device.reset_input_buffer()
+        while True:
+            await self.serial_device.write(probe)
+            try:
+                await asyncio.wait_for(self.read_probe_response(prefix),
+                                       max(0.0, min(wait, deadline - time.monotonic())))
+                break
+            except asyncio.TimeoutError:
+                probes += 1
+            if (time.monotonic() >= deadline):
+                raise RelayBoardTimeoutException(f"Relay-board {self.serial_number} not ready " +
+                                                 f"after {timeout} s ({probes} probes)")
+            wait = min(wait * 2, RelayBoard.READY_WAIT_MAX)
+        self.boot_time = time.monotonic() - start
+        self.timed_out = (probes > 0)
+        return self.boot_time
+
+    async def read_probe_response(self, prefix: bytes) -> None:
+        """Read frames until the response to a probe (other frames are noise of the boot)."""
+        while (not (await self.serial_device.read_until(b"\n")).startswith(prefix)):
+            pass
+
+    async def request(self, request_header: str, request_payload: str = "",
+                      timeout: Optional[float] = None) -> str:
+        """Send request to relay-board and receive response (default: adaptive timeout)."""
+        results = await self.request_batch([(request_header, request_payload)], timeout)
+        RelayBoard.raise_for_batch(results)
+        return str(results[0])
+
+    async def request_batch(self, requests: List[Tuple[str, str]],
+                            timeout: Optional[float] = None) \
+            -> List[Union[str, RelayBoardException]]:
+        """Send requests back to back and receive their responses (see RelayBoard).
+
+        Unlike RelayBoard, requests without response are not retried.
+        """
+        results: List[Union[str, RelayBoardException]] = []
+        if (len(requests) == 0):
+            return results
+        headers = [header for (header, payload) in requests]
+        if (timeout is None):
+            timeout = self.timeout.get()
+        async with self.locked():
+            if (self.timed_out):
+                # drop late responses which would be taken for the next responses
+                self.timed_out = False
+                self.serial_device.reset_input_buffer()
+            await self.serial_device.write(b"".join(
+                [RelayBoard.encode_request(header, payload)
+                 for (header, payload) in requests]))
+            previous = time.monotonic()
+            i = 0
+            while (i < len(requests)):
+                try:
+                    response = await asyncio.wait_for(
+                        self.serial_device.read_until(b"\n"), timeout)
+                    received = time.monotonic()
+                    self.timeout.record(received - previous)
+                    previous = received
+                except asyncio.TimeoutError:
+                    # late responses must not be matched with the next requests
+                    self.timed_out = True
+                    response = b""
+                i = RelayBoard.match_response(headers, i, response, results)
+        return results
+
+    async def read_info(self) -> Dict[str, str]:
+        """Read meta-data information of the relay-board."""
+        results = await self.request_batch([("SERIAL", ""), ("HW", ""), ("FW", "")])
+        RelayBoard.raise_for_batch(results)
+        return {"serial_number": str(results[0]),
+                "hardware_version": str(results[1]),
+                "firmware_version": str(results[2])}
+
+    async def write_relay_state(self, state: Union[Dict[str, Union[str, List[int]]], RelayState],
+                                verify: bool = False) -> None:
+        """Write the relay state (and verify it by reading it back, if requested)."""
+        requests = RelayBoard.create_requests(
+            state, RelayBoardHardware.RELAY_COUNTS.get(self.config_identifier))
+        if (verify):
+            requests.append(("GET", ""))
+        results = await self.request_batch(requests)
+        RelayBoard.raise_for_batch(results)
+        if (verify):
+            RelayBoard.verify_relay_state(state, RelayBoard.parse_relay_state(str(results[-1])))
+
+    async def read_relay_state(self) -> RelayState:
+        """Read the relay state."""
+        return RelayBoard.parse_relay_state(await self.request("GET"))
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+"""relay_board_daemon.py module."""
+from __future__ import annotations
+import logging
+import os
+import socket
+import sys
+from typing import Any, Dict, Optional
+
+# create a module_logger and add sys.stdout handler
+module_logger = logging.getLogger("relay_board_daemon.py")
+module_logger.setLevel(logging.INFO)
+module_logger.addHandler(logging.StreamHandler(sys.stdout))
+
+
+class RelayBoardDaemon():
+    """RelayBoardDaemon class.
+
+    Serves a RelayBoardSession on a local unix socket. Each line received is a json
+    command (see RelayBoardSession), each line sent back is the json result.
+    """
+
+    SOCKET_ENV = "RELAY_BOARD_SOCKET"
+    SOCKET_NAME = "relay_board_py.sock"
+
+    def __init__(self, socket_path: Optional[str] = None, shadow: bool = False,
+                 timeout_floor: Optional[float] = None, timeout_ceiling: Optional[float] = None):
+        """Init a RelayBoardDaemon object (shadow, timeout bounds: see RelayBoardSession)."""
+        if (not hasattr(socket, "AF_UNIX")):
+            raise RelayBoardDaemonException("Unix sockets are not supported on this platform")
+        if __package__ is None or __package__ == "":
+            from relay_board_session import RelayBoardSession  # type: ignore
+        else:
+            from .relay_board_session import RelayBoardSession
+        self.socket_path = RelayBoardDaemon.get_socket_path(socket_path)
+        self.session = RelayBoardSession(shadow, timeout_floor, timeout_ceiling)
+        self.server: Optional[Any] = None
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardDaemon object."""
+        return str(self.__dict__)
+
+    def serve_forever(self) -> None:
+        """Serve requests until shutdown() is called or SIGINT/SIGTERM is received."""
+        import signal
+        import socketserver
+        import threading
+        if (RelayBoardClient(self.socket_path).is_available()):
+            raise RelayBoardDaemonException(f"Daemon already running on {self.socket_path}")
+        if (os.path.exists(self.socket_path)):
+            # stale socket of a daemon that wasn't shut down properly
+            os.remove(self.socket_path)
+        session = self.session
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    if (len(line.strip()) == 0):
+                        continue
+                    self.wfile.write((session.execute_json(line) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        if ((threading.current_thread() is threading.main_thread()) and
+                (signal.getsignal(signal.SIGTERM) == signal.SIG_DFL)):
+            # stop gracefully (close the relay-boards, remove the socket) on SIGTERM
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        # only the user may connect, from the moment the socket is created (mode 0600)
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        module_logger.info(f"Daemon listening on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.server.server_close()
+            self.session.close()
+            if (os.path.exists(self.socket_path)):
+                os.remove(self.socket_path)
+            module_logger.info("Daemon stopped")
+
+    def shutdown(self) -> None:
+        """Stop serve_forever (to be called from another thread)."""
+        if (self.server is not None):
+            self.server.shutdown()
+
+    @staticmethod
+    def get_socket_path(socket_path: Optional[str] = None) -> str:
+        """Return the socket path: argument, environment or per-user default."""
+        if (socket_path is not None):
+            return socket_path
+        if (os.environ.get(RelayBoardDaemon.SOCKET_ENV)):
+            return os.environ[RelayBoardDaemon.SOCKET_ENV]
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if (runtime_dir):
+            return os.path.join(runtime_dir, RelayBoardDaemon.SOCKET_NAME)
+        import tempfile
+        uid = os.getuid() if hasattr(os, "getuid") else 0
+        return os.path.join(tempfile.gettempdir(), f"relay_board_py-{uid}.sock")
+
+
+class RelayBoardClient():
+    """RelayBoardClient class."""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 30.0):
+        """Init a RelayBoardClient object."""
+        self.socket_path = RelayBoardDaemon.get_socket_path(socket_path)
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardClient object."""
+        return str(self.__dict__)
+
+    def is_available(self) -> bool:
+        """Return True if a daemon is listening on the socket."""
+        if ((not hasattr(socket, "AF_UNIX")) or (not os.path.exists(self.socket_path))):
+            return False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(self.socket_path)
+        except OSError:
+            return False
+        return True
+
+    def request(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a command to the daemon and return its result."""
+        import json
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(self.socket_path)
+                s.sendall((json.dumps(command) + "\n").encode("utf-8"))
+                with s.makefile("rb") as f:
+                    line = f.readline()
+        except OSError as e:
+            raise RelayBoardDaemonException(f"Daemon on {self.socket_path} failed: {e}")
+        if (len(line) == 0):
+            raise RelayBoardDaemonException(f"No response from daemon on {self.socket_path}")
+        return json.loads(line)
+
+
+class RelayBoardDaemonException(Exception):
+    """RelayBoardDaemon exception class."""
+
+    pass
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+"""relay_board_emulator.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from serial_interface import Device, device_registry  # type: ignore
+else:
+    from .serial_interface import Device, device_registry
+import argparse
+import logging
+import os
+import select
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# create a module_logger and add sys.stdout handler
+module_logger = logging.getLogger("relay_board_emulator.py")
+module_logger.setLevel(logging.INFO)
+module_logger.addHandler(logging.StreamHandler(sys.stdout))
+
+
+class RelayBoardEmulator():
+    """RelayBoardEmulator class.
+
+    Emulates the firmware of a relay-board (RB+ requests SERIAL, HW, FW, SET, ALL, GET)
+    on a pseudo-terminal (Linux/macOS). The port can be used like the serial-device of a
+    real relay-board, register() makes it available to the serial-number lookup of Device.
+    """
+
+    HARDWARE_VERSION = "1.10"
+    FIRMWARE_VERSION = "0.3"
+
+    def __init__(self, serial_number: str = "RB00EMU00001", relay_count: int = 10,
+                 latency: float = 0.0):
+        """Init a RelayBoardEmulator object (latency: seconds until each response)."""
+        self.serial_number = serial_number
+        self.relay_count = relay_count
+        self.latency = latency
+        self.relays: Dict[int, str] = {relay: "O" for relay in range(1, relay_count + 1)}
+        self.requests = 0
+        self.master_fd: Optional[int] = None
+        self.slave_fd: Optional[int] = None
+        self.port: Optional[str] = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.booted = 0.0
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardEmulator object."""
+        return str(self.__dict__)
+
+    def start(self) -> None:
+        """Create the pseudo-terminal and serve it in a background thread."""
+        import pty
+        import tty
+        self.master_fd, self.slave_fd = pty.openpty()
+        # no echo, no line editing: behave like a plain serial line
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True,
+                                       name=f"emulator-{self.serial_number}")
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Unregister, stop serving and close the pseudo-terminal."""
+        self.unregister()
+        self.running = False
+        if (self.thread is not None):
+            self.thread.join()
+            self.thread = None
+        for fd in [self.master_fd, self.slave_fd]:
+            if (fd is not None):
+                os.close(fd)
+        self.master_fd = None
+        self.slave_fd = None
+
+    def boot(self, boot_time: float) -> None:
+        """Emulate a boot: requests of the next boot_time seconds are ignored."""
+        self.booted = time.monotonic() + boot_time
+
+    def press_button(self) -> None:
+        """Emulate the user button: toggle all relays (nothing is reported)."""
+        for relay in self.relays:
+            self.relays[relay] = "C" if (self.relays[relay] == "O") else "O"
+
+    def send_frame(self, frame: str) -> None:
+        """Send an unsolicited frame (e.g. to test the handling of unexpected output)."""
+        os.write(self.master_fd, (frame + "\n").encode("ascii"))  # type: ignore
+
+    def register(self) -> None:
+        """Register the port at the serial-number lookup of Device (in this process)."""
+        device_registry.register(Device(self.port, serial_number=self.serial_number[4:12]))
+
+    def unregister(self) -> None:
+        """Unregister the port from the serial-number lookup of Device."""
+        device_registry.unregister(self.serial_number[4:12])
+
+    def serve(self) -> None:
+        """Read requests and write responses until stop() is called."""
+        buffer = b""
+        while (self.running):
+            try:
+                # wake up regularly to notice stop()
+                if (len(select.select([self.master_fd], [], [], 0.1)[0]) == 0):
+                    continue
+                data = os.read(self.master_fd, 4096)  # type: ignore
+            except OSError:
+                return
+            if (len(data) == 0):
+                return
+            buffer += data
+            while (b"\n" in buffer):
+                line, buffer = buffer.split(b"\n", 1)
+                response = self.handle(line.decode("ascii", errors="ignore").strip())
+                if (response is None):
+                    continue
+                if (self.latency > 0):
+                    time.sleep(self.latency)
+                try:
+                    os.write(self.master_fd, (response + "\n").encode("ascii"))  # type: ignore
+                except OSError:
+                    return
+
+    def handle(self, request: str) -> Optional[str]:
+        """Return the response to a request line (None: no response)."""
+        if ((not request.startswith("RB+")) or (time.monotonic() < self.booted)):
+            return None
+        self.requests += 1
+        header, _, payload = request[3:].partition("=")
+        if (header == "SERIAL"):
+            return f"+SERIAL={self.serial_number}"
+        if (header == "HW"):
+            return f"+HW={RelayBoardEmulator.HARDWARE_VERSION}"
+        if (header == "FW"):
+            return f"+FW={RelayBoardEmulator.FIRMWARE_VERSION}"
+        if (header == "GET"):
+            return "+GET=" + ",".join([f"{relay}-{self.relays[relay]}" for relay in self.relays])
+        if ((header == "ALL") and (payload in ["O", "C"])):
+            for relay in self.relays:
+                self.relays[relay] = payload
+            return "+ALL"
+        if (header == "SET"):
+            changes: Dict[int, str] = {}
+            try:
+                for entry in payload.split(","):
+                    relay, value = entry.split("-")
+                    if ((int(relay) not in self.relays) or (value not in ["O", "C"])):
+                        return "+ERR"
+                    changes[int(relay)] = value
+            except ValueError:
+                return "+ERR"
+            self.relays.update(changes)
+            return "+SET"
+        return "+ERR"
+
+    def get_relay_state(self) -> Dict[str, List[int]]:
+        """Return the emulated relay state."""
+        state: Dict[str, List[int]] = {"open": [], "close": []}
+        for relay in self.relays:
+            state["close" if (self.relays[relay] == "C") else "open"].append(relay)
+        return state
+
+    @staticmethod
+    def start_many(count: int, latency: float = 0.0, relay_count: int = 10,
+                   register: bool = True) -> List[RelayBoardEmulator]:
+        """Start (and register) count emulators with serial-numbers RB00EMU00001, ..."""
+        emulators = []
+        for i in range(count):
+            emulator = RelayBoardEmulator(f"RB00EMU{i + 1:05d}", relay_count, latency)
+            emulator.start()
+            if (register):
+                emulator.register()
+            emulators.append(emulator)
+        return emulators
+
+    @staticmethod
+    def main(args_list: List[str]):
+        """Run emulators until interrupted."""
+        parser = argparse.ArgumentParser(prog="relay_board_emulator.py",
+                                         description="Emulate relay-boards on pseudo-terminals")
+        parser.add_argument('-n', '--count', type=int, default=1,
+                            help="Number of emulated relay-boards (default: 1)")
+        parser.add_argument('-l', '--latency', type=float, default=0.0,
+                            help="Response latency in seconds (default: 0)")
+        args = parser.parse_args(args_list)
+        emulators = RelayBoardEmulator.start_many(args.count, args.latency, register=False)
+        for emulator in emulators:
+            module_logger.info(f"{emulator.serial_number} {emulator.port}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for emulator in emulators:
+                emulator.stop()
+
+
+if __name__ == "__main__":
+    RelayBoardEmulator.main(sys.argv[1:])
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+"""relay_board_group.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board import RelayBoard, RelayBoardException, RelayBoardResult  # type: ignore
+    from relay_board_pattern import RelayBoardPattern  # type: ignore
+    from relay_board_sync import RelayBoardSync, RelayBoardSyncReport  # type: ignore
+    from relay_state import RelayState  # type: ignore
+else:
+    from .relay_board import RelayBoard, RelayBoardException, RelayBoardResult
+    from .relay_board_pattern import RelayBoardPattern
+    from .relay_board_sync import RelayBoardSync, RelayBoardSyncReport
+    from .relay_state import RelayState
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+class RelayBoardGroup():
+    """RelayBoardGroup class.
+
+    The relays of many (cascaded) relay-boards as one address space. A relay is addressed
+    by "alias:relay" (e.g. "rack3:7") or by a flat index, counting the relays of all
+    relay-boards in alias definition order, starting at 1. Each operation is split per
+    relay-board, every relay-board receives one combined command, and the relay-boards
+    are driven concurrently, or synchronized (see commit).
+    """
+
+    ADDRESS_SEPARATOR = ":"
+
+    def __init__(self, aliases: Dict[str, str], jobs: Optional[int] = None,
+                 shadow: bool = False):
+        """Init a RelayBoardGroup object (jobs: concurrent relay-boards, default: all)."""
+        if (len(aliases) == 0):
+            raise RelayBoardException("A RelayBoardGroup requires at least one alias")
+        self.aliases = dict(aliases)
+        self.jobs = len(aliases) if (jobs is None) else jobs
+        if (self.jobs < 1):
+            raise RelayBoardException(f"Invalid number of jobs {self.jobs}, must be at least 1")
+        self.relay_boards: Dict[str, RelayBoard] = {}
+        self.relay_counts: Dict[str, int] = {}
+        # flat index of relay 1 of each alias is offsets[alias] + 1
+        self.offsets: Dict[str, int] = {}
+        relay_count = 0
+        for alias in self.aliases:
+            relay_board = RelayBoard(self.aliases[alias], shadow)
+            self.relay_boards[alias] = relay_board
+            self.relay_counts[alias] = relay_board.get_relay_count()
+            self.offsets[alias] = relay_count
+            relay_count += self.relay_counts[alias]
+        self.relay_count = relay_count
+        self.executor: Optional[Any] = None
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardGroup object."""
+        return str(self.__dict__)
+
+    @staticmethod
+    def from_pattern(relay_board_pattern: RelayBoardPattern, jobs: Optional[int] = None,
+                     shadow: bool = False) -> RelayBoardGroup:
+        """Create RelayBoardGroup of all aliases of a RelayBoardPattern."""
+        return RelayBoardGroup(relay_board_pattern.aliases, jobs, shadow)
+
+    def open(self, reset: bool = False) -> None:
+        """Open (and optionally reset) all relay-boards."""
+        from concurrent.futures import ThreadPoolExecutor
+        if (self.executor is None):
+            self.executor = ThreadPoolExecutor(max_workers=self.jobs,
+                                               thread_name_prefix="relay-board-group")
+
+        def open_relay_board(alias: str) -> None:
+            relay_board = self.relay_boards[alias]
+            relay_board.open()
+            if (reset):
+                relay_board.reset()
+
+        try:
+            self.run(open_relay_board, list(self.aliases))
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Close all relay-boards (errors of relay-boards not opened are ignored)."""
+        for alias in self.relay_boards:
+            try:
+                self.relay_boards[alias].close()
+            except Exception:
+                pass
+        if (self.executor is not None):
+            self.executor.shutdown()
+            self.executor = None
+
+    def resolve(self, address: Union[str, int]) -> Tuple[str, int]:
+        """Return (alias, relay) of an address "alias:relay" or flat index."""
+        if (isinstance(address, str) and (RelayBoardGroup.ADDRESS_SEPARATOR in address)):
+            alias, _, relay_str = address.rpartition(RelayBoardGroup.ADDRESS_SEPARATOR)
+            if (alias not in self.relay_counts):
+                raise RelayBoardException(f"Unknown alias {alias} of address {address}")
+            try:
+                relay = int(relay_str)
+            except ValueError:
+                raise RelayBoardException(f"Invalid relay of address {address}") from None
+            if ((relay < 1) or (relay > self.relay_counts[alias])):
+                raise RelayBoardException(f"Relay {relay} of address {address} out of range " +
+                                          f"1..{self.relay_counts[alias]}")
+            return (alias, relay)
+        try:
+            index = int(address)
+        except ValueError:
+            raise RelayBoardException(f"Invalid address {address}") from None
+        if ((index < 1) or (index > self.relay_count)):
+            raise RelayBoardException(f"Address {index} out of range 1..{self.relay_count}")
+        for alias in self.offsets:
+            if (index <= self.offsets[alias] + self.relay_counts[alias]):
+                return (alias, index - self.offsets[alias])
+        raise RelayBoardException(f"Address {index} out of range 1..{self.relay_count}")
+
+    def get_index(self, alias: str, relay: int) -> int:
+        """Return the flat index of a relay."""
+        return self.offsets[alias] + relay
+
+    def split_state(self, state: Dict[str, Union[str, List[Union[str, int]]]]) \
+            -> Dict[str, RelayState]:
+        """Split a group relay state into the combined relay state of each relay-board.
+
+        state uses the keys of a relay state ("open", "close") with "all" or a list of
+        addresses. Keys are applied in order, a later key overrides an earlier one, so
+        each relay-board gets a single RelayState (one SET or ALL request).
+        """
+        RelayBoard.assert_state_keys(state)  # type: ignore
+        states: Dict[str, RelayState] = {}
+        for key in state:
+            entry = state[key]
+            bits: Dict[str, int] = {}
+            if (isinstance(entry, str)):
+                if (entry != "all"):
+                    raise RelayBoardException(f"Invalid entry {entry} of {key}")
+                for alias in self.relay_counts:
+                    bits[alias] = RelayState.get_mask(self.relay_counts[alias])
+            else:
+                for address in entry:
+                    alias, relay = self.resolve(address)
+                    bits[alias] = bits.get(alias, 0) | (1 << (relay - 1))
+            for alias in bits:
+                update = RelayState(bits[alias], bits[alias] if (key == "close") else 0)
+                states[alias] = states[alias].union(update) if (alias in states) else update
+        # keep the alias definition order
+        return {alias: states[alias] for alias in self.aliases if (alias in states)}
+
+    def write_relay_state(self, state: Dict[str, Union[str, List[Union[str, int]]]],
+                          verify: bool = False, synchronized: bool = False) \
+            -> Optional[RelayBoardSyncReport]:
+        """Write a group relay state, one combined command per affected relay-board.
+
+        With synchronized, the relay-boards switch at almost the same moment (see commit).
+        """
+        states = self.split_state(state)
+        if (synchronized):
+            return self.commit(states, verify)
+        self.run(lambda alias: self.relay_boards[alias].write_relay_state(states[alias], verify),
+                 list(states))
+        return None
+
+    def commit(self, states: Dict[str, Any], verify: bool = False) -> RelayBoardSyncReport:
+        """Write the relay state of each alias synchronized (see RelayBoardSync).
+
+        All writes are released together after every relay-board is prepared, the report
+        holds the measured write skew. Raises the error of a failed alias.
+        """
+        for alias in states:
+            if (alias not in self.relay_boards):
+                raise RelayBoardException(f"Unknown alias {alias}")
+        report = RelayBoardSync(self.relay_boards).commit(states, verify)
+        RelayBoard.raise_for_results(report.results)
+        return report
+
+    def read_relay_state(self, refresh: bool = False) -> Dict[str, RelayState]:
+        """Read the relay state of all relay-boards concurrently, by alias."""
+        return self.run(lambda alias: self.relay_boards[alias].read_relay_state(refresh),
+                        list(self.aliases))
+
+    def read_relays(self, addresses: Optional[List[Union[str, int]]] = None,
+                    refresh: bool = False) -> Dict[Union[str, int], str]:
+        """Read relays by address ("open"/"close"), only the involved relay-boards are read.
+
+        Without addresses, all relays are returned by "alias:relay".
+        """
+        if (addresses is None):
+            addresses = [f"{alias}{RelayBoardGroup.ADDRESS_SEPARATOR}{relay}"
+                         for alias in self.aliases
+                         for relay in range(1, self.relay_counts[alias] + 1)]
+        resolved = [self.resolve(address) for address in addresses]
+        aliases = [alias for alias in self.aliases if (alias in dict(resolved))]
+        states = self.run(lambda alias: self.relay_boards[alias].read_relay_state(refresh),
+                          aliases)
+        return {address: states[alias].get_relay(relay)  # type: ignore
+                for address, (alias, relay) in zip(addresses, resolved)}
+
+    def run(self, function: Callable[[str], Any], aliases: List[str]) -> Dict[str, Any]:
+        """Call function with each alias, concurrently once opened, return the values by alias.
+
+        Raises the error of a failed alias (see RelayBoard.raise_for_results).
+        """
+        results: Dict[str, RelayBoardResult] = {}
+        values: Dict[str, Any] = {}
+
+        def run_alias(alias: str) -> None:
+            result = RelayBoardResult(alias, self.aliases[alias])
+            start = time.monotonic()
+            try:
+                values[alias] = function(alias)
+            except Exception as e:
+                result.error = e
+            result.duration = time.monotonic() - start
+            results[alias] = result
+
+        if ((self.executor is None) or (len(aliases) == 1)):
+            for alias in aliases:
+                run_alias(alias)
+        else:
+            for future in [self.executor.submit(run_alias, alias) for alias in aliases]:
+                future.result()
+        RelayBoard.raise_for_results({alias: results[alias] for alias in aliases})
+        return {alias: values[alias] for alias in aliases}
@@ -2,19 +2,29 @@
 """relay_board_hardware.py module."""
 if __package__ is None or __package__ == "":
     from serial_interface import Device  # type: ignore
+    from relay_board_stats import stats  # type: ignore
 else:
     from .serial_interface import Device
+    from .relay_board_stats import stats
 import time
+from typing import Callable, ContextManager, Optional
 
 
 class RelayBoardHardware():
     """RelayBoardHardware class."""
 
+    # time the reset line is held active
+    RESET_PULSE = 0.02
+
+    # number of relays by board-config (config_identifier), e.g. RB-1-10
+    RELAY_COUNTS = {"00": 10}
+
     def __init__(self, config_identifier: str, serial_device_number: str):
         """Init a RelayBoardHardware object."""
-        # config_identifier is not used yet, for future purposes
+        # config_identifier determines the board-config (e.g. the number of relays)
         self.config_identifier: str = config_identifier
-        self.serial_device: Device = Device.by_serial_number(serial_device_number)
+        # own port handle: relay-board objects of the same port share the port lock only
+        self.serial_device: Device = Device.by_serial_number(serial_device_number).copy()
 
     def __repr__(self) -> str:
         """Return string representation of RelayBoardHardware object."""
@@ -22,16 +32,22 @@ class RelayBoardHardware():
 
     def open(self) -> None:
         """Open the serial-device."""
+        start = time.perf_counter() if stats.enabled else 0.0
         self.serial_device.open(baudrate=115200)
         # rts before dtr, otherwise a reset occurs
         self.serial_device.set_rts(True)
         self.serial_device.set_dtr(True)
-        time.sleep(0.02)
+        if (stats.enabled):
+            stats.record("hardware.open", time.perf_counter() - start)
 
     def close(self) -> None:
         """Close the serial-device."""
         self.serial_device.close()
 
+    def write(self, b: bytes) -> None:
+        """Write bytes wrapper."""
+        self.serial_device.write(b)
+
     def write_str(self, s: str) -> None:
         """Write string wrapper."""
         self.serial_device.write(s.encode("ascii"))
@@ -42,12 +58,50 @@ class RelayBoardHardware():
         b = self.serial_device.read_until(expected.encode("ascii"), size, timeout)
         return b.decode("ascii", errors="ignore")
 
+    def read_frame(self, deadline: float, separator: bytes = b"\n") -> bytes:
+        """Read frame wrapper (deadline of the monotonic clock)."""
+        return self.serial_device.read_frame(deadline, separator)
+
+    def reset_input_buffer(self) -> None:
+        """Reset input buffer wrapper."""
+        self.serial_device.reset_input_buffer()
+
+    def locked(self, timeout: Optional[float] = None) -> ContextManager[Device]:
+        """Port lock wrapper (context manager, see Device.locked)."""
+        return self.serial_device.locked(timeout)
+
+    def is_present(self) -> bool:
+        """Is present wrapper (False if the port is gone)."""
+        return self.serial_device.is_present()
+
+    def is_open(self) -> bool:
+        """Return True if the serial-device is open."""
+        ser = self.serial_device.ser
+        return (ser is not None) and ser.is_open
+
+    def start_reader(self, on_frame: Callable[[bytes], None],
+                     on_idle: Optional[Callable[[], None]] = None,
+                     idle_interval: Optional[float] = None,
+                     on_exit: Optional[Callable[[], None]] = None) -> None:
+        """Start reader wrapper (see Device.start_reader)."""
+        self.serial_device.start_reader(on_frame, on_idle, idle_interval, on_exit)
+
+    def stop_reader(self) -> None:
+        """Stop reader wrapper."""
+        self.serial_device.stop_reader()
+
+    def post_frame(self, frame: bytes) -> None:
+        """Post frame wrapper (frame for the reader)."""
+        self.serial_device.post_frame(frame)
+
     def reset(self) -> None:
-        """Reset of relay-board mcu."""
+        """Reset of relay-board mcu (returns when released, not when booted)."""
+        start = time.perf_counter() if stats.enabled else 0.0
         self.serial_device.set_parity_none()
         self.serial_device.set_dtr(True)
         self.serial_device.set_rts(False)
-        time.sleep(0.02)
+        time.sleep(RelayBoardHardware.RESET_PULSE)
         self.serial_device.set_dtr(True)
         self.serial_device.set_rts(True)
-        time.sleep(0.02)
+        if (stats.enabled):
+            stats.record("hardware.reset", time.perf_counter() - start)
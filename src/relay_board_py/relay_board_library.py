@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+"""relay_board_library.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board_pattern import RelayBoardPattern, RelayBoardPatternException  # type: ignore
+    from relay_board_plan import RelayBoardPlan  # type: ignore
+else:
+    from .relay_board_pattern import RelayBoardPattern, RelayBoardPatternException
+    from .relay_board_plan import RelayBoardPlan
+from array import array
+from collections.abc import Mapping
+import hashlib
+import itertools
+import json
+import marshal
+import os
+import re
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+class RelayBoardLibrary(RelayBoardPattern):
+    """RelayBoardLibrary class.
+
+    A RelayBoardPattern of one or more pattern files ("includes": list of files, relative
+    to the including file). Only aliases, sequences and the byte offsets of the patterns
+    are read when loading (see RelayBoardPatternIndex), a pattern is parsed and validated
+    when it's used. validate() checks all patterns. The offsets of each file are cached,
+    keyed by path, size and modification time of the file.
+    """
+
+    # increment if the cached index format changes
+    VERSION = 1
+
+    def __init__(self, aliases: Dict[str, str], patterns: RelayBoardPatternIndex,
+                 sequences: Dict[str, List[Dict[str, Any]]]):
+        """Init a RelayBoardLibrary object (the patterns are validated on demand)."""
+        RelayBoardPattern.assert_aliases_format(aliases)
+        RelayBoardPattern.assert_sequences_format(patterns, sequences)
+        self.aliases = aliases
+        self.patterns = patterns  # type: ignore
+        self.sequences = sequences
+
+    def validate(self) -> int:
+        """Parse and validate all patterns, return the number of patterns."""
+        for name in self.patterns:
+            self.patterns[name]
+        return len(self.patterns)
+
+    @staticmethod
+    def from_file(file: str, cache_dir: Optional[str] = None) -> RelayBoardLibrary:
+        """Create RelayBoardLibrary from a pattern file and its includes."""
+        aliases: Dict[str, str] = {}
+        indexed: List[Tuple[str, List[str], bytes]] = []
+        names: Set[str] = set()
+        sequences: Dict[str, List[Dict[str, Any]]] = {}
+        files = [os.path.abspath(file)]
+        seen: Set[str] = set()
+        while (len(files) > 0):
+            path = files.pop(0)
+            if (path in seen):
+                continue
+            seen.add(path)
+            index = RelayBoardLibrary.load_index(path, cache_dir)
+            for alias in index["aliases"]:
+                serial_number = index["aliases"][alias]
+                if (aliases.setdefault(alias, serial_number) != serial_number):
+                    raise RelayBoardPatternException(f"Alias {alias} redefined in {path}")
+            if (not names.isdisjoint(index["names"])):
+                name = [name for name in index["names"] if (name in names)][0]
+                raise RelayBoardPatternException(f"Pattern {name} redefined in {path}")
+            names.update(index["names"])
+            indexed.append((path, index["names"], index["offsets"]))
+            for name in index["sequences"]:
+                if (name in sequences):
+                    raise RelayBoardPatternException(f"Sequence {name} redefined in {path}")
+                sequences[name] = index["sequences"][name]
+            for include in index["includes"]:
+                files.append(os.path.join(os.path.dirname(path), include))
+        if (len(names) == 0):
+            raise RelayBoardPatternException("No patterns defined")
+        return RelayBoardLibrary(aliases, RelayBoardPatternIndex(aliases, indexed), sequences)
+
+    @staticmethod
+    def load_index(file: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+        """Return the index of a pattern file, from the cache if the file is unchanged."""
+        try:
+            st = os.stat(file)
+        except OSError as e:
+            raise RelayBoardPatternException(f"Couldn't read {file}: {e}") from None
+        key = [RelayBoardLibrary.VERSION, file, st.st_size, st.st_mtime_ns]
+        cache_file = os.path.join(RelayBoardPlan.get_cache_dir(cache_dir),
+                                  hashlib.sha256(file.encode("utf-8")).hexdigest() + ".index")
+        try:
+            with open(cache_file, "rb") as f:
+                data: Any = marshal.loads(f.read())
+            if (data["key"] == key):
+                return data["index"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
+        with open(file, "rb") as f:
+            index = RelayBoardLibrary.index_file(f.read(), file)
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump({"key": key, "index": index}, f)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+        return index
+
+    @staticmethod
+    def index_file(content: bytes, file: str = "<pattern file>") -> Dict[str, Any]:
+        """Index a pattern file: aliases, sequences, includes, names and offsets of the patterns.
+
+        The patterns are skipped by the json decoder without being validated or kept.
+        The content is decoded as latin-1, so string offsets are byte offsets.
+        """
+        doc = content.decode("latin-1")
+        decoder = json.JSONDecoder()
+        whitespace = re.compile(r"[ \t\n\r]*")
+        index: Dict[str, Any] = {"aliases": {}, "sequences": {}, "includes": []}
+        names: List[str] = []
+        offsets = array("q")
+
+        def skip(i: int, expected: Optional[str] = None) -> int:
+            i = whitespace.match(doc, i).end()  # type: ignore
+            if (expected is not None):
+                if (doc[i:i + 1] != expected):
+                    raise RelayBoardPatternException(f"Invalid pattern file {file}: " +
+                                                     f"expected '{expected}' at {i}")
+                i = whitespace.match(doc, i + 1).end()  # type: ignore
+            return i
+
+        def raw_end(i: int) -> int:
+            try:
+                return decoder.raw_decode(doc, i)[1]
+            except json.JSONDecodeError as e:
+                raise RelayBoardPatternException(f"Invalid pattern file {file}: {e}") from None
+
+        def decode(i: int) -> Tuple[Any, int]:
+            end = raw_end(i)
+            # decode again from the original (utf-8) bytes
+            return (json.loads(content[i:end]), end)
+
+        def index_object(i: int, member: Callable[[str, int], int]) -> int:
+            """Call member(key, offset of value) -> end of value for each member, return end."""
+            i = skip(i, "{")
+            while (doc[i:i + 1] != "}"):
+                key, i = decode(i)
+                i = skip(member(key, skip(i, ":")))
+                if (doc[i:i + 1] == ","):
+                    i = skip(i + 1)
+                elif (doc[i:i + 1] != "}"):
+                    raise RelayBoardPatternException(f"Invalid pattern file {file}: " +
+                                                     f"expected ',' or '}}' at {i}")
+            return i + 1
+
+        def pattern_member(name: str, i: int) -> int:
+            end = raw_end(i)
+            names.append(name)
+            offsets.extend([i, end])
+            return end
+
+        def top_member(key: str, i: int) -> int:
+            if (key == "patterns"):
+                return index_object(i, pattern_member)
+            if (key in ["aliases", "sequences", "includes"]):
+                index[key], end = decode(i)
+                return end
+            return raw_end(i)
+
+        index_object(0, top_member)
+        if (len(set(names)) != len(names)):
+            raise RelayBoardPatternException(f"Invalid pattern file {file}: duplicate pattern")
+        index["names"] = names
+        index["offsets"] = offsets.tobytes()
+        return index
+
+
+class RelayBoardPatternIndex(Mapping):
+    """RelayBoardPatternIndex class.
+
+    Read-only mapping of pattern names to patterns, each pattern is read from its file
+    offsets, parsed and validated on first access.
+    """
+
+    def __init__(self, aliases: Dict[str, str], files: List[Tuple[str, List[str], bytes]]):
+        """Init a RelayBoardPatternIndex object.
+
+        files: (file, pattern names, start and end offset of each pattern as array("q") bytes)
+        """
+        self.aliases = aliases
+        self.files = [file for (file, names, offsets) in files]
+        self.names = [names for (file, names, offsets) in files]
+        self.positions = [dict(zip(names, range(len(names)))) for (file, names, offsets) in files]
+        self.offsets = []
+        for (file, names, offsets) in files:
+            self.offsets.append(array("q"))
+            self.offsets[-1].frombytes(offsets)
+        self.loaded: Dict[str, Any] = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardPatternIndex object."""
+        return f"RelayBoardPatternIndex({self.files}, {len(self)} patterns)"
+
+    def __getitem__(self, name: str) -> Any:
+        """Return the (validated) pattern."""
+        if (name in self.loaded):
+            return self.loaded[name]
+        for n, positions in enumerate(self.positions):
+            i = positions.get(name)
+            if (i is not None):
+                break
+        else:
+            raise KeyError(name)
+        start = self.offsets[n][2 * i]
+        end = self.offsets[n][2 * i + 1]
+        with open(self.files[n], "rb") as f:
+            f.seek(start)
+            pattern = json.loads(f.read(end - start))
+        try:
+            RelayBoardPattern.assert_patterns_format(self.aliases, {name: pattern})
+        except RelayBoardPatternException as e:
+            raise RelayBoardPatternException(f"Pattern {name} in {self.files[n]}: {e}") from None
+        self.loaded[name] = pattern
+        return pattern
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the pattern names."""
+        return itertools.chain.from_iterable(self.names)
+
+    def __len__(self) -> int:
+        """Return the number of patterns."""
+        return sum([len(names) for names in self.names])
+
+    def __contains__(self, name: object) -> bool:
+        """Return whether a pattern is defined (without loading it)."""
+        return any([name in positions for positions in self.positions])
@@ -3,21 +3,33 @@
 from __future__ import annotations
 if __package__ is None or __package__ == "":
     from serial_number import SerialNumber  # type: ignore
+    from relay_board_hardware import RelayBoardHardware  # type: ignore
+    from relay_state import RelayState, RelayStateException  # type: ignore
 else:
     from .serial_number import SerialNumber
-import json
-from typing import List, Dict, Any, Optional, Union
+    from .relay_board_hardware import RelayBoardHardware
+    from .relay_state import RelayState, RelayStateException
+from typing import List, Dict, Any, Optional, Set, Union
 
 
 class RelayBoardPattern():
-    """RelayBoardPattern class."""
+    """RelayBoardPattern class.
 
-    def __init__(self, aliases: Dict[str, str], patterns: Dict[str, Any]):
+    The state of an alias in a pattern is kept as given: the dict form of the json file
+    ("all" is resolved by the board-config, see get_relay_states) or a RelayState.
+    """
+
+    def __init__(self, aliases: Dict[str, str], patterns: Dict[str, Any],
+                 sequences: Optional[Dict[str, List[Dict[str, Any]]]] = None):
         """Init a RelayBoardPattern object."""
+        if (sequences is None):
+            sequences = {}
         RelayBoardPattern.assert_aliases_format(aliases)
         RelayBoardPattern.assert_patterns_format(aliases, patterns)
+        RelayBoardPattern.assert_sequences_format(patterns, sequences)
         self.aliases = aliases
         self.patterns = patterns
+        self.sequences = sequences
 
     def __repr__(self) -> str:
         """Return string representation of RelayBoardConfig object."""
@@ -36,9 +48,8 @@ class RelayBoardPattern():
             raise RelayBoardPatternException(f"Couldn't find alias {alias}")
         return self.aliases[alias]
 
-    def get_pattern(self, pattern_str: Optional[str] = None) \
-            -> Dict[str, Dict[str, Union[str, List[int]]]]:
-        """Return the pattern."""
+    def get_pattern_name(self, pattern_str: Optional[str] = None) -> str:
+        """Return the name of the pattern to be used."""
         # if None and only one pattern defined, this pattern is automatically used
         if (pattern_str is None):
             keys = list(self.patterns.keys())
@@ -48,7 +59,43 @@ class RelayBoardPattern():
         # assert that pattern is available
         if (pattern_str not in self.patterns):
             raise RelayBoardPatternException(f"Couldn't find pattern_str {pattern_str}")
-        return self.patterns[pattern_str]
+        return pattern_str
+
+    def get_pattern(self, pattern_str: Optional[str] = None) \
+            -> Dict[str, Dict[str, Union[str, List[int]]]]:
+        """Return the pattern."""
+        return self.patterns[self.get_pattern_name(pattern_str)]
+
+    def get_commands(self, pattern_str: Optional[str] = None) -> Dict[str, Any]:
+        """Return the pattern in the form written to the relay-boards (see RelayBoardPlan)."""
+        return self.get_pattern(pattern_str)
+
+    def get_relay_states(self, pattern_str: Optional[str] = None) -> Dict[str, RelayState]:
+        """Return the pattern as RelayState of each alias ("all" by the board-config)."""
+        pattern = self.get_pattern(pattern_str)
+        states: Dict[str, RelayState] = {}
+        for alias in pattern:
+            config_identifier = SerialNumber.decode(self.get_serial_number(alias))[2:4]
+            relay_count = RelayBoardHardware.RELAY_COUNTS.get(config_identifier)
+            all_mask = None if (relay_count is None) else RelayState.get_mask(relay_count)
+            try:
+                states[alias] = RelayState.from_dict(pattern[alias], all_mask)
+            except RelayStateException as e:
+                raise RelayBoardPatternException(f"Alias {alias}: {e}") from None
+        return states
+
+    def get_sequence(self, sequence_str: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the sequence (list of steps)."""
+        # if None and only one sequence defined, this sequence is automatically used
+        if (sequence_str is None):
+            keys = list(self.sequences.keys())
+            if (len(keys) != 1):
+                raise RelayBoardPatternException(f"Sequence undetermined. Use one of {keys}")
+            sequence_str = keys[0]
+        # assert that sequence is available
+        if (sequence_str not in self.sequences):
+            raise RelayBoardPatternException(f"Couldn't find sequence_str {sequence_str}")
+        return self.sequences[sequence_str]
 
     @staticmethod
     def assert_aliases_format(aliases: Dict[str, str]) -> None:
@@ -56,17 +103,17 @@ class RelayBoardPattern():
         if (len(aliases.keys()) == 0):
             raise RelayBoardPatternException("No aliases defined")
         # check the serial-number format for all aliases, and also for duplicates
-        seen_serial_numbers: List[str] = []
+        seen_serial_numbers: Set[str] = set()
         for alias in aliases:
             serial_number = aliases[alias]
             SerialNumber.decode(serial_number)
             if (serial_number in seen_serial_numbers):
                 raise RelayBoardPatternException(f"Duplicate serial-number {serial_number}")
-            seen_serial_numbers.append(serial_number)
+            seen_serial_numbers.add(serial_number)
 
     @staticmethod
     def assert_patterns_format(aliases: Dict[str, str], patterns: Dict[str, Any]) -> None:
-        """Assert the format of patterns."""
+        """Assert the format of patterns (states in dict form or RelayState)."""
         if (len(patterns.keys()) == 0):
             raise RelayBoardPatternException("No patterns defined")
 
@@ -78,6 +125,10 @@ class RelayBoardPattern():
                 if alias not in aliases:
                     raise RelayBoardPatternException(f"alias {alias} not defined")
                 states = pattern[alias]
+                if (isinstance(states, RelayState)):
+                    continue
+                if (not isinstance(states, dict)):
+                    raise RelayBoardPatternException(f"Invalid state type {type(states)}")
                 for state in states:
                     available_states = ["open", "close"]
                     if state not in available_states:
@@ -94,28 +145,62 @@ class RelayBoardPattern():
                     else:
                         raise RelayBoardPatternException(f"Invalid type {type(entry)}")
 
+    @staticmethod
+    def assert_sequences_format(patterns: Dict[str, Any],
+                                sequences: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Assert the format of sequences."""
+        for s in sequences:
+            sequence = sequences[s]
+            if ((type(sequence) is not list) or (len(sequence) == 0)):
+                raise RelayBoardPatternException(f"Sequence {s} must be a non-empty list")
+            for step in sequence:
+                if ((type(step) is not dict) or (len(step.keys()) != 1)):
+                    raise RelayBoardPatternException(f"Invalid step {step} in sequence {s}. " +
+                                                     "Must be {\"pattern\": ...} or " +
+                                                     "{\"wait\": ...}")
+                if ("pattern" in step):
+                    if (step["pattern"] not in patterns):
+                        raise RelayBoardPatternException(f"pattern {step['pattern']} not defined")
+                elif ("wait" in step):
+                    wait = step["wait"]
+                    if ((type(wait) not in [int, float]) or (wait < 0)):
+                        raise RelayBoardPatternException(f"Invalid wait {wait} in sequence {s}")
+                else:
+                    raise RelayBoardPatternException(f"Unknown step {step} in sequence {s}")
+
     @staticmethod
     def from_file(file: str) -> RelayBoardPattern:
         """Create RelayBoardPattern from file."""
         with open(file, "r") as f:
-            j = json.load(f)
+            return RelayBoardPattern.from_str(f.read())
+
+    @staticmethod
+    def from_str(s: str) -> RelayBoardPattern:
+        """Create RelayBoardPattern from json string."""
+        import json
+        j = json.loads(s)
         if "aliases" not in j:
             raise RelayBoardPatternException("aliases not in json file")
         if "patterns" not in j:
             raise RelayBoardPatternException("patterns not in json file")
 
-        return RelayBoardPattern(j["aliases"], j["patterns"])
+        return RelayBoardPattern(j["aliases"], j["patterns"], j.get("sequences"))
 
     @staticmethod
     def from_serial_number(serial_number: str,
                            open: Optional[Union[str, List[int]]] = None,
-                           close: Optional[Union[str, List[int]]] = None) -> RelayBoardPattern:
-        """Create RelayBoardPattern from serial-number."""
-        state = {}
+                           close: Optional[Union[str, List[int]]] = None,
+                           relay_state: Optional[RelayState] = None) -> RelayBoardPattern:
+        """Create RelayBoardPattern from serial-number (state: open/close or relay_state)."""
+        state: Union[RelayState, Dict[str, Union[str, List[int]]]] = {}
+        if (relay_state is not None):
+            if ((open is not None) or (close is not None)):
+                raise RelayBoardPatternException("Either open/close or relay_state")
+            state = relay_state
         if (open is not None):
-            state["open"] = open
+            state["open"] = open  # type: ignore
         if (close is not None):
-            state["close"] = close
+            state["close"] = close  # type: ignore
         # create a simply named alias and pattern
         aliases = {"A": serial_number}
         patterns = {"P": {"A": state}}
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""relay_board_plan.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board import RelayBoard, RelayBoardCommands  # type: ignore
+    from relay_board_pattern import RelayBoardPattern  # type: ignore
+else:
+    from .relay_board import RelayBoard, RelayBoardCommands
+    from .relay_board_pattern import RelayBoardPattern
+import collections
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class RelayBoardPlan(RelayBoardPattern):
+    """RelayBoardPlan class.
+
+    A RelayBoardPattern whose patterns are also compiled into the encoded requests of each
+    relay-board (RelayBoardCommands, see get_commands). Plans are cached on disk, keyed by
+    the content hash of the pattern file, so a cached pattern file is neither parsed nor
+    validated again.
+    """
+
+    # increment if the cached format changes
+    VERSION = 3
+    CACHE_ENV = "RELAY_BOARD_CACHE"
+
+    # in-process cache (e.g. for the daemon): content hash -> plan, least recently used first
+    CACHE_SIZE = 16
+    plans: collections.OrderedDict[str, RelayBoardPlan] = collections.OrderedDict()
+    plans_lock = threading.Lock()
+
+    def __init__(self, aliases: Dict[str, str], patterns: Dict[str, Any],
+                 sequences: Dict[str, List[Dict[str, Any]]], compiled: Dict[str, bytes],
+                 digest: Optional[str] = None, saved: int = 0):
+        """Init a RelayBoardPlan object (without validation, see compile).
+
+        compiled maps each pattern name to its marshalled compiled pattern, which is only
+        unmarshalled when the pattern is used. saved is the number of requests saved by
+        coalescing the relay states of all patterns.
+        """
+        self.aliases = aliases
+        self.patterns = patterns
+        self.sequences = sequences
+        self.compiled = compiled
+        self.digest = digest
+        self.saved = saved
+
+    def get_commands(self, pattern_str: Optional[str] = None) \
+            -> Dict[str, RelayBoardCommands]:  # type: ignore
+        """Return the compiled pattern."""
+        pattern_str = self.get_pattern_name(pattern_str)
+        pattern: Dict[str, RelayBoardCommands] = {}
+        for alias, (state, headers, data) in marshal.loads(self.compiled[pattern_str]).items():
+            pattern[alias] = RelayBoardCommands(state, headers, data)
+        return pattern
+
+    @staticmethod
+    def compile(relay_board_pattern: RelayBoardPattern,
+                digest: Optional[str] = None) -> RelayBoardPlan:
+        """Compile all patterns of a (validated) RelayBoardPattern.
+
+        The relay states are coalesced by the relay count of the board-config of each alias
+        (see RelayBoard.create_requests).
+        """
+        patterns: Dict[str, Dict[str, Any]] = {}
+        compiled_patterns: Dict[str, bytes] = {}
+        relay_counts = {alias: RelayBoard.get_board_relay_count(
+                            relay_board_pattern.get_serial_number(alias))
+                        for alias in relay_board_pattern.aliases}
+        saved = 0
+        for p in relay_board_pattern.patterns:
+            pattern = relay_board_pattern.patterns[p]
+            compiled: Dict[str, Any] = {}
+            for alias in pattern:
+                commands = RelayBoard.compile_state(pattern[alias], relay_counts.get(alias))
+                saved += commands.saved
+                # dict form of the states (RelayState objects can't be marshalled)
+                compiled[alias] = (dict(commands.state), commands.headers, commands.data)
+            patterns[p] = {alias: dict(pattern[alias]) for alias in pattern}
+            compiled_patterns[p] = marshal.dumps(compiled)
+        return RelayBoardPlan(dict(relay_board_pattern.aliases), patterns,
+                              dict(relay_board_pattern.sequences), compiled_patterns, digest,
+                              saved)
+
+    @staticmethod
+    def from_file(file: str, cache_dir: Optional[str] = None) -> RelayBoardPlan:
+        """Create RelayBoardPlan from a pattern file, using and updating the cache."""
+        with open(file, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        with RelayBoardPlan.plans_lock:
+            if (digest in RelayBoardPlan.plans):
+                RelayBoardPlan.plans.move_to_end(digest)
+                return RelayBoardPlan.plans[digest]
+        cache_file = os.path.join(RelayBoardPlan.get_cache_dir(cache_dir),
+                                  RelayBoardPlan.get_cache_name(digest))
+        plan = RelayBoardPlan.load(cache_file, digest)
+        if (plan is None):
+            plan = RelayBoardPlan.compile(RelayBoardPattern.from_str(content.decode("utf-8")),
+                                          digest)
+            plan.save(cache_file)
+        with RelayBoardPlan.plans_lock:
+            RelayBoardPlan.plans[digest] = plan
+            while (len(RelayBoardPlan.plans) > RelayBoardPlan.CACHE_SIZE):
+                RelayBoardPlan.plans.popitem(last=False)
+        return plan
+
+    @staticmethod
+    def load(cache_file: str, digest: str) -> Optional[RelayBoardPlan]:
+        """Load a plan from a cache file, return None if not available or not usable."""
+        try:
+            with open(cache_file, "rb") as f:
+                data: Any = marshal.load(f)
+            if ((data["version"] != RelayBoardPlan.VERSION) or (data["digest"] != digest)):
+                return None
+            return RelayBoardPlan(data["aliases"], data["patterns"], data["sequences"],
+                                  data["compiled"], digest, data["saved"])
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return None
+
+    def save(self, cache_file: str) -> None:
+        """Save the plan to a cache file (a failing cache is not an error)."""
+        data = {"version": RelayBoardPlan.VERSION, "digest": self.digest,
+                "aliases": self.aliases, "patterns": self.patterns,
+                "sequences": self.sequences, "compiled": self.compiled, "saved": self.saved}
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            # write to a temporary file first, concurrent readers never see partial plans
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(data, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, ValueError):
+            pass
+        finally:
+            # a failed dump or replace leaves the temporary file behind
+            if (os.path.exists(tmp_file)):
+                os.unlink(tmp_file)
+
+    @staticmethod
+    def get_cache_name(digest: str) -> str:
+        """Return the cache file name (marshal format depends on the python version)."""
+        python_version = f"{sys.version_info[0]}{sys.version_info[1]}"
+        return f"{digest}-{RelayBoardPlan.VERSION}-py{python_version}.plan"
+
+    @staticmethod
+    def get_cache_dir(cache_dir: Optional[str] = None) -> str:
+        """Return the cache directory: argument, environment or per-user default."""
+        if (cache_dir is not None):
+            return cache_dir
+        if (os.environ.get(RelayBoardPlan.CACHE_ENV)):
+            return os.environ[RelayBoardPlan.CACHE_ENV]
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+        return os.path.join(os.path.expanduser(cache_home), "relay_board_py")
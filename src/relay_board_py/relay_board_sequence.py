@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+"""relay_board_sequence.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board import RelayBoard  # type: ignore
+    from relay_board_pattern import RelayBoardPattern  # type: ignore
+    from relay_board_sync import RelayBoardSync  # type: ignore
+else:
+    from .relay_board import RelayBoard
+    from .relay_board_pattern import RelayBoardPattern
+    from .relay_board_sync import RelayBoardSync
+import time
+from typing import Dict, List, Optional
+
+
+class RelayBoardSequencer():
+    """RelayBoardSequencer class.
+
+    Executes the steps of a sequence against deadlines of the monotonic clock, relative
+    to the start of the sequence, with all involved relay-boards kept open. A late step
+    doesn't shift the deadlines of the following steps. With synchronized, the relay-boards
+    of a step are written by a synchronized commit (see RelayBoardSync).
+    """
+
+    # remaining time until a deadline which is busy-waited instead of slept
+    SPIN_TIME = 0.001
+
+    def __init__(self, relay_board_pattern: RelayBoardPattern, synchronized: bool = False):
+        """Init a RelayBoardSequencer object."""
+        self.relay_board_pattern = relay_board_pattern
+        self.synchronized = synchronized
+        self.relay_boards: Dict[str, RelayBoard] = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardSequencer object."""
+        return str(self.__dict__)
+
+    def open(self, sequence_str: Optional[str] = None, reset: bool = False,
+             info: bool = False) -> None:
+        """Open (and optionally reset) all relay-boards used by the sequence."""
+        for step in self.relay_board_pattern.get_sequence(sequence_str):
+            if ("pattern" not in step):
+                continue
+            for alias in self.relay_board_pattern.get_pattern(step["pattern"]):
+                if (alias in self.relay_boards):
+                    continue
+                relay_board = RelayBoard(self.relay_board_pattern.get_serial_number(alias))
+                relay_board.open()
+                self.relay_boards[alias] = relay_board
+                if (info):
+                    relay_board.print_info()
+                if (reset):
+                    relay_board.reset()
+
+    def close(self) -> None:
+        """Close all relay-boards."""
+        for alias in self.relay_boards:
+            self.relay_boards[alias].close()
+        self.relay_boards = {}
+
+    def run(self, sequence_str: Optional[str] = None) -> List[RelayBoardStepResult]:
+        """Run the sequence, stop at the first failing step, return the result of each step."""
+        sequence = self.relay_board_pattern.get_sequence(sequence_str)
+        # resolve all patterns before the timing starts
+        patterns = {}
+        for step in sequence:
+            if ("pattern" in step):
+                patterns[step["pattern"]] = self.relay_board_pattern.get_commands(
+                    step["pattern"])
+        results: List[RelayBoardStepResult] = []
+        planned = 0.0
+        start = time.monotonic()
+        for index, step in enumerate(sequence):
+            if ("wait" in step):
+                planned += step["wait"]
+                continue
+            RelayBoardSequencer.sleep_until(start + planned)
+            result = RelayBoardStepResult(index, step["pattern"], planned,
+                                          time.monotonic() - start)
+            try:
+                pattern = patterns[step["pattern"]]
+                if (self.synchronized):
+                    report = RelayBoardSync(self.relay_boards).commit(pattern)
+                    result.skew = report.skew
+                    RelayBoard.raise_for_results(report.results)
+                else:
+                    for alias in pattern:
+                        self.relay_boards[alias].write_relay_state(pattern[alias])
+            except Exception as e:
+                result.error = e
+            result.duration = time.monotonic() - start - result.actual
+            results.append(result)
+            if (result.error is not None):
+                break
+        return results
+
+    @staticmethod
+    def sleep_until(deadline: float) -> None:
+        """Sleep until deadline (monotonic clock), busy-wait the last SPIN_TIME."""
+        remaining = deadline - time.monotonic()
+        if (remaining > RelayBoardSequencer.SPIN_TIME):
+            time.sleep(remaining - RelayBoardSequencer.SPIN_TIME)
+        while (time.monotonic() < deadline):
+            pass
+
+    @staticmethod
+    def run_sequence(relay_board_pattern: RelayBoardPattern, sequence_str: Optional[str] = None,
+                     reset: bool = False, info: bool = False,
+                     synchronized: bool = False) -> List[RelayBoardStepResult]:
+        """Open the relay-boards, run the sequence and close the relay-boards."""
+        sequencer = RelayBoardSequencer(relay_board_pattern, synchronized)
+        try:
+            sequencer.open(sequence_str, reset, info)
+            return sequencer.run(sequence_str)
+        finally:
+            sequencer.close()
+
+
+class RelayBoardStepResult():
+    """RelayBoardStepResult class: planned vs. actual start time of a step (in seconds)."""
+
+    def __init__(self, index: int, pattern: str, planned: float, actual: float):
+        """Init a RelayBoardStepResult object."""
+        self.index = index
+        self.pattern = pattern
+        self.planned = planned
+        self.actual = actual
+        self.duration = 0.0
+        # write skew of a synchronized step
+        self.skew: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardStepResult object."""
+        return str(self.__dict__)
+
+    def get_jitter(self) -> float:
+        """Return the deviation of the actual from the planned start time."""
+        return self.actual - self.planned
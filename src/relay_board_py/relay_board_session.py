@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+"""relay_board_session.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board import RelayBoard, RelayBoardTimeoutException  # type: ignore
+    from relay_board_pattern import RelayBoardPattern  # type: ignore
+    from relay_board_plan import RelayBoardPlan  # type: ignore
+    from relay_board_library import RelayBoardLibrary  # type: ignore
+    from serial_interface import SerialInterfaceException  # type: ignore
+else:
+    from .relay_board import RelayBoard, RelayBoardTimeoutException
+    from .relay_board_pattern import RelayBoardPattern
+    from .relay_board_plan import RelayBoardPlan
+    from .relay_board_library import RelayBoardLibrary
+    from .serial_interface import SerialInterfaceException
+from contextlib import contextmanager
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+
+class RelayBoardSession():
+    """RelayBoardSession class.
+
+    Keeps relay-boards open across commands. A command is a dict with a "cmd" key
+    ("set", "get", "pattern", "reset", "info") and returns a result dict, which is
+    always json serializable. The "id" of a command is returned in its result. Pattern
+    files are kept loaded until they change. Commands of different relay-boards run
+    concurrently, those of a relay-board one after another (see locked).
+    """
+
+    COMMANDS = ["set", "get", "pattern", "reset", "info"]
+
+    def __init__(self, shadow: bool = False, timeout_floor: Optional[float] = None,
+                 timeout_ceiling: Optional[float] = None):
+        """Init a RelayBoardSession object (shadow: see RelayBoard).
+
+        timeout_floor and timeout_ceiling bound the adaptive timeouts of the relay-boards
+        (see AdaptiveTimeout.configure).
+        """
+        self.shadow = shadow
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling
+        self.relay_boards: Dict[str, RelayBoard] = {}
+        # (file, kind) -> ((size, mtime), pattern file)
+        self.pattern_files: Dict[Tuple[str, str], Tuple[Tuple[int, int], RelayBoardPattern]] = {}
+        # serial-number -> lock held while the relay-board is used
+        self.board_locks: Dict[str, threading.RLock] = {}  # type: ignore
+        # protects the dicts above, never held while a relay-board is used
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardSession object."""
+        return str(self.__dict__)
+
+    def get_board_lock(self, serial_number: str) -> threading.RLock:  # type: ignore
+        """Return the lock of a relay-board (created on first use)."""
+        with self.lock:
+            return self.board_locks.setdefault(serial_number, threading.RLock())
+
+    @contextmanager
+    def locked(self, serial_number: str) -> Iterator[RelayBoard]:
+        """Hold the lock of a relay-board and provide it opened (see get_relay_board).
+
+        The relay-board is closed and reopened with the next command only if its port
+        failed or it didn't respond, it stays open on invalid arguments.
+        """
+        with self.get_board_lock(serial_number):
+            try:
+                yield self.get_relay_board(serial_number)
+            except (SerialInterfaceException, RelayBoardTimeoutException, OSError):
+                # reopen the relay-board with the next command
+                self.discard(serial_number)
+                raise
+
+    def get_relay_board(self, serial_number: str) -> RelayBoard:
+        """Return the opened relay-board of serial_number, open it if required (lock held)."""
+        with self.lock:
+            relay_board = self.relay_boards.get(serial_number)
+        if (relay_board is None):
+            relay_board = RelayBoard(serial_number, self.shadow)
+            RelayBoard.configure_timeouts([serial_number], self.timeout_floor,
+                                          self.timeout_ceiling)
+            relay_board.open()
+            with self.lock:
+                self.relay_boards[serial_number] = relay_board
+        return relay_board
+
+    def discard(self, serial_number: str) -> None:
+        """Close and forget a relay-board (e.g. after it failed or was unplugged)."""
+        with self.get_board_lock(serial_number):
+            with self.lock:
+                relay_board = self.relay_boards.pop(serial_number, None)
+            if (relay_board is not None):
+                try:
+                    relay_board.close()
+                except Exception:
+                    pass
+
+    def close(self) -> None:
+        """Close all relay-boards of the session."""
+        with self.lock:
+            serial_numbers = list(self.relay_boards)
+        for serial_number in serial_numbers:
+            self.discard(serial_number)
+
+    def execute(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a command and return its result, errors are returned as well."""
+        start = time.monotonic()
+        cmd = command.get("cmd")
+        try:
+            if (cmd not in RelayBoardSession.COMMANDS):
+                raise RelayBoardSessionException(
+                    f"Unknown command \"{cmd}\". Must be one of {RelayBoardSession.COMMANDS}")
+            result = getattr(self, "cmd_" + cmd)(command)
+            result["ok"] = True
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        result["cmd"] = cmd
+        if ("id" in command):
+            result["id"] = command["id"]
+        result["duration"] = time.monotonic() - start
+        return result
+
+    def execute_json(self, line: Union[str, bytes]) -> str:
+        """Execute a command given as json object, return the result as json (one line)."""
+        import json
+        try:
+            command = json.loads(line)
+            if (type(command) is not dict):
+                raise RelayBoardSessionException("Command must be a json object")
+        except (ValueError, RelayBoardSessionException) as e:
+            return json.dumps({"ok": False, "error": f"{type(e).__name__}: {e}"})
+        return json.dumps(self.execute(command))
+
+    def run_board(self, serial_number: str, state: Optional[Dict[str, Any]] = None,
+                  reset: bool = False, info: bool = False,
+                  verify: bool = False) -> Dict[str, Any]:
+        """Run info, reset and write (in this order) on an opened relay-board (see locked)."""
+        result: Dict[str, Any] = {}
+        with self.locked(serial_number) as relay_board:
+            if (info):
+                result["info"] = relay_board.read_info()
+            if (reset):
+                relay_board.reset()
+                result["boot_time"] = relay_board.boot_time
+            if (state is not None):
+                relay_board.write_relay_state(state, verify)
+        return result
+
+    def cmd_set(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Set the relay state of a relay-board."""
+        return self.run_board(command["serial_number"], command.get("state", {}),
+                              command.get("reset", False), command.get("info", False),
+                              command.get("verify", False))
+
+    def cmd_get(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the relay state of a relay-board."""
+        with self.locked(command["serial_number"]) as relay_board:
+            state = relay_board.read_relay_state(command.get("refresh", False))
+        return {"state": state.to_dict()}
+
+    def cmd_reset(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Reset a relay-board."""
+        return self.run_board(command["serial_number"], reset=True)
+
+    def cmd_info(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Read the meta-data information of a relay-board."""
+        return self.run_board(command["serial_number"], info=True)
+
+    def cmd_pattern(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a pattern of a pattern file, in definition order."""
+        file = os.path.abspath(os.path.expanduser(command["file"]))
+        if (command.get("compiled", False)):
+            relay_board_pattern = self.load_pattern_file(file, "compiled")
+        elif (command.get("library", False)):
+            relay_board_pattern = self.load_pattern_file(file, "library")
+        else:
+            relay_board_pattern = self.load_pattern_file(file, "pattern")
+        pattern = relay_board_pattern.get_commands(command.get("pattern"))
+        aliases: Dict[str, Dict[str, Any]] = {}
+        for alias in pattern:
+            serial_number = relay_board_pattern.get_serial_number(alias)
+            aliases[alias] = self.run_board(serial_number, pattern[alias],
+                                            command.get("reset", False),
+                                            command.get("info", False),
+                                            command.get("verify", False))
+        return {"aliases": aliases}
+
+    def load_pattern_file(self, file: str, kind: str) -> RelayBoardPattern:
+        """Return the loaded pattern file ("pattern", "compiled" or "library"), reload on change."""
+        st = os.stat(file)
+        key = (st.st_size, st.st_mtime_ns)
+        with self.lock:
+            cached = self.pattern_files.get((file, kind))
+        if ((cached is not None) and (cached[0] == key)):
+            return cached[1]
+        if (kind == "compiled"):
+            relay_board_pattern = RelayBoardPlan.from_file(file)
+        elif (kind == "library"):
+            relay_board_pattern = RelayBoardLibrary.from_file(file)
+        else:
+            relay_board_pattern = RelayBoardPattern.from_file(file)
+        with self.lock:
+            self.pattern_files[(file, kind)] = (key, relay_board_pattern)
+        return relay_board_pattern
+
+    @staticmethod
+    def commands_from_args(serial_number: Optional[str], open: Any, close: Any,
+                           file: Optional[str], pattern: Optional[str],
+                           reset: bool, info: bool,
+                           verify: bool = False) -> List[Dict[str, Any]]:
+        """Translate the command line arguments of RelayBoard.main into commands."""
+        if (serial_number is not None):
+            state: Dict[str, Any] = {}
+            if (open is not None):
+                state["open"] = open
+            if (close is not None):
+                state["close"] = close
+            return [{"cmd": "set", "serial_number": serial_number, "state": state,
+                     "reset": reset, "info": info, "verify": verify}]
+        if (file is not None):
+            return [{"cmd": "pattern", "file": os.path.abspath(file), "pattern": pattern,
+                     "reset": reset, "info": info, "verify": verify}]
+        return []
+
+
+class RelayBoardSessionException(Exception):
+    """RelayBoardSession exception class."""
+
+    pass
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+"""relay_board_stats.py module."""
+from __future__ import annotations
+import os
+import threading
+from typing import Any, Dict, List
+
+
+class Histogram():
+    """Histogram class: count, sum, min, max and bucket counts of latencies (seconds)."""
+
+    # upper bounds of the buckets in seconds (the last bucket is +Inf)
+    BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+               0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+    def __init__(self):
+        """Init a Histogram object."""
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(Histogram.BUCKETS) + 1)
+
+    def __repr__(self) -> str:
+        """Return string representation of Histogram object."""
+        return str(self.__dict__)
+
+    def record(self, value: float) -> None:
+        """Record a value."""
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for i, bound in enumerate(Histogram.BUCKETS):
+            if (value <= bound):
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the histogram as json serializable dict (buckets are cumulative)."""
+        cumulative: Dict[str, int] = {}
+        total = 0
+        for i, bound in enumerate(Histogram.BUCKETS + ["+Inf"]):  # type: ignore
+            total += self.buckets[i]
+            cumulative[str(bound)] = total
+        return {"count": self.count, "sum": self.sum,
+                "min": self.min if (self.count > 0) else None,
+                "max": self.max if (self.count > 0) else None,
+                "mean": (self.sum / self.count) if (self.count > 0) else None,
+                "buckets": cumulative}
+
+
+class Stats():
+    """Stats class.
+
+    Latency histograms per phase (e.g. "device.open", "request.GET") and event counters
+    (e.g. "error.GET"). Disabled by default: the instrumented code only checks the
+    enabled attribute and doesn't even read the clock.
+    """
+
+    def __init__(self):
+        """Init a Stats object."""
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of Stats object."""
+        return str(self.__dict__)
+
+    def enable(self, enabled: bool = True) -> None:
+        """Enable (or disable) recording."""
+        self.enabled = enabled
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a latency of phase name."""
+        with self.lock:
+            if (name not in self.histograms):
+                self.histograms[name] = Histogram()
+            self.histograms[name].record(seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Count an event."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all statistics as json serializable dict."""
+        with self.lock:
+            return {"latencies": {name: self.histograms[name].to_dict()
+                                  for name in sorted(self.histograms)},
+                    "counters": dict(sorted(self.counters.items()))}
+
+    def to_json(self) -> str:
+        """Return all statistics as json string."""
+        import json
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """Return all statistics in the prometheus text exposition format."""
+        lines: List[str] = []
+        name = "relay_board_latency_seconds"
+        lines.append(f"# HELP {name} Latency of relay-board operations.")
+        lines.append(f"# TYPE {name} histogram")
+        d = self.to_dict()
+        for phase in d["latencies"]:
+            histogram = d["latencies"][phase]
+            for bound in histogram["buckets"]:
+                lines.append(f"{name}_bucket{{phase=\"{phase}\",le=\"{bound}\"}} " +
+                             f"{histogram['buckets'][bound]}")
+            lines.append(f"{name}_sum{{phase=\"{phase}\"}} {histogram['sum']}")
+            lines.append(f"{name}_count{{phase=\"{phase}\"}} {histogram['count']}")
+        name = "relay_board_events_total"
+        lines.append(f"# HELP {name} Number of relay-board events.")
+        lines.append(f"# TYPE {name} counter")
+        for event in d["counters"]:
+            lines.append(f"{name}{{event=\"{event}\"}} {d['counters'][event]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write_file(file: str, content: str) -> None:
+        """Write a file atomically (e.g. for the prometheus node-exporter textfile collector)."""
+        import tempfile
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)))
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_file, 0o644)
+        os.replace(tmp_file, file)
+
+
+stats = Stats()
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""relay_board_sync.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from relay_board import RelayBoard, RelayBoardCommands, RelayBoardResult  # type: ignore
+    from relay_board_stats import stats  # type: ignore
+    from relay_state import RelayState  # type: ignore
+else:
+    from .relay_board import RelayBoard, RelayBoardCommands, RelayBoardResult
+    from .relay_board_stats import stats
+    from .relay_state import RelayState
+from contextlib import ExitStack
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class RelayBoardSync():
+    """RelayBoardSync class.
+
+    Synchronized commit of relay states to several open relay-boards, in three phases:
+    prepare compiles the requests of every relay-board and locks all ports (in port order,
+    so concurrent commits can't deadlock), then the writes are released back to back from
+    a single thread once every relay-board is prepared, and only then the responses are
+    collected. The write skew is the spread of the write completion times.
+    """
+
+    def __init__(self, relay_boards: Dict[str, RelayBoard]):
+        """Init a RelayBoardSync object (relay-boards by alias)."""
+        self.relay_boards = relay_boards
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardSync object."""
+        return str(self.__dict__)
+
+    def commit(self, states: Dict[str, Union[Dict[str, Union[str, List[int]]], RelayState,
+                                             RelayBoardCommands]],
+               verify: bool = False) -> RelayBoardSyncReport:
+        """Write the relay state of each alias synchronized, return the report.
+
+        Nothing is written if a relay state can't be compiled. Failed aliases are reported
+        by their result (see RelayBoard.raise_for_results).
+        """
+        report = RelayBoardSyncReport()
+        start = time.perf_counter()
+        prepared: Dict[str, Tuple[RelayBoardCommands, Optional[RelayState]]] = {}
+        for alias in states:
+            prepared[alias] = self.relay_boards[alias].prepare_relay_state(states[alias], verify)
+            report.results[alias] = RelayBoardResult(alias, self.relay_boards[alias].serial_number)
+        # unchanged relay-boards (shadow state) take no part
+        writes = [alias for alias in prepared if (len(prepared[alias][0].headers) > 0)]
+        batches: Dict[str, List[Any]] = {}
+        with ExitStack() as stack:
+            for alias in sorted(writes, key=self.get_port):
+                stack.enter_context(self.relay_boards[alias].hardware.locked(
+                    RelayBoard.LOCK_TIMEOUT))
+            for alias in writes:
+                relay_board = self.relay_boards[alias]
+                # the cache is invalid until the write succeeded
+                relay_board.shadow_state = None
+                relay_board.drop_late_responses()
+            report.prepare = time.perf_counter() - start
+            # barrier: all relay-boards are prepared
+            written: Dict[str, float] = {}
+            sent: Dict[str, float] = {}
+            for alias in writes:
+                try:
+                    self.relay_boards[alias].hardware.write(prepared[alias][0].data)
+                except Exception as e:
+                    report.results[alias].error = e
+                    continue
+                written[alias] = time.perf_counter()
+                sent[alias] = time.monotonic()
+            # collect the responses, they were sent concurrently
+            for alias in written:
+                try:
+                    batches[alias] = self.relay_boards[alias].receive_batch(
+                        prepared[alias][0].headers, start=written[alias], sent=sent[alias])
+                except Exception as e:
+                    report.results[alias].error = e
+        if (len(written) > 0):
+            first = min(written.values())
+            report.writes = {alias: written[alias] - first for alias in written}
+            report.skew = max(written.values()) - first
+        for alias in batches:
+            relay_board = self.relay_boards[alias]
+            commands, expected = prepared[alias]
+            try:
+                results = relay_board.retry_batch(commands.headers, commands.data, batches[alias])
+                relay_board.finish_relay_state(commands.state, results, verify, expected)
+            except Exception as e:
+                report.results[alias].error = e
+            report.results[alias].duration = time.perf_counter() - written[alias]
+        report.duration = time.perf_counter() - start
+        if (stats.enabled):
+            stats.record("sync.prepare", report.prepare)
+            stats.record("sync.skew", report.skew)
+            stats.record("sync.commit", report.duration)
+        return report
+
+    def get_port(self, alias: str) -> str:
+        """Return the port of the relay-board of alias (symlinks resolved)."""
+        return os.path.realpath(self.relay_boards[alias].hardware.serial_device.port)
+
+
+class RelayBoardSyncReport():
+    """RelayBoardSyncReport class: timing of a synchronized commit (in seconds)."""
+
+    def __init__(self):
+        """Init a RelayBoardSyncReport object."""
+        # compile and lock, until the writes are released
+        self.prepare = 0.0
+        # write completion of each written alias, relative to the first one
+        self.writes: Dict[str, float] = {}
+        self.skew = 0.0
+        self.duration = 0.0
+        self.results: Dict[str, RelayBoardResult] = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayBoardSyncReport object."""
+        return str(self.__dict__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the timing and the errors as json serializable dict."""
+        return {"prepare": self.prepare, "writes": self.writes, "skew": self.skew,
+                "duration": self.duration,
+                "errors": {alias: str(self.results[alias].error) for alias in self.results
+                           if (self.results[alias].error is not None)}}
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""relay_board_timeout.py module."""
+from __future__ import annotations
+from collections import deque
+import threading
+from typing import Any, Deque, Dict, List, Optional
+
+
+class AdaptiveTimeout():
+    """AdaptiveTimeout class.
+
+    Response timeout of a relay-board derived from its measured round trip times: the
+    PERCENTILE of the last SAMPLES round trips (their maximum while fewer than MIN_SAMPLES
+    are measured) times FACTOR, bounded by floor and ceiling. Without measurements, the
+    ceiling is used. Retries wait BACKOFF times longer (see get_retry). One object per
+    serial-number is shared within the process (see by_serial_number), so the measurements
+    outlive the RelayBoard objects.
+    """
+
+    SAMPLES = 64
+    MIN_SAMPLES = 8
+    PERCENTILE = 0.99
+    FACTOR = 4.0
+    # FTDI based relay-boards answer within the 16 ms latency timer
+    FLOOR = 0.05
+    CEILING = 0.5
+    # the timeout is recomputed after this many new round trips
+    UPDATE_INTERVAL = 8
+    # a retry waits this much longer than the attempt before, up to the ceiling
+    BACKOFF = 2.0
+
+    timeouts: Dict[str, AdaptiveTimeout] = {}
+    timeouts_lock = threading.Lock()
+
+    def __init__(self, floor: Optional[float] = None, ceiling: Optional[float] = None):
+        """Init an AdaptiveTimeout object (default: FLOOR, CEILING)."""
+        floor = AdaptiveTimeout.FLOOR if (floor is None) else floor
+        ceiling = AdaptiveTimeout.CEILING if (ceiling is None) else ceiling
+        AdaptiveTimeout.assert_bounds(floor, ceiling)
+        self.floor = floor
+        self.ceiling = ceiling
+        self.lock = threading.Lock()
+        self.samples: Deque[float] = deque(maxlen=AdaptiveTimeout.SAMPLES)
+        self.timeout = ceiling
+        self.pending = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of AdaptiveTimeout object."""
+        return f"AdaptiveTimeout({self.to_dict()})"
+
+    @staticmethod
+    def by_serial_number(serial_number: str) -> AdaptiveTimeout:
+        """Return the AdaptiveTimeout object of a relay-board (created on first use)."""
+        with AdaptiveTimeout.timeouts_lock:
+            timeout = AdaptiveTimeout.timeouts.get(serial_number)
+            if (timeout is None):
+                timeout = AdaptiveTimeout()
+                AdaptiveTimeout.timeouts[serial_number] = timeout
+            return timeout
+
+    def configure(self, floor: Optional[float] = None, ceiling: Optional[float] = None) -> None:
+        """Change floor and/or ceiling."""
+        floor = self.floor if (floor is None) else floor
+        ceiling = self.ceiling if (ceiling is None) else ceiling
+        AdaptiveTimeout.assert_bounds(floor, ceiling)
+        with self.lock:
+            self.floor = floor
+            self.ceiling = ceiling
+            self.update()
+
+    @staticmethod
+    def assert_bounds(floor: float, ceiling: float) -> None:
+        """Assert 0 < floor <= ceiling."""
+        if ((floor <= 0.0) or (ceiling < floor)):
+            raise AdaptiveTimeoutException(f"Invalid floor {floor} / ceiling {ceiling}, " +
+                                           "requires 0 < floor <= ceiling")
+
+    def record(self, round_trip: float) -> None:
+        """Record a measured round trip time (seconds)."""
+        with self.lock:
+            self.samples.append(round_trip)
+            self.pending += 1
+            if ((self.pending >= AdaptiveTimeout.UPDATE_INTERVAL) or
+                    (len(self.samples) <= AdaptiveTimeout.MIN_SAMPLES)):
+                self.update()
+
+    def get(self) -> float:
+        """Return the current timeout (seconds)."""
+        return self.timeout
+
+    def get_retry(self, previous: float) -> float:
+        """Return the timeout of a retry after the timeout previous passed (seconds)."""
+        return max(previous, min(self.ceiling, previous * AdaptiveTimeout.BACKOFF))
+
+    def update(self) -> None:
+        """Recompute the timeout (lock held)."""
+        self.pending = 0
+        if (len(self.samples) == 0):
+            self.timeout = self.ceiling
+            return
+        samples = sorted(self.samples)
+        if (len(samples) < AdaptiveTimeout.MIN_SAMPLES):
+            base = samples[-1]
+        else:
+            base = AdaptiveTimeout.get_percentile(samples, AdaptiveTimeout.PERCENTILE)
+        self.timeout = min(self.ceiling, max(self.floor, base * AdaptiveTimeout.FACTOR))
+
+    @staticmethod
+    def get_percentile(samples: List[float], percentile: float) -> float:
+        """Return the percentile (0..1) of sorted samples (nearest rank)."""
+        index = min(len(samples) - 1, max(0, int(percentile * len(samples) + 0.5) - 1))
+        return samples[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return timeout, bounds and round trip percentiles as json serializable dict."""
+        with self.lock:
+            samples = sorted(self.samples)
+            d: Dict[str, Any] = {"timeout": self.timeout, "floor": self.floor,
+                                 "ceiling": self.ceiling, "samples": len(samples)}
+        for name, percentile in [("p50", 0.5), ("p99", 0.99)]:
+            d[name] = AdaptiveTimeout.get_percentile(samples, percentile) \
+                if (len(samples) > 0) else None
+        return d
+
+
+class AdaptiveTimeoutException(Exception):
+    """Adaptive timeout exception class."""
+
+    pass
@@ -0,0 +1,206 @@
+#!/usr/bin/python3
+"""relay_state.py module."""
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+
+class RelayState(Mapping):
+    """RelayState class.
+
+    Immutable, hashable relay state backed by two integer bitmasks (bit 0 is relay 1):
+    mask holds the relays the state specifies, closed the closed ones among them.
+    For compatibility it's a read-only mapping like the dict form of a relay state,
+    {"open": [...], "close": [...]}.
+    """
+
+    __slots__ = ("mask", "closed")
+
+    KEYS = ("open", "close")
+
+    def __init__(self, mask: int = 0, closed: int = 0):
+        """Init a RelayState object (closed bits outside of mask are ignored)."""
+        object.__setattr__(self, "mask", mask)
+        object.__setattr__(self, "closed", closed & mask)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Reject changes, RelayState objects are immutable."""
+        raise AttributeError("RelayState objects are immutable")
+
+    def __repr__(self) -> str:
+        """Return string representation of RelayState object."""
+        return f"RelayState(open={self.get_open()}, close={self.get_closed()})"
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with a RelayState (bitmasks) or the dict form of a relay state."""
+        if (isinstance(other, RelayState)):
+            return (self.mask == other.mask) and (self.closed == other.closed)
+        if (isinstance(other, Mapping)):
+            try:
+                return self == RelayState.from_dict(other)  # type: ignore
+            except (RelayStateException, TypeError, ValueError):
+                return False
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """Return the hash of the bitmasks."""
+        return hash((self.mask, self.closed))
+
+    def __getitem__(self, key: str) -> List[int]:
+        """Return the relays of key ("open" or "close") in ascending order."""
+        if (key == "open"):
+            return self.get_open()
+        if (key == "close"):
+            return self.get_closed()
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys of the dict form."""
+        return iter(RelayState.KEYS)
+
+    def __len__(self) -> int:
+        """Return the number of keys of the dict form."""
+        return len(RelayState.KEYS)
+
+    def __or__(self, other: RelayState) -> RelayState:
+        """Return the union, see union."""
+        return self.union(other)
+
+    def get_open(self) -> List[int]:
+        """Return the open relays in ascending order."""
+        return RelayState.get_relays(self.mask & ~self.closed)
+
+    def get_closed(self) -> List[int]:
+        """Return the closed relays in ascending order."""
+        return RelayState.get_relays(self.closed)
+
+    def get_relay(self, relay: int, default: Optional[str] = None) -> Optional[str]:
+        """Return "open"/"close" of a relay (default if not specified)."""
+        bit = 1 << (relay - 1)
+        if (not (self.mask & bit)):
+            return default
+        return "close" if (self.closed & bit) else "open"
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        """Return the dict form {"open": [...], "close": [...]} (e.g. for json)."""
+        return {"open": self.get_open(), "close": self.get_closed()}
+
+    def to_relays(self) -> Dict[int, str]:
+        """Return relay id -> "open"/"close" in ascending order."""
+        return {relay: ("close" if (self.closed >> (relay - 1)) & 1 else "open")
+                for relay in RelayState.get_relays(self.mask)}
+
+    def union(self, other: RelayState) -> RelayState:
+        """Return this state with other applied on top (other wins for common relays)."""
+        return RelayState(self.mask | other.mask,
+                          (self.closed & ~other.mask) | other.closed)
+
+    def diff(self, other: RelayState) -> RelayState:
+        """Return the part of other which changes this state (relays differing or unknown)."""
+        changed = other.mask & ~(self.mask & ~(self.closed ^ other.closed))
+        return RelayState(changed, other.closed)
+
+    def issubset(self, other: RelayState) -> bool:
+        """Return whether other specifies all relays of this state with the same value."""
+        return (((self.mask & ~other.mask) == 0) and
+                (((self.closed ^ other.closed) & self.mask) == 0))
+
+    def to_set_payload(self) -> str:
+        """Return the payload of the SET request writing this state ("" if empty)."""
+        return ",".join([f"{relay}-{'C' if (self.closed >> (relay - 1)) & 1 else 'O'}"
+                         for relay in RelayState.get_relays(self.mask)])
+
+    def to_requests(self, all_mask: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Return the requests writing this state: a single SET request (none if empty).
+
+        With all_mask (see get_mask), a state setting all relays to the same value is
+        written by an ALL request instead.
+        """
+        if (self.mask == 0):
+            return []
+        if ((self.mask == all_mask) and (self.closed in [0, all_mask])):
+            return [("ALL", "C" if self.closed else "O")]
+        return [("SET", self.to_set_payload())]
+
+    @staticmethod
+    def get_relays(bits: int) -> List[int]:
+        """Return the relay ids of the set bits in ascending order."""
+        relays: List[int] = []
+        relay = 1
+        while (bits):
+            if (bits & 1):
+                relays.append(relay)
+            bits >>= 1
+            relay += 1
+        return relays
+
+    @staticmethod
+    def get_mask(relay_count: int) -> int:
+        """Return the mask of all relays of a relay-board with relay_count relays."""
+        return (1 << relay_count) - 1
+
+    @staticmethod
+    def parse(payload: str) -> RelayState:
+        """Parse the payload of a GET response, e.g. "1-O,2-C,3-O" (strict, O or C only)."""
+        mask = 0
+        closed = 0
+        try:
+            for entry in payload.split(","):
+                if ((entry[-2:-1] != "-") or (entry[-1:] not in ["O", "C"])):
+                    raise ValueError(entry)
+                bit = 1 << (int(entry[:-2]) - 1)
+                mask |= bit
+                if (entry[-1] == "C"):
+                    closed |= bit
+        except ValueError:
+            raise RelayStateException(f"Invalid relay state \"{payload}\"") from None
+        return RelayState(mask, closed)
+
+    @staticmethod
+    def from_dict(state: Union[RelayState, Dict[str, Union[str, List[int]]]],
+                  all_mask: Optional[int] = None) -> RelayState:
+        """Create RelayState from the dict form, keys applied in order.
+
+        "all" sets the relays of all_mask (see get_mask), it's an error without all_mask.
+        """
+        if (isinstance(state, RelayState)):
+            return state
+        mask = 0
+        closed = 0
+        for key in state:
+            if (key not in RelayState.KEYS):
+                raise RelayStateException(f"Unknown key \"{key}\"")
+            entry = state[key]
+            if (isinstance(entry, str)):
+                if ((entry != "all") or (all_mask is None)):
+                    raise RelayStateException(f"Invalid entry \"{entry}\" of {key}" +
+                                              ("" if (all_mask is not None) else
+                                               " (number of relays unknown)"))
+                bits = all_mask
+            else:
+                bits = 0
+                for relay in entry:
+                    if ((type(relay) is not int) or (relay < 1)):
+                        raise RelayStateException(f"Invalid relay {relay} of {key}")
+                    bits |= 1 << (relay - 1)
+            mask |= bits
+            closed = (closed | bits) if (key == "close") else (closed & ~bits)
+        return RelayState(mask, closed)
+
+    @staticmethod
+    def from_relays(relays: Dict[int, str]) -> RelayState:
+        """Create RelayState from relay id -> "open"/"close"."""
+        mask = 0
+        closed = 0
+        for relay in relays:
+            bit = 1 << (relay - 1)
+            mask |= bit
+            if (relays[relay] == "close"):
+                closed |= bit
+        return RelayState(mask, closed)
+
+
+class RelayStateException(Exception):
+    """Relay state exception class."""
+
+    pass
@@ -1,15 +1,46 @@
 #!/usr/bin/python3
 """serial_interface.py module."""
 from __future__ import annotations
-import serial  # type: ignore
-from serial.tools import list_ports  # type: ignore
-from serial.serialutil import PARITY_NONE, PARITY_EVEN  # type: ignore
-from typing import List, Optional
+if __package__ is None or __package__ == "":
+    from relay_board_stats import stats  # type: ignore
+else:
+    from .relay_board_stats import stats
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+import errno
 import os
+import threading
+import time
 
 
 class Device():
-    """Device class."""
+    """Device class.
+
+    Reads are served from a persistent receive buffer against deadlines of the monotonic
+    clock. The port timeout is set once at open (POLL_INTERVAL), changing it per call would
+    reconfigure the tty each time. lock()/locked() serialize the users of the port, in this
+    process and across processes (see PortLock).
+
+    The optional background reader (start_reader, posix) waits for the port to become
+    readable without polling. Data which arrives while nobody holds the port lock, i.e.
+    which no request waits for, is split into frames and passed to on_frame in the reader
+    thread. Requests still read their responses themselves, while holding the port lock.
+    The reader stops by itself if the port fails (see on_exit of start_reader).
+
+    The traffic of the port can be recorded to a binary trace file (start_trace, or all
+    devices with trace_dir), see serial_trace for its format and replay.
+    """
+
+    # maximum time a single read of the port blocks (the deadline is checked in between)
+    POLL_INTERVAL = 0.01
+    # readable without data this many times in a row, while nobody read the port: the
+    # device is gone
+    READER_EMPTY_LIMIT = 100
+
+    # record the traffic of each opened device to a trace file in this directory
+    # (the record kinds b"W", b"R", ... are defined by SerialTrace)
+    trace_dir: Optional[str] = None
 
     def __init__(self,
                  port: str,
@@ -23,51 +54,417 @@ class Device():
         self.vid_pid = None if (None in [vid, pid]) else f"{vid:0{4}X}{pid:0{4}X}"
         self.serial_number = serial_number
         self.ser = None
+        self.rx_buffer = bytearray()
+        self.port_lock: Optional[PortLock] = None
+        self.reader: Optional[threading.Thread] = None
+        self.reader_wakeup: Optional[Tuple[int, int]] = None
+        # guards reader and reader_wakeup, the reader may stop by itself
+        self.reader_lock = threading.Lock()
+        # bytes received by this handle (requests and reader)
+        self.received = 0
+        self.on_frame: Optional[Callable[[bytes], None]] = None
+        self.on_idle: Optional[Callable[[], None]] = None
+        self.on_exit: Optional[Callable[[], None]] = None
+        self.idle_interval: Optional[float] = None
+        self.frames: Deque[bytes] = deque()
+        self.frame_buffer = bytearray()
+        self.trace: Optional[Any] = None
 
     def __repr__(self) -> str:
         """Return string representation of Device object."""
         return str(self.__dict__)
 
+    def copy(self) -> Device:
+        """Return a Device object of the same port with its own port handle and receive buffer."""
+        device = Device(self.port, self.manufacturer, serial_number=self.serial_number)
+        device.vid_pid = self.vid_pid
+        return device
+
+    def lock(self, timeout: Optional[float] = None) -> float:
+        """Lock the port for this thread (reentrant), in request order of the waiting threads.
+
+        When first locked, received data nobody waits for (e.g. late responses to another
+        user of the port) is dropped (or passed to the reader). Return the time waited,
+        raises SerialInterfaceException after timeout seconds.
+        """
+        fd = self.ser.fileno() if ((self.ser is not None) and self.ser.is_open) else None
+        waited = self.get_port_lock().acquire(fd, timeout)
+        if (stats.enabled):
+            stats.record("device.lock_wait", waited)
+            if (waited > 0.0):
+                stats.count("device.lock_contended")
+        self.drop_stale_input(fd)
+        return waited
+
+    def try_lock(self, owner: Optional[Hashable] = None, token: Optional[object] = None) -> bool:
+        """Lock the port without waiting (see lock), return False if it's locked by others.
+
+        owner holds the lock instead of the current thread, token keeps the turn of a waiter
+        polling the lock (see PortLock.try_acquire).
+        """
+        fd = self.ser.fileno() if ((self.ser is not None) and self.ser.is_open) else None
+        if (not self.get_port_lock().try_acquire(fd, owner, token)):
+            return False
+        self.drop_stale_input(fd, owner)
+        return True
+
+    def get_port_lock(self) -> PortLock:
+        """Return the PortLock of the port."""
+        if (self.port_lock is None):
+            self.port_lock = PortLock.get(self.port)
+        return self.port_lock
+
+    def drop_stale_input(self, fd: Optional[int], owner: Optional[Hashable] = None) -> None:
+        """Drop (or pass to the reader) received data nobody waits for, when first locked."""
+        try:
+            stale = ((self.port_lock.count == 1) and (fd is not None) and  # type: ignore
+                     (len(self.rx_buffer) == 0) and (self.ser.in_waiting > 0))  # type: ignore
+        except OSError as e:
+            self.port_lock.release(owner)  # type: ignore
+            raise self.port_error(e) from e
+        if (not stale):
+            return
+        if (self.reader is threading.current_thread()):
+            # the reader drains it itself
+            return
+        if (self.reader is not None):
+            # pass it to the reader instead
+            self.drain()
+            self.wake_reader()
+            return
+        if (stats.enabled):
+            stats.count("device.stale_input")
+        self.reset_input_buffer()
+
+    def unlock(self, owner: Optional[Hashable] = None) -> None:
+        """Unlock the port (see lock and try_lock)."""
+        if (self.port_lock is None):
+            raise SerialInterfaceException("self.port_lock is None -> call lock() first!")
+        self.port_lock.release(owner)
+
+    @contextmanager
+    def locked(self, timeout: Optional[float] = None) -> Iterator[Device]:
+        """Context manager of lock/unlock."""
+        self.lock(timeout)
+        try:
+            yield self
+        finally:
+            self.unlock()
+
     def open(self, baudrate: int = 115200) -> None:
         """Open wrapper."""
+        start = time.perf_counter() if stats.enabled else 0.0
+        # pyserial is imported on demand, it's a major part of the startup time
+        import serial  # type: ignore
         # self.ser = serial.Serial(self.port, baudrate=baudrate)
         # https://github.com/pyserial/pyserial/issues/124
         self.ser = serial.Serial()
         self.ser.port = self.port  # type: ignore
         self.ser.baudrate = baudrate  # type: ignore
+        self.ser.timeout = Device.POLL_INTERVAL  # type: ignore
+        self.rx_buffer = bytearray()
         if (os.name == 'nt'):
             # On Windows set the default RTS/DTR state before opening the port
             # On Linux, this would trigger a reset
             self.set_rts(True)
             self.set_dtr(True)
-        self.ser.open()  # type: ignore
+        try:
+            self.ser.open()  # type: ignore
+        except serial.SerialException:
+            # the port may have vanished (hot-plug), don't trust the cached index anymore
+            device_registry.invalidate()
+            raise
+        if ((Device.trace_dir is not None) and (self.trace is None)):
+            self.start_trace(os.path.join(Device.trace_dir, self.get_trace_name()))
+        if (self.trace is not None):
+            self.trace.record(b"O", str(baudrate).encode("ascii"))
+        if (stats.enabled):
+            stats.record("device.open", time.perf_counter() - start)
 
     def close(self) -> None:
         """Close wrapper."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
+        self.stop_reader()
         self.ser.close()
+        if (self.trace is not None):
+            self.trace.record(b"C")
+            self.stop_trace()
+
+    def start_trace(self, file: str) -> None:
+        """Record the traffic of the port to a trace file until close() (see serial_trace)."""
+        if __package__ is None or __package__ == "":
+            from serial_trace import SerialTraceWriter  # type: ignore
+        else:
+            from .serial_trace import SerialTraceWriter
+        self.stop_trace()
+        try:
+            self.trace = SerialTraceWriter(file, self.port, self.serial_number)
+        except OSError as e:
+            raise SerialInterfaceException(f"Couldn't create trace {file}: {e}") from None
+
+    def stop_trace(self) -> None:
+        """Stop recording (see start_trace)."""
+        if (self.trace is not None):
+            self.trace.close()
+            self.trace = None
+
+    def get_trace_name(self) -> str:
+        """Return a unique trace file name: serial-number (or port), time, process id."""
+        name = self.serial_number or os.path.basename(self.port)
+        return f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}.rbtrace"
 
     def write(self, data: bytes) -> None:
         """Write wrapper."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
-        self.ser.write(data)
+        start = time.perf_counter() if stats.enabled else 0.0
+        if (self.trace is not None):
+            self.trace.record(b"W", bytes(data))
+        try:
+            self.ser.write(data)
+        except OSError as e:
+            # serial.SerialException is an OSError
+            raise self.port_error(e) from e
+        if (stats.enabled):
+            stats.record("device.write", time.perf_counter() - start)
 
     def read(self, size: int = 1, timeout: float = 0.1) -> bytes:
         """Read wrapper."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
-        self.ser.timeout = timeout
-        return self.ser.read(size=size)
+        deadline = time.monotonic() + timeout
+        while ((len(self.rx_buffer) < size) and (time.monotonic() < deadline)):
+            self.fill_rx_buffer()
+        data = bytes(self.rx_buffer[:size])
+        del self.rx_buffer[:size]
+        return data
 
     def read_until(self, expected: bytes = b'\n\r', size: Optional[int] = None,
                    timeout: float = 0.1) -> bytes:
         """Read until wrapper."""
+        return self.read_frame(time.monotonic() + timeout, expected, size)
+
+    def read_frame(self, deadline: float, separator: bytes = b'\n',
+                   size: Optional[int] = None) -> bytes:
+        """Read until separator (included), size bytes or deadline (monotonic clock).
+
+        Data received after the separator stays in the receive buffer for the next read. Data
+        already received is read even if the deadline passed (e.g. while other ports were read).
+        """
+        if (self.ser is None):
+            raise SerialInterfaceException("self.ser is None -> call open() first!")
+        start = time.perf_counter() if stats.enabled else 0.0
+        buffer = self.rx_buffer
+        index = buffer.find(separator)
+        while ((index < 0) and ((size is None) or (len(buffer) < size))):
+            # only search the new data (and a separator split across reads)
+            searched = max(0, len(buffer) - len(separator) + 1)
+            wait = (time.monotonic() < deadline)
+            self.fill_rx_buffer(wait)
+            index = buffer.find(separator, searched)
+            if (not wait):
+                break
+        end = len(buffer) if (index < 0) else (index + len(separator))
+        if ((size is not None) and (end > size)):
+            end = size
+        data = bytes(buffer[:end])
+        del buffer[:end]
+        if ((index < 0) and ((size is None) or (len(data) < size))):
+            if (stats.enabled):
+                stats.count("device.timeout")
+            if (self.trace is not None):
+                self.trace.record(b"T", data)
+        if (stats.enabled):
+            stats.record("device.read_until", time.perf_counter() - start)
+        return data
+
+    def fill_rx_buffer(self, wait: bool = True) -> None:
+        """Append the received data to the receive buffer, wait up to POLL_INTERVAL for it.
+
+        Without wait, only data already received is taken.
+        """
+        # blocks for the first byte only, then takes everything already received
+        try:
+            waiting = self.ser.in_waiting  # type: ignore
+            if ((not wait) and (waiting == 0)):
+                return
+            data = self.ser.read(max(1, waiting))  # type: ignore
+        except OSError as e:
+            # e.g. "device reports readiness to read but returned no data" of an unplugged device
+            raise self.port_error(e) from e
+        self.rx_buffer += data
+        self.received += len(data)
+        if ((self.trace is not None) and (len(data) > 0)):
+            self.trace.record(b"R", data)
+
+    def port_error(self, e: Exception) -> SerialInterfaceException:
+        """Return the exception of a failed read/write, the port may be gone (unplugged)."""
+        device_registry.invalidate()
+        if (stats.enabled):
+            stats.count("device.disconnect")
+        return SerialInterfaceException(f"port {self.port} failed (disconnected?): {e}")
+
+    def is_present(self) -> bool:
+        """Return False if the port is gone (e.g. unplugged), always True on Windows."""
+        return (os.name == "nt") or os.path.exists(self.port)
+
+    def reset_input_buffer(self) -> None:
+        """Drop received but not yet read data (e.g. a partial response of a timeout)."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
-        self.ser.timeout = timeout
-        return self.ser.read_until(expected=expected, size=size)
+        self.rx_buffer = bytearray()
+        self.ser.reset_input_buffer()
+        if (self.trace is not None):
+            self.trace.record(b"F")
+
+    def start_reader(self, on_frame: Callable[[bytes], None],
+                     on_idle: Optional[Callable[[], None]] = None,
+                     idle_interval: Optional[float] = None,
+                     on_exit: Optional[Callable[[], None]] = None) -> None:
+        """Start the background reader (see class), replace the callbacks if it's running.
+
+        on_idle is called in the reader thread after idle_interval seconds without data.
+        on_exit is called in the reader thread if it stops by itself (port failed or gone),
+        the reader can be started again afterwards.
+        """
+        if (os.name != "posix"):
+            raise SerialInterfaceException("The reader requires a posix system")
+        if (self.ser is None):
+            raise SerialInterfaceException("self.ser is None -> call open() first!")
+        self.on_frame = on_frame
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self.on_exit = on_exit
+        with self.reader_lock:
+            if (self.reader is not None):
+                os.write(self.reader_wakeup[1], b"f")  # type: ignore
+                return
+            self.frames = deque()
+            self.frame_buffer = bytearray()
+            self.reader_wakeup = os.pipe()
+            self.reader = threading.Thread(target=self.run_reader, daemon=True,
+                                           name=f"reader-{self.port}")
+            self.reader.start()
+
+    def stop_reader(self) -> None:
+        """Stop the background reader (frames not yet passed to on_frame are dropped)."""
+        with self.reader_lock:
+            reader = self.reader
+            wakeup = self.reader_wakeup
+            if ((reader is None) or (wakeup is None)):
+                return
+            self.reader = None
+            self.reader_wakeup = None
+            if (reader is not threading.current_thread()):
+                os.write(wakeup[1], b"x")
+        if (reader is not threading.current_thread()):
+            reader.join()
+        for fd in wakeup:
+            os.close(fd)
+        self.on_frame = None
+        self.on_idle = None
+        self.on_exit = None
+
+    def wake_reader(self) -> None:
+        """Wake the reader to pass the queued frames."""
+        with self.reader_lock:
+            if ((self.reader_wakeup is not None) and
+                    (self.reader is not threading.current_thread())):
+                os.write(self.reader_wakeup[1], b"f")
+
+    def post_frame(self, frame: bytes) -> None:
+        """Queue a frame which no request waits for, the reader passes it to on_frame."""
+        self.frames.append(frame)
+        self.wake_reader()
+
+    def drain(self) -> int:
+        """Queue the complete frames received so far (port lock held).
+
+        Return the number of bytes read, -1 if the port failed.
+        """
+        try:
+            # the port is non-blocking, this doesn't wait
+            data = os.read(self.ser.fileno(), 4096)  # type: ignore
+        except BlockingIOError:
+            return 0
+        except (OSError, ValueError, AttributeError):
+            return -1
+        if (len(data) == 0):
+            # e.g. read by the request of another process meanwhile
+            return 0
+        self.received += len(data)
+        if (self.trace is not None):
+            self.trace.record(b"D", data)
+        buffer = self.frame_buffer
+        buffer += data
+        start = 0
+        index = buffer.find(b"\n")
+        while (index >= 0):
+            self.frames.append(bytes(buffer[start:index + 1]))
+            start = index + 1
+            index = buffer.find(b"\n", start)
+        del buffer[:start]
+        return len(data)
+
+    def run_reader(self) -> None:
+        """Background reader thread (see start_reader)."""
+        try:
+            self.read_frames()
+        finally:
+            with self.reader_lock:
+                # stopped by itself, not by stop_reader
+                exited = (self.reader is threading.current_thread())
+                if (exited):
+                    for fd in self.reader_wakeup:  # type: ignore
+                        os.close(fd)
+                    self.reader = None
+                    self.reader_wakeup = None
+            on_exit = self.on_exit
+            if (exited and (on_exit is not None)):
+                on_exit()
+
+    def read_frames(self) -> None:
+        """Pass the frames nobody waits for to on_frame until stopped or the port fails."""
+        import select
+        try:
+            fd = self.ser.fileno()  # type: ignore
+        except (OSError, ValueError, AttributeError):
+            return
+        wakeup = self.reader_wakeup[0]  # type: ignore
+        empty = 0
+        while (self.reader is not None):
+            received = self.received
+            try:
+                readable = select.select([fd, wakeup], [], [], self.idle_interval)[0]
+            except (OSError, ValueError):
+                return
+            if (wakeup in readable):
+                if (b"x" in os.read(wakeup, 64)):
+                    return
+            size = 0
+            if (fd in readable):
+                # responses to requests wake the reader as well, they're read by the requests
+                try:
+                    waited = self.lock()
+                except SerialInterfaceException:
+                    # the port failed
+                    return
+                try:
+                    size = self.drain()
+                finally:
+                    self.unlock()
+                # empty only if nobody read the port meanwhile (this or another process)
+                if ((size == 0) and (waited == 0.0) and (self.received == received)):
+                    empty += 1
+                else:
+                    empty = 0
+            while ((len(self.frames) > 0) and (self.on_frame is not None)):
+                self.on_frame(self.frames.popleft())
+            if ((size < 0) or (empty >= Device.READER_EMPTY_LIMIT)):
+                return
+            if ((len(readable) == 0) and (self.on_idle is not None)):
+                self.on_idle()
 
     def set_rts(self, level: bool):
         """Set rts pin level."""
@@ -75,7 +472,14 @@ class Device():
         value = not level
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
-        self.ser.rts = value
+        if (self.trace is not None):
+            self.trace.record(b"r", b"\x01" if value else b"\x00")
+        try:
+            self.ser.rts = value
+        except OSError as e:
+            # pseudo-terminals (e.g. the emulator) have no modem control lines
+            if (e.errno not in [errno.EINVAL, errno.ENOTTY]):
+                raise
 
     def set_dtr(self, level: bool):
         """Set dtr pin level."""
@@ -83,41 +487,47 @@ class Device():
         value = not level
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
-        self.ser.dtr = value
+        if (self.trace is not None):
+            self.trace.record(b"d", b"\x01" if value else b"\x00")
+        try:
+            self.ser.dtr = value
+        except OSError as e:
+            # pseudo-terminals (e.g. the emulator) have no modem control lines
+            if (e.errno not in [errno.EINVAL, errno.ENOTTY]):
+                raise
 
     def set_parity_none(self) -> None:
         """Set parity none."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
+        from serial.serialutil import PARITY_NONE  # type: ignore
+        if (self.trace is not None):
+            self.trace.record(b"p", PARITY_NONE.encode("ascii"))
         self.ser.parity = PARITY_NONE
 
     def set_parity_even(self) -> None:
         """Set parity even."""
         if (self.ser is None):
             raise SerialInterfaceException("self.ser is None -> call open() first!")
+        from serial.serialutil import PARITY_EVEN  # type: ignore
+        if (self.trace is not None):
+            self.trace.record(b"p", PARITY_EVEN.encode("ascii"))
         self.ser.parity = PARITY_EVEN
 
     @staticmethod
     def by_port(port) -> Device:
         """Create Device object by port."""
-        device_list = Device.get_device_list()
-        for d in device_list:
-            if (d.port == port):
-                return d
-        raise SerialInterfaceException(f"port {port} not found!")
+        return device_registry.by_port(port)
 
     @staticmethod
     def by_serial_number(serial_number) -> Device:
         """Create Device object by serial_number."""
-        device_list = Device.get_device_list()
-        for d in device_list:
-            if ((d.serial_number is not None) and (d.serial_number.startswith(serial_number))):
-                return d
-        raise SerialInterfaceException(f"serial_number {serial_number} not found!")
+        return device_registry.by_serial_number(serial_number)
 
     @staticmethod
     def get_device_list() -> List[Device]:
         """Get device list of currently connected comports."""
+        from serial.tools import list_ports  # type: ignore
         device_list = []
         com_ports = list_ports.comports()
         for d in com_ports:
@@ -125,6 +535,335 @@ class Device():
         return device_list
 
 
+class PortLock():
+    """PortLock class.
+
+    Reentrant lock of a serial port, shared by all Device objects of the port in this
+    process (see get) and granted in request order (FIFO) to the waiting threads. On posix
+    systems, the holder also takes an advisory flock on its file descriptor of the port,
+    which serializes the users of the port across processes. Waiters which must not block
+    (e.g. coroutines) poll the lock with try_acquire and keep their turn by a queued token.
+    """
+
+    locks: Dict[str, PortLock] = {}
+    locks_lock = threading.Lock()
+
+    def __init__(self, port: str):
+        """Init a PortLock object."""
+        self.port = port
+        self.condition = threading.Condition(threading.Lock())
+        self.queue: Deque[object] = deque()
+        self.owner: Optional[Hashable] = None
+        self.count = 0
+        self.fd: Optional[int] = None
+
+    def __repr__(self) -> str:
+        """Return string representation of PortLock object."""
+        return f"PortLock({self.port}, owner={self.owner}, count={self.count}, " + \
+            f"waiting={len(self.queue)})"
+
+    @staticmethod
+    def get(port: str) -> PortLock:
+        """Return the PortLock of port (symlinks resolved, e.g. /dev/serial/by-id)."""
+        key = os.path.realpath(port)
+        with PortLock.locks_lock:
+            port_lock = PortLock.locks.get(key)
+            if (port_lock is None):
+                port_lock = PortLock(key)
+                PortLock.locks[key] = port_lock
+            return port_lock
+
+    def acquire(self, fd: Optional[int] = None, timeout: Optional[float] = None) -> float:
+        """Acquire the lock, and the flock of fd if not yet held. Return the time waited.
+
+        Raises SerialInterfaceException after timeout seconds (None: wait forever).
+        """
+        me = threading.get_ident()
+        # set when the lock has to be waited for
+        start: Optional[float] = None
+        with self.condition:
+            if (self.owner == me):
+                self.count += 1
+                return 0.0
+            if ((self.owner is not None) or (len(self.queue) > 0)):
+                start = time.monotonic()
+                token = object()
+                self.queue.append(token)
+                while ((self.owner is not None) or (self.queue[0] is not token)):
+                    remaining = None if (timeout is None) else \
+                        (start + timeout - time.monotonic())
+                    if ((remaining is not None) and (remaining <= 0.0)):
+                        self.queue.remove(token)
+                        # the next waiter may be first now
+                        self.condition.notify_all()
+                        raise SerialInterfaceException(f"port {self.port} locked, " +
+                                                       f"timeout after {timeout} s")
+                    self.condition.wait(remaining)
+                self.queue.popleft()
+            self.owner = me
+            self.count = 1
+        if ((fd is not None) and (os.name == "posix")):
+            try:
+                start = self.flock(fd, timeout, start)
+            except BaseException:
+                self.release()
+                raise
+            self.fd = fd
+        return 0.0 if (start is None) else (time.monotonic() - start)
+
+    def try_acquire(self, fd: Optional[int] = None, owner: Optional[Hashable] = None,
+                    token: Optional[object] = None) -> bool:
+        """Acquire the lock and the flock of fd without waiting, return False if not available.
+
+        owner holds the lock instead of the current thread (release with the same owner).
+        The lock isn't available while others wait for it, unless the token (see enqueue)
+        of this waiter is first in the queue.
+        """
+        if (owner is None):
+            owner = threading.get_ident()
+        with self.condition:
+            if (self.owner == owner):
+                self.count += 1
+                return True
+            if ((self.owner is not None) or
+                    ((len(self.queue) > 0) and (self.queue[0] is not token))):
+                return False
+            if (len(self.queue) > 0):
+                self.queue.popleft()
+            self.owner = owner
+            self.count = 1
+        if ((fd is not None) and (os.name == "posix")):
+            import fcntl
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # held by another process: give the lock back, keep the turn
+                with self.condition:
+                    self.owner = None
+                    self.count = 0
+                    if (token is not None):
+                        self.queue.appendleft(token)
+                    self.condition.notify_all()
+                return False
+            except BaseException:
+                self.release(owner)
+                raise
+            self.fd = fd
+        return True
+
+    def enqueue(self) -> object:
+        """Queue a waiter polling the lock (see try_acquire), return its token."""
+        token = object()
+        with self.condition:
+            self.queue.append(token)
+        return token
+
+    def dequeue(self, token: object) -> None:
+        """Remove the token of a waiter which stops polling (no-op once it got the lock)."""
+        with self.condition:
+            if (token in self.queue):
+                self.queue.remove(token)
+                # the next waiter may be first now
+                self.condition.notify_all()
+
+    def flock(self, fd: int, timeout: Optional[float], start: Optional[float]) -> Optional[float]:
+        """Take the exclusive flock of fd, return start (set if the flock had to be waited for)."""
+        import fcntl
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return start
+        except BlockingIOError:
+            pass
+        # held by another process
+        if (start is None):
+            start = time.monotonic()
+        if (timeout is None):
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return start
+        while True:
+            time.sleep(Device.POLL_INTERVAL)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return start
+            except BlockingIOError:
+                if ((time.monotonic() - start) >= timeout):
+                    raise SerialInterfaceException(f"port {self.port} locked by another " +
+                                                   f"process, timeout after {timeout} s") from None
+
+    def release(self, owner: Optional[Hashable] = None) -> None:
+        """Release the lock (the flock too, when released by all acquisitions)."""
+        if (owner is None):
+            owner = threading.get_ident()
+        with self.condition:
+            if (self.owner != owner):
+                raise SerialInterfaceException(f"port {self.port} not locked by this thread")
+            self.count -= 1
+            if (self.count > 0):
+                return
+            if (self.fd is not None):
+                import fcntl
+                try:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+                except OSError:
+                    # the port may be closed already, which releases the flock as well
+                    pass
+                self.fd = None
+            self.owner = None
+            if (len(self.queue) > 0):
+                self.condition.notify_all()
+
+
+class DeviceRegistry():
+    """DeviceRegistry class.
+
+    Caches an index serial-number -> Device of the connected comports, so resolving many
+    devices costs a single enumeration. The index is rebuilt after ttl seconds, on an
+    explicit refresh()/invalidate(), when a lookup misses, and (on Linux) whenever the
+    /dev/serial/by-id directory changes due to hot-plugging.
+    """
+
+    BY_ID_DIR = "/dev/serial/by-id"
+
+    def __init__(self, ttl: float = 5.0):
+        """Init a DeviceRegistry object."""
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.devices: Dict[str, Device] = {}
+        self.registered: Dict[str, Device] = {}
+        self.timestamp: Optional[float] = None
+        self.complete = False
+        self.by_id_mtime: Optional[int] = None
+
+    def __repr__(self) -> str:
+        """Return string representation of DeviceRegistry object."""
+        return str(self.__dict__)
+
+    def invalidate(self) -> None:
+        """Drop the cached index, the next lookup rebuilds it."""
+        with self.lock:
+            self.devices = dict(self.registered)
+            self.timestamp = None
+            self.complete = False
+
+    def register(self, device: Device) -> None:
+        """Register a device which isn't enumerated (e.g. an emulator on a pseudo-terminal)."""
+        if (device.serial_number is None):
+            raise SerialInterfaceException(f"Device {device.port} without serial_number")
+        with self.lock:
+            self.registered[device.serial_number] = device
+            self.devices[device.serial_number] = device
+
+    def unregister(self, serial_number: str) -> None:
+        """Unregister a device registered by register()."""
+        with self.lock:
+            self.registered.pop(serial_number, None)
+            self.devices.pop(serial_number, None)
+
+    def refresh(self, full: bool = True) -> None:
+        """Rebuild the index, by a full comport enumeration or from /dev/serial/by-id."""
+        with self.lock:
+            start = time.perf_counter() if stats.enabled else 0.0
+            self.by_id_mtime = self.get_by_id_mtime()
+            if (full):
+                devices = Device.get_device_list()
+            else:
+                devices = self.get_by_id_device_list()
+            if (stats.enabled):
+                stats.record("device.enumerate" if full else "device.enumerate_by_id",
+                             time.perf_counter() - start)
+            self.devices = dict(self.registered)
+            for d in devices:
+                if (d.serial_number is not None):
+                    self.devices[d.serial_number] = d
+            self.timestamp = time.monotonic()
+            self.complete = full
+
+    def is_stale(self) -> bool:
+        """Return True if the index must be rebuilt before the next lookup."""
+        if (self.timestamp is None):
+            return True
+        if ((time.monotonic() - self.timestamp) > self.ttl):
+            return True
+        return self.get_by_id_mtime() != self.by_id_mtime
+
+    def by_serial_number(self, serial_number: str) -> Device:
+        """Return the Device whose serial_number starts with serial_number."""
+        with self.lock:
+            if (serial_number in self.registered):
+                return self.registered[serial_number]
+            refreshed = False
+            if (self.is_stale()):
+                # cheap Linux fast path first, full enumeration as fallback
+                self.refresh(full=not self.has_by_id_dir())
+                refreshed = self.complete
+            d = self.lookup_serial_number(serial_number)
+            if ((d is None) and (not refreshed)):
+                # unknown device: maybe plugged in since the last full refresh
+                self.refresh(full=True)
+                d = self.lookup_serial_number(serial_number)
+        if (d is None):
+            raise SerialInterfaceException(f"serial_number {serial_number} not found!")
+        return d
+
+    def by_port(self, port: str) -> Device:
+        """Return the Device of port."""
+        with self.lock:
+            if (self.is_stale() or (not self.complete)):
+                self.refresh(full=True)
+            for d in self.devices.values():
+                if (d.port == port):
+                    return d
+            # ports without serial number are not indexed
+            for d in Device.get_device_list():
+                if (d.port == port):
+                    return d
+        raise SerialInterfaceException(f"port {port} not found!")
+
+    def lookup_serial_number(self, serial_number: str) -> Optional[Device]:
+        """Lookup serial_number in the index (exact match first, then prefix match)."""
+        d = self.devices.get(serial_number)
+        if (d is not None):
+            return d
+        for key in self.devices:
+            if (key.startswith(serial_number)):
+                return self.devices[key]
+        return None
+
+    @staticmethod
+    def has_by_id_dir() -> bool:
+        """Return True if the /dev/serial/by-id directory is available (Linux)."""
+        return os.path.isdir(DeviceRegistry.BY_ID_DIR)
+
+    @staticmethod
+    def get_by_id_mtime() -> Optional[int]:
+        """Return modification time of /dev/serial/by-id (changes on hot-plug)."""
+        try:
+            return os.stat(DeviceRegistry.BY_ID_DIR).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def get_by_id_device_list() -> List[Device]:
+        """Get device list from the /dev/serial/by-id symlinks, without enumeration."""
+        device_list = []
+        try:
+            names = os.listdir(DeviceRegistry.BY_ID_DIR)
+        except OSError:
+            return device_list
+        for name in names:
+            # e.g. usb-FTDI_FT230X_Basic_UART_D30GR9J5-if00-port0
+            base = name.split("-if")[0]
+            if ("_" not in base):
+                continue
+            serial_number = base.rsplit("_", 1)[1]
+            port = os.path.realpath(os.path.join(DeviceRegistry.BY_ID_DIR, name))
+            device_list.append(Device(port, serial_number=serial_number))
+        return device_list
+
+
+device_registry = DeviceRegistry()
+
+
 class SerialInterfaceException(Exception):
     """Serial interface exception class."""
 
@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""serial_interface_async.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from serial_interface import Device, SerialInterfaceException  # type: ignore
+else:
+    from .serial_interface import Device, SerialInterfaceException
+import asyncio
+import os
+import time
+from typing import Optional
+
+
+class AsyncDevice():
+    """AsyncDevice class.
+
+    asyncio transport of a Device: the non-blocking file descriptor of the opened
+    serial port is served by the event loop (add_reader/add_writer). The port lock of the
+    Device is polled without blocking the loop and owned by the AsyncDevice (see
+    Device.try_lock), so sync and async users of a port don't interleave. The port is only
+    read while locked. Only available on posix systems.
+    """
+
+    def __init__(self, device: Device):
+        """Init an AsyncDevice object."""
+        if (os.name != "posix"):
+            raise SerialInterfaceException("AsyncDevice requires a posix system")
+        self.device = device
+        self.fd: Optional[int] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.buffer = bytearray()
+        self.error: Optional[Exception] = None
+        self.readable: Optional[asyncio.Event] = None
+        self.locked = False
+
+    def __repr__(self) -> str:
+        """Return string representation of AsyncDevice object."""
+        return str(self.__dict__)
+
+    async def open(self, baudrate: int = 115200) -> None:
+        """Open the device, its file descriptor is served by the running loop."""
+        self.device.open(baudrate=baudrate)
+        self.loop = asyncio.get_running_loop()
+        self.fd = self.device.ser.fileno()  # type: ignore
+        os.set_blocking(self.fd, False)
+        self.buffer = bytearray()
+        self.error = None
+        self.readable = asyncio.Event()
+
+    async def close(self) -> None:
+        """Unlock and close the device."""
+        if (self.locked):
+            self.unlock()
+        self.fd = None
+        self.device.close()
+
+    async def lock(self, timeout: Optional[float] = None) -> None:
+        """Lock the port (see Device.lock) and start reading it, data received before is dropped.
+
+        The lock is polled in request order of the waiters, raises SerialInterfaceException
+        after timeout seconds.
+        """
+        if ((self.fd is None) or (self.loop is None)):
+            raise SerialInterfaceException("self.fd is None -> call open() first!")
+        start = time.monotonic()
+        token: Optional[object] = None
+        try:
+            while (not self.device.try_lock(self, token)):
+                if (token is None):
+                    token = self.device.get_port_lock().enqueue()
+                if ((timeout is not None) and ((time.monotonic() - start) >= timeout)):
+                    raise SerialInterfaceException(f"port {self.device.port} locked, " +
+                                                   f"timeout after {timeout} s")
+                await asyncio.sleep(Device.POLL_INTERVAL)
+        finally:
+            if (token is not None):
+                # timeout or cancelled (no-op if locked)
+                self.device.get_port_lock().dequeue(token)
+        self.locked = True
+        self.buffer = bytearray()
+        self.error = None
+        self.loop.add_reader(self.fd, self.on_readable)
+
+    def unlock(self) -> None:
+        """Stop reading the port and unlock it (see lock)."""
+        if (not self.locked):
+            raise SerialInterfaceException("not locked -> call lock() first!")
+        self.locked = False
+        if ((self.loop is not None) and (self.fd is not None)):
+            self.loop.remove_reader(self.fd)
+        self.device.unlock(self)
+
+    def on_readable(self) -> None:
+        """Drain the file descriptor into the receive buffer (loop reader callback)."""
+        try:
+            data = os.read(self.fd, 4096)  # type: ignore
+            if (len(data) == 0):
+                raise SerialInterfaceException(f"port {self.device.port} closed")
+            self.buffer += data
+        except BlockingIOError:
+            return
+        except Exception as e:
+            # e.g. device unplugged: stop reading and fail the waiting readers
+            self.error = e
+            self.loop.remove_reader(self.fd)  # type: ignore
+        self.readable.set()  # type: ignore
+
+    async def write(self, data: bytes) -> None:
+        """Write data, waiting for the port to become writable if required."""
+        if ((self.fd is None) or (self.loop is None)):
+            raise SerialInterfaceException("self.fd is None -> call open() first!")
+        view = memoryview(data)
+        while (len(view) > 0):
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                writable = self.loop.create_future()
+                self.loop.add_writer(self.fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self.loop.remove_writer(self.fd)
+
+    async def read_until(self, expected: bytes = b'\n') -> bytes:
+        """Read until expected is received (use asyncio.wait_for for a timeout)."""
+        if (self.readable is None):
+            raise SerialInterfaceException("self.fd is None -> call open() first!")
+        while True:
+            index = self.buffer.find(expected)
+            if (index >= 0):
+                end = index + len(expected)
+                data = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return data
+            if (self.error is not None):
+                raise SerialInterfaceException(f"port {self.device.port} failed: {self.error}")
+            self.readable.clear()
+            await self.readable.wait()
+
+    def reset_input_buffer(self) -> None:
+        """Drop received but not yet read data (e.g. a partial response of a timeout)."""
+        self.buffer = bytearray()
+
+    def set_rts(self, level: bool) -> None:
+        """Set rts pin level."""
+        self.device.set_rts(level)
+
+    def set_dtr(self, level: bool) -> None:
+        """Set dtr pin level."""
+        self.device.set_dtr(level)
+
+    def set_parity_none(self) -> None:
+        """Set parity none."""
+        self.device.set_parity_none()
+
+    @staticmethod
+    def by_serial_number(serial_number: str) -> AsyncDevice:
+        """Create AsyncDevice object by serial_number (with its own port handle)."""
+        return AsyncDevice(Device.by_serial_number(serial_number).copy())
@@ -0,0 +1,357 @@
+#!/usr/bin/python3
+"""serial_trace.py module."""
+from __future__ import annotations
+if __package__ is None or __package__ == "":
+    from serial_interface import Device, SerialInterfaceException, device_registry  # type: ignore
+else:
+    from .serial_interface import Device, SerialInterfaceException, device_registry
+import argparse
+import json
+import logging
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# create a module_logger and add sys.stdout handler
+module_logger = logging.getLogger("serial_trace.py")
+module_logger.setLevel(logging.INFO)
+module_logger.addHandler(logging.StreamHandler(sys.stdout))
+
+
+class SerialTrace():
+    """SerialTrace class.
+
+    Binary trace of the traffic of a serial port: MAGIC, then one record per event, a
+    RECORD header (kind, nanoseconds since the start of the trace on the monotonic clock,
+    data length) followed by the data. The first record (START) holds the port and the
+    serial-number as json. Written by Device.start_trace, replayed by ReplayDevice.
+    """
+
+    MAGIC = b"RBTRACE1"
+    RECORD = struct.Struct("<cQI")
+
+    START = b"S"
+    OPEN = b"O"
+    CLOSE = b"C"
+    WRITE = b"W"
+    # data read by requests
+    READ = b"R"
+    # data read by the background reader (see Device.drain)
+    DRAIN = b"D"
+    # a read_frame deadline passed without complete frame
+    TIMEOUT = b"T"
+    # reset_input_buffer
+    FLUSH = b"F"
+    # value written to the rts/dtr attribute (b"\x00"/b"\x01"), parity (b"N"/b"E")
+    RTS = b"r"
+    DTR = b"d"
+    PARITY = b"p"
+
+    # replayed in order and compared with the replaying client
+    OUTPUTS = (WRITE, RTS, DTR, PARITY)
+
+    NAMES = {START: "start", OPEN: "open", CLOSE: "close", WRITE: "write", READ: "read",
+             DRAIN: "drain", TIMEOUT: "timeout", FLUSH: "flush", RTS: "rts", DTR: "dtr",
+             PARITY: "parity"}
+
+    @staticmethod
+    def read_file(file: str) -> List[Tuple[bytes, int, bytes]]:
+        """Read the (kind, timestamp in ns, data) records of a trace file.
+
+        A truncated last record (e.g. of a crashed process) is ignored.
+        """
+        try:
+            with open(file, "rb") as f:
+                content = f.read()
+        except OSError as e:
+            raise SerialTraceException(f"Couldn't read {file}: {e}") from None
+        if (not content.startswith(SerialTrace.MAGIC)):
+            raise SerialTraceException(f"{file} is no serial trace")
+        records: List[Tuple[bytes, int, bytes]] = []
+        i = len(SerialTrace.MAGIC)
+        size = SerialTrace.RECORD.size
+        while (i + size <= len(content)):
+            kind, timestamp, length = SerialTrace.RECORD.unpack_from(content, i)
+            i += size
+            if (i + length > len(content)):
+                break
+            records.append((kind, timestamp, content[i:i + length]))
+            i += length
+        if ((len(records) == 0) or (records[0][0] != SerialTrace.START)):
+            raise SerialTraceException(f"{file}: missing start record")
+        return records
+
+    @staticmethod
+    def get_info(records: List[Tuple[bytes, int, bytes]]) -> Dict[str, Any]:
+        """Return port, serial_number and (wall clock) time of the START record."""
+        return json.loads(records[0][2])
+
+    @staticmethod
+    def format_record(record: Tuple[bytes, int, bytes]) -> str:
+        """Return a record as text line: time in ms, kind, data."""
+        kind, timestamp, data = record
+        if (kind in [SerialTrace.RTS, SerialTrace.DTR]):
+            text = str(data != b"\x00")
+        else:
+            text = repr(data)[2:-1] if (len(data) > 0) else ""
+        return f"{timestamp / 1e6:12.3f} ms {SerialTrace.NAMES.get(kind, repr(kind)):8} {text}"
+
+    @staticmethod
+    def main(args_list: List[str]):
+        """Print trace files as text."""
+        parser = argparse.ArgumentParser(prog="serial_trace.py",
+                                         description="Print serial trace files as text")
+        parser.add_argument('file', nargs='+', help="Trace file (see --record)")
+        args = parser.parse_args(args_list)
+        for file in args.file:
+            records = SerialTrace.read_file(file)
+            module_logger.info(f"{file}: {SerialTrace.get_info(records)}, {len(records)} records")
+            for record in records[1:]:
+                module_logger.info(SerialTrace.format_record(record))
+
+
+class SerialTraceWriter():
+    """SerialTraceWriter class: writes the records of a trace file (see SerialTrace)."""
+
+    def __init__(self, file: str, port: str, serial_number: Optional[str] = None):
+        """Init a SerialTraceWriter object, create the file and write the START record."""
+        self.file = file
+        self.lock = threading.Lock()
+        self.start = time.monotonic_ns()
+        self.f: Optional[Any] = open(file, "wb")
+        self.f.write(SerialTrace.MAGIC)
+        self.record(SerialTrace.START, json.dumps(
+            {"port": port, "serial_number": serial_number, "time": time.time()}).encode("utf-8"))
+
+    def __repr__(self) -> str:
+        """Return string representation of SerialTraceWriter object."""
+        return f"SerialTraceWriter({self.file})"
+
+    def record(self, kind: bytes, data: bytes = b"") -> None:
+        """Append a record, timestamped now."""
+        timestamp = time.monotonic_ns() - self.start
+        with self.lock:
+            if (self.f is not None):
+                self.f.write(SerialTrace.RECORD.pack(kind, timestamp, len(data)) + data)
+
+    def close(self) -> None:
+        """Close the file."""
+        with self.lock:
+            if (self.f is not None):
+                self.f.close()
+                self.f = None
+
+
+class SerialReplay():
+    """SerialReplay class.
+
+    pyserial-like port replaying the records of a trace. Writes and rts/dtr/parity changes
+    must match the recorded ones, in order. Each recorded read is served after the output
+    preceding it in the trace, with the recorded delay divided by speed (0: at once).
+    As fast as possible, a read without recorded data times out at once (see ReplayDevice).
+    """
+
+    def __init__(self, records: List[Tuple[bytes, int, bytes]], speed: float = 1.0):
+        """Init a SerialReplay object."""
+        self.speed = speed
+        self.outputs: List[Tuple[bytes, bytes]] = []
+        # (outputs before the read, delay after the last of them in ns, data)
+        self.reads: List[Tuple[int, int, bytes]] = []
+        previous = records[0][1]
+        for kind, timestamp, data in records:
+            if (kind in SerialTrace.OUTPUTS):
+                self.outputs.append((kind, data))
+                previous = timestamp
+            elif (kind == SerialTrace.READ):
+                self.reads.append((len(self.outputs), timestamp - previous, data))
+        # replay time of the outputs written, the open as output 0
+        self.output_times: List[float] = [time.monotonic()]
+        self.read_index = 0
+        self.read_offset = 0
+        self.is_open = True
+        self.timeout: Optional[float] = Device.POLL_INTERVAL
+
+    def __repr__(self) -> str:
+        """Return string representation of SerialReplay object."""
+        return f"SerialReplay({len(self.output_times) - 1}/{len(self.outputs)} outputs, " + \
+            f"{self.read_index}/{len(self.reads)} reads)"
+
+    def output(self, kind: bytes, data: bytes) -> None:
+        """Compare an output with the next recorded one."""
+        index = len(self.output_times) - 1
+        if (index >= len(self.outputs)):
+            raise SerialTraceException(f"Replay diverged at output {index}: " +
+                                       f"{SerialTrace.NAMES[kind]} {data!r} after the end")
+        if (self.outputs[index] != (kind, data)):
+            expected_kind, expected_data = self.outputs[index]
+            raise SerialTraceException(f"Replay diverged at output {index}: " +
+                                       f"{SerialTrace.NAMES[kind]} {data!r}, recorded " +
+                                       f"{SerialTrace.NAMES[expected_kind]} {expected_data!r}")
+        self.output_times.append(time.monotonic())
+
+    def get_due(self) -> Optional[float]:
+        """Return the replay time of the next read (None if its output isn't written yet)."""
+        if (self.read_index >= len(self.reads)):
+            return None
+        outputs, delay, data = self.reads[self.read_index]
+        if (outputs >= len(self.output_times)):
+            return None
+        if (self.speed <= 0.0):
+            return self.output_times[outputs]
+        return self.output_times[outputs] + delay / 1e9 / self.speed
+
+    @property
+    def in_waiting(self) -> int:
+        """Return the number of bytes readable now."""
+        due = self.get_due()
+        if ((due is None) or (due > time.monotonic())):
+            return 0
+        return len(self.reads[self.read_index][2]) - self.read_offset
+
+    def read(self, size: int = 1) -> bytes:
+        """Read up to size bytes of the next recorded read, wait up to timeout for it."""
+        due = self.get_due()
+        now = time.monotonic()
+        if ((due is None) or (due > now)):
+            if (self.speed <= 0.0):
+                raise SerialReplayTimeout()
+            wait = self.timeout if (due is None) else min(self.timeout, due - now)  # type: ignore
+            time.sleep(wait)
+            if ((due is None) or (due > time.monotonic())):
+                return b""
+        data = self.reads[self.read_index][2]
+        chunk = data[self.read_offset:self.read_offset + size]
+        self.read_offset += len(chunk)
+        if (self.read_offset >= len(data)):
+            self.read_index += 1
+            self.read_offset = 0
+        return chunk
+
+    def write(self, data: bytes) -> int:
+        """Write: compare with the recorded write."""
+        self.output(SerialTrace.WRITE, bytes(data))
+        return len(data)
+
+    @property
+    def rts(self) -> bool:
+        """Return the rts value last written."""
+        return self.get_output(SerialTrace.RTS) != b"\x00"
+
+    @rts.setter
+    def rts(self, value: bool) -> None:
+        """Set rts: compare with the recorded rts change."""
+        self.output(SerialTrace.RTS, b"\x01" if value else b"\x00")
+
+    @property
+    def dtr(self) -> bool:
+        """Return the dtr value last written."""
+        return self.get_output(SerialTrace.DTR) != b"\x00"
+
+    @dtr.setter
+    def dtr(self, value: bool) -> None:
+        """Set dtr: compare with the recorded dtr change."""
+        self.output(SerialTrace.DTR, b"\x01" if value else b"\x00")
+
+    @property
+    def parity(self) -> str:
+        """Return the parity last written."""
+        return self.get_output(SerialTrace.PARITY).decode("ascii") or "N"
+
+    @parity.setter
+    def parity(self, value: str) -> None:
+        """Set parity: compare with the recorded parity change."""
+        self.output(SerialTrace.PARITY, value.encode("ascii"))
+
+    def get_output(self, kind: bytes) -> bytes:
+        """Return the data of the last replayed output of kind (b"" if none)."""
+        for output_kind, data in reversed(self.outputs[:len(self.output_times) - 1]):
+            if (output_kind == kind):
+                return data
+        return b""
+
+    def reset_input_buffer(self) -> None:
+        """Reset input buffer: nothing to drop, the trace holds the data read only."""
+        pass
+
+    def fileno(self) -> None:
+        """Return no file descriptor (no flock, no background reader)."""
+        return None
+
+    def close(self) -> None:
+        """Close the port."""
+        self.is_open = False
+
+
+class ReplayDevice(Device):
+    """ReplayDevice class.
+
+    Device replaying a trace file instead of opening the port (see SerialReplay), e.g.
+    registered for the serial-number of the trace, so a RelayBoard runs against it without
+    hardware. Each copy (i.e. each RelayBoard object) replays the trace from the start.
+    """
+
+    def __init__(self, records: List[Tuple[bytes, int, bytes]], speed: float = 1.0):
+        """Init a ReplayDevice object (speed 0: as fast as possible)."""
+        info = SerialTrace.get_info(records)
+        super().__init__(info["port"], serial_number=info["serial_number"])
+        self.records = records
+        self.speed = speed
+
+    @staticmethod
+    def from_file(file: str, speed: float = 1.0) -> ReplayDevice:
+        """Create ReplayDevice from a trace file."""
+        return ReplayDevice(SerialTrace.read_file(file), speed)
+
+    def register(self) -> None:
+        """Register at the serial-number lookup of Device (in this process)."""
+        device_registry.register(self)
+
+    def copy(self) -> ReplayDevice:
+        """Return a ReplayDevice of the same trace, replayed from the start."""
+        return ReplayDevice(self.records, self.speed)
+
+    def open(self, baudrate: int = 115200) -> None:
+        """Open the replay (baudrate is ignored)."""
+        self.ser = SerialReplay(self.records, self.speed)  # type: ignore
+        self.rx_buffer = bytearray()
+
+    def read(self, size: int = 1, timeout: float = 0.1) -> bytes:
+        """Read wrapper (a timeout of the replay returns at once)."""
+        try:
+            return super().read(size, timeout)
+        except SerialReplayTimeout:
+            return super().read(size, 0.0)
+
+    def read_frame(self, deadline: float, separator: bytes = b'\n',
+                   size: Optional[int] = None) -> bytes:
+        """Read frame wrapper (a timeout of the replay returns at once)."""
+        try:
+            return super().read_frame(deadline, separator, size)
+        except SerialReplayTimeout:
+            return super().read_frame(0.0, separator, size)
+
+    def is_present(self) -> bool:
+        """Return True, a replay doesn't vanish."""
+        return True
+
+    def start_reader(self, *args: Any, **kwargs: Any) -> None:
+        """The background reader isn't supported by replays."""
+        raise SerialInterfaceException("The reader isn't supported by replays")
+
+
+class SerialReplayTimeout(Exception):
+    """Raised by SerialReplay.read as fast as possible instead of waiting for the deadline."""
+
+    pass
+
+
+class SerialTraceException(Exception):
+    """Serial trace exception class."""
+
+    pass
+
+
+if __name__ == "__main__":
+    SerialTrace.main(sys.argv[1:])
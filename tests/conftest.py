@@ -0,0 +1,33 @@
+"""conftest.py: fixtures of the tests, emulated relay-boards on pseudo-terminals."""
+import os
+import sys
+from typing import Callable, Iterator, List
+
+import pytest
+
+# run from a source checkout without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from relay_board_py.relay_board_emulator import RelayBoardEmulator  # noqa: E402
+
+
+@pytest.fixture
+def start_emulators() -> Iterator[Callable[..., List[RelayBoardEmulator]]]:
+    """Return a function starting (and registering) emulators, stopped after the test."""
+    if (os.name != "posix"):
+        pytest.skip("the emulator requires pseudo-terminals (posix)")
+    started: List[RelayBoardEmulator] = []
+
+    def start(count: int = 1, latency: float = 0.0) -> List[RelayBoardEmulator]:
+        emulators = RelayBoardEmulator.start_many(count, latency)
+        started.extend(emulators)
+        return emulators
+
+    yield start
+    for emulator in started:
+        emulator.stop()
+
+
+@pytest.fixture
+def emulator(start_emulators: Callable[..., List[RelayBoardEmulator]]) -> RelayBoardEmulator:
+    """Return a single emulated relay-board (RB00EMU00001)."""
+    return start_emulators(1)[0]
@@ -0,0 +1,120 @@
+"""test_device_registry.py: the serial-number index of DeviceRegistry."""
+import os
+import time
+from typing import List
+
+import pytest
+
+from relay_board_py.serial_interface import Device, DeviceRegistry, SerialInterfaceException
+
+
+class Enumerations():
+    """Count the /dev/serial/by-id listings and full enumerations of a test."""
+
+    def __init__(self, monkeypatch, by_id_dir: str, comports: List[Device]):
+        self.by_id = 0
+        self.full = 0
+        self.comports = comports
+        get_by_id_device_list = DeviceRegistry.get_by_id_device_list
+
+        def by_id() -> List[Device]:
+            self.by_id += 1
+            return get_by_id_device_list()
+
+        def full() -> List[Device]:
+            self.full += 1
+            return list(self.comports)
+
+        monkeypatch.setattr(DeviceRegistry, "BY_ID_DIR", by_id_dir)
+        monkeypatch.setattr(DeviceRegistry, "get_by_id_device_list", staticmethod(by_id))
+        monkeypatch.setattr(Device, "get_device_list", staticmethod(full))
+
+
+def plug(by_id_dir: str, serial_number: str, mtime_ns: int) -> str:
+    """Add the by-id symlink of an FTDI adapter, return the port it points to."""
+    port = os.path.join(os.path.dirname(by_id_dir), f"tty{serial_number}")
+    open(port, "w").close()
+    os.symlink(port, os.path.join(by_id_dir, f"usb-FTDI_FT230X_Basic_UART_{serial_number}"
+                                             "-if00-port0"))
+    # hot-plug changes the directory mtime, don't depend on the timestamp resolution
+    os.utime(by_id_dir, ns=(mtime_ns, mtime_ns))
+    return os.path.realpath(port)
+
+
+@pytest.fixture
+def by_id_dir(tmp_path) -> str:
+    """Return an empty stand-in of /dev/serial/by-id."""
+    path = tmp_path / "by-id"
+    path.mkdir()
+    return str(path)
+
+
+def test_by_id_fast_path(monkeypatch, by_id_dir):
+    """Known devices are resolved from by-id, without a full enumeration."""
+    port = plug(by_id_dir, "D30GR9J5", 1)
+    counts = Enumerations(monkeypatch, by_id_dir, [])
+    registry = DeviceRegistry()
+    assert registry.by_serial_number("D30GR9J5").port == port
+    assert registry.by_serial_number("D30G").port == port
+    assert (counts.by_id, counts.full) == (1, 0)
+
+
+def test_miss_falls_back_to_full_enumeration(monkeypatch, by_id_dir):
+    """An unknown serial number triggers a single full enumeration."""
+    counts = Enumerations(monkeypatch, by_id_dir, [Device("/dev/ttyS7", serial_number="ABC")])
+    registry = DeviceRegistry()
+    assert registry.by_serial_number("ABC").port == "/dev/ttyS7"
+    assert (counts.by_id, counts.full) == (1, 1)
+    with pytest.raises(SerialInterfaceException):
+        registry.by_serial_number("XYZ")
+    # the index was complete: not found without another by-id listing
+    assert (counts.by_id, counts.full) == (1, 2)
+
+
+def test_ttl_expiry(monkeypatch, by_id_dir):
+    """The index is reused within ttl and rebuilt after it."""
+    plug(by_id_dir, "D30GR9J5", 1)
+    counts = Enumerations(monkeypatch, by_id_dir, [])
+    registry = DeviceRegistry(ttl=0.1)
+    for _ in range(3):
+        registry.by_serial_number("D30GR9J5")
+    assert counts.by_id == 1
+    time.sleep(0.15)
+    registry.by_serial_number("D30GR9J5")
+    assert counts.by_id == 2
+
+
+def test_hot_plug_invalidates(monkeypatch, by_id_dir):
+    """A change of the by-id directory rebuilds the index before ttl."""
+    plug(by_id_dir, "D30GR9J5", 1)
+    counts = Enumerations(monkeypatch, by_id_dir, [])
+    registry = DeviceRegistry(ttl=3600.0)
+    registry.by_serial_number("D30GR9J5")
+    port = plug(by_id_dir, "A10KX3Q2", 2)
+    assert registry.by_serial_number("A10KX3Q2").port == port
+    assert (counts.by_id, counts.full) == (2, 0)
+    # unplugging is noticed as well
+    os.unlink(os.path.join(by_id_dir, "usb-FTDI_FT230X_Basic_UART_D30GR9J5-if00-port0"))
+    os.utime(by_id_dir, ns=(3, 3))
+    with pytest.raises(SerialInterfaceException):
+        registry.by_serial_number("D30GR9J5")
+
+
+def test_invalidate_keeps_registered(monkeypatch, by_id_dir):
+    """invalidate() forces a rebuild, registered devices survive it."""
+    plug(by_id_dir, "D30GR9J5", 1)
+    counts = Enumerations(monkeypatch, by_id_dir, [])
+    registry = DeviceRegistry(ttl=3600.0)
+    registry.register(Device("/dev/pts/9", serial_number="EMU00001"))
+    registry.by_serial_number("D30GR9J5")
+    registry.invalidate()
+    registry.by_serial_number("D30GR9J5")
+    assert counts.by_id == 2
+    registry.invalidate()
+    assert registry.by_serial_number("EMU00001").port == "/dev/pts/9"
+    assert counts.by_id == 2
+    registry.unregister("EMU00001")
+    with pytest.raises(SerialInterfaceException):
+        registry.by_serial_number("EMU00001")
+    with pytest.raises(SerialInterfaceException):
+        registry.register(Device("/dev/pts/9"))
@@ -0,0 +1,124 @@
+"""test_relay_board.py: request coalescing and RelayBoard against the emulator."""
+import random
+from typing import Dict, List, Tuple
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard, RelayBoardException
+from relay_board_py.relay_state import RelayState
+from relay_board_py.serial_interface import Device
+
+VALUES = {"open": "O", "close": "C"}
+
+
+def translate(state) -> List[Tuple[str, str]]:
+    """Return the uncoalesced requests: one per "all" entry and per run of list entries."""
+    requests: List[Tuple[str, str]] = []
+    pending: List[str] = []
+    for key in state:
+        if (isinstance(state[key], str)):
+            if (len(pending) > 0):
+                requests.append(("SET", ",".join(pending)))
+                pending = []
+            requests.append(("ALL", VALUES[key]))
+        else:
+            pending += [f"{relay}-{VALUES[key]}" for relay in state[key]]
+    if (len(pending) > 0):
+        requests.append(("SET", ",".join(pending)))
+    return requests
+
+
+def apply(requests: List[Tuple[str, str]], relays: Dict[int, str]) -> Dict[int, str]:
+    """Return the relays ("O"/"C") of a 10 relay board after the requests."""
+    relays = dict(relays)
+    for header, payload in requests:
+        if (header == "ALL"):
+            relays = {relay: payload for relay in relays}
+        else:
+            for entry in payload.split(","):
+                relay, value = entry.split("-")
+                relays[int(relay)] = value
+    return relays
+
+
+def random_state(rng: random.Random) -> Dict[str, object]:
+    """Return a random relay state (dict form, random key order)."""
+    keys = ["open", "close"]
+    rng.shuffle(keys)
+    state: Dict[str, object] = {}
+    for key in keys[:rng.randint(0, 2)]:
+        if (rng.random() < 0.3):
+            state[key] = "all"
+        else:
+            state[key] = rng.sample(range(1, 11), rng.randint(0, 10))
+    return state
+
+
+@pytest.mark.parametrize("relay_count", [None, 10])
+def test_create_requests_keeps_final_state(relay_count):
+    """Coalesced requests result in the same relays as the uncoalesced ones, never more."""
+    rng = random.Random(23)
+    for _ in range(2000):
+        state = random_state(rng)
+        relays = {relay: rng.choice("OC") for relay in range(1, 11)}
+        requests = RelayBoard.create_requests(state, relay_count)
+        assert apply(requests, relays) == apply(translate(state), relays), state
+        assert len(requests) <= (1 if (relay_count is not None) else 2)
+        assert RelayBoard.count_uncoalesced_requests(state) == len(translate(state))
+
+
+def test_create_requests_coalesces():
+    """Overridden entries are dropped, a whole relay-board is written by ALL."""
+    assert RelayBoard.create_requests({"close": [1, 2], "open": "all"}) == [("ALL", "O")]
+    assert RelayBoard.create_requests({"open": "all", "close": [1, 2]}) == \
+        [("ALL", "O"), ("SET", "1-C,2-C")]
+    assert RelayBoard.create_requests({"close": [1, 2], "open": [2, 3]}) == \
+        [("SET", "1-C,2-O,3-O")]
+    assert RelayBoard.create_requests({"close": list(range(1, 11))}, 10) == [("ALL", "C")]
+    assert RelayBoard.create_requests({"close": [1, 2], "open": [1, 2]}) == \
+        [("SET", "1-O,2-O")]
+    assert RelayBoard.create_requests({}) == []
+    with pytest.raises(RelayBoardException):
+        RelayBoard.create_requests({"open": "none"})
+    commands = RelayBoard.compile_state({"open": "all", "close": [3]}, 10)
+    assert (commands.headers, commands.saved) == (["SET"], 1)
+
+
+def test_parse_relay_state_strict():
+    """Corrupted GET payloads raise RelayBoardException."""
+    assert RelayBoard.parse_relay_state("1-O,2-C") == {"open": [1], "close": [2]}
+    with pytest.raises(RelayBoardException):
+        RelayBoard.parse_relay_state("1-X")
+
+
+@pytest.mark.parametrize("shadow", [False, True])
+def test_write_relay_state(emulator, shadow):
+    """Written relay states are read back, with and without shadow state."""
+    relay_board = RelayBoard(emulator.serial_number, shadow)
+    relay_board.open()
+    try:
+        relay_board.write_relay_state({"close": "all", "open": [2]}, verify=True)
+        assert relay_board.read_relay_state(refresh=True).get_open() == [2]
+        relay_board.write_relay_state(RelayState.from_dict({"open": [1, 3]}), verify=True)
+        state = relay_board.read_relay_state(refresh=True)
+        assert state.get_open() == [1, 2, 3]
+        assert emulator.relays[1] == "O" and emulator.relays[4] == "C"
+        # a relay toggled behind our back: refresh reads the hardware
+        emulator.press_button()
+        assert relay_board.read_relay_state(refresh=True).get_open() == list(range(4, 11))
+    finally:
+        relay_board.close()
+
+
+def test_open_failure_closes_port(emulator, monkeypatch):
+    """A failing open() releases the port, run_alias reports the error."""
+    monkeypatch.setattr(Device, "trace_dir", "/nonexistent/traces")
+    relay_board = RelayBoard(emulator.serial_number)
+    with pytest.raises(Exception, match="Couldn't create trace"):
+        relay_board.open()
+    assert not relay_board.hardware.is_open()
+    result = RelayBoard.run_alias("A", emulator.serial_number, {"close": [1]})
+    assert "Couldn't create trace" in str(result.error)
+    monkeypatch.setattr(Device, "trace_dir", None)
+    result = RelayBoard.run_alias("A", emulator.serial_number, {"close": [1]})
+    assert result.ok() and (emulator.relays[1] == "C")
@@ -0,0 +1,117 @@
+"""test_relay_board_async.py: AsyncRelayBoard against the emulator."""
+import asyncio
+import os
+import threading
+from typing import List
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard, RelayBoardTimeoutException
+from relay_board_py.serial_interface import Device, SerialInterfaceException
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="AsyncRelayBoard requires posix")
+
+
+def test_write_and_read(start_emulators):
+    """Relay-boards are driven concurrently from one event loop."""
+    from relay_board_py.relay_board_async import AsyncRelayBoard
+    emulators = start_emulators(3)
+
+    async def main() -> None:
+        relay_boards = [AsyncRelayBoard(emulator.serial_number) for emulator in emulators]
+        await asyncio.gather(*[relay_board.open() for relay_board in relay_boards])
+        try:
+            await asyncio.gather(*[relay_board.write_relay_state({"open": "all", "close": [i]},
+                                                                 verify=True)
+                                   for i, relay_board in enumerate(relay_boards, 1)])
+            states = await asyncio.gather(*[relay_board.read_relay_state()
+                                            for relay_board in relay_boards])
+            assert [state.get_closed() for state in states] == [[1], [2], [3]]
+        finally:
+            await asyncio.gather(*[relay_board.close() for relay_board in relay_boards])
+
+    asyncio.run(main())
+
+
+def test_shared_with_sync_user(emulator):
+    """Sync and async users of a relay-board don't take each other's responses."""
+    from relay_board_py.relay_board_async import AsyncRelayBoard
+    errors: List[Exception] = []
+
+    def sync_user(relay_board: RelayBoard) -> None:
+        try:
+            for _ in range(100):
+                results = relay_board.request_batch([("SERIAL", ""), ("HW", "")])
+                RelayBoard.raise_for_batch(results)
+                assert str(results[0]) == emulator.serial_number
+        except Exception as e:
+            errors.append(e)
+
+    async def main() -> None:
+        relay_board = AsyncRelayBoard(emulator.serial_number)
+        await relay_board.open()
+        # opening flushes the input of the (shared) pseudo-terminal: before the requests
+        sync_relay_board = RelayBoard(emulator.serial_number)
+        sync_relay_board.open()
+        thread = threading.Thread(target=sync_user, args=(sync_relay_board,))
+        thread.start()
+        try:
+            for _ in range(100):
+                results = await relay_board.request_batch([("FW", ""), ("GET", "")])
+                RelayBoard.raise_for_batch(results)
+                RelayBoard.parse_relay_state(str(results[1]))
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            sync_relay_board.close()
+            await relay_board.close()
+
+    asyncio.run(main())
+    assert errors == []
+
+
+def test_lock_polled(emulator):
+    """An AsyncDevice waits for the port lock in turn, without blocking the loop."""
+    from relay_board_py.relay_board_async import AsyncRelayBoard
+    device = Device.by_serial_number(emulator.serial_number[4:12])
+    port_lock = device.get_port_lock()
+
+    async def main() -> None:
+        relay_board = AsyncRelayBoard(emulator.serial_number)
+        await relay_board.open()
+        try:
+            device.lock()
+            with pytest.raises(SerialInterfaceException, match="timeout"):
+                await relay_board.serial_device.lock(0.05)
+            # a request cancelled while waiting for the lock gives up its turn
+            task = asyncio.ensure_future(relay_board.request("SERIAL"))
+            await asyncio.sleep(0.05)
+            assert len(port_lock.queue) == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert len(port_lock.queue) == 0
+            task = asyncio.ensure_future(relay_board.request("SERIAL"))
+            await asyncio.sleep(0.05)
+            device.unlock()
+            assert await task == emulator.serial_number
+            assert port_lock.owner is None
+        finally:
+            await relay_board.close()
+
+    asyncio.run(main())
+
+
+def test_open_failure_closes_port(emulator, monkeypatch):
+    """A relay-board which isn't ready is closed again."""
+    from relay_board_py.relay_board_async import AsyncRelayBoard
+
+    async def wait_ready(self) -> float:
+        raise RelayBoardTimeoutException("not ready")
+
+    monkeypatch.setattr(AsyncRelayBoard, "wait_ready", wait_ready)
+    relay_board = AsyncRelayBoard(emulator.serial_number)
+    with pytest.raises(RelayBoardTimeoutException):
+        asyncio.run(relay_board.open())
+    assert relay_board.serial_device.fd is None
+    assert not relay_board.serial_device.device.ser.is_open
+    assert relay_board.serial_device.device.get_port_lock().owner is None
@@ -0,0 +1,58 @@
+"""test_relay_board_daemon.py: RelayBoardDaemon and RelayBoardClient."""
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from relay_board_py.relay_board_session import RelayBoardSession
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="the daemon requires unix sockets")
+
+
+def test_daemon(emulator, tmp_path):
+    """Commands are forwarded to the daemon, only the user may connect."""
+    from relay_board_py.relay_board_daemon import RelayBoardClient, RelayBoardDaemon
+    socket_path = str(tmp_path / "daemon.sock")
+    daemon = RelayBoardDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        client = RelayBoardClient(socket_path, timeout=5.0)
+        deadline = time.monotonic() + 5.0
+        while (not client.is_available()):
+            assert time.monotonic() < deadline, "daemon not started"
+            time.sleep(0.01)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077 == 0
+        result = client.request({"cmd": "set", "serial_number": emulator.serial_number,
+                                 "state": {"close": [3]}, "id": 1})
+        assert result["ok"] and (result["id"] == 1) and (emulator.relays[3] == "C")
+    finally:
+        daemon.shutdown()
+        thread.join()
+    assert not os.path.exists(socket_path)
+
+
+def test_relay_boards_used_concurrently(start_emulators):
+    """A slow relay-board doesn't delay the commands of other relay-boards."""
+    slow, fast = start_emulators(2)
+    # the slow relay-board must not time out
+    session = RelayBoardSession(timeout_floor=0.5, timeout_ceiling=1.0)
+    try:
+        for emulator in [slow, fast]:
+            result = session.execute({"cmd": "info", "serial_number": emulator.serial_number})
+            assert result["ok"]
+        slow.latency = 0.3
+        results = {}
+        thread = threading.Thread(target=lambda: results.setdefault("slow", session.execute(
+            {"cmd": "get", "serial_number": slow.serial_number, "refresh": True})))
+        thread.start()
+        time.sleep(0.05)
+        result = session.execute({"cmd": "get", "serial_number": fast.serial_number,
+                                  "refresh": True})
+        assert result["ok"] and ("slow" not in results)
+        thread.join()
+        assert results["slow"]["ok"]
+    finally:
+        session.close()
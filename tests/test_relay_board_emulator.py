@@ -0,0 +1,44 @@
+"""test_relay_board_emulator.py: the firmware responses of RelayBoardEmulator."""
+import time
+
+import pytest
+
+from relay_board_py.relay_board_emulator import RelayBoardEmulator
+
+
+@pytest.mark.parametrize("request_line, response", [
+    ("RB+SERIAL", "+SERIAL=RB00EMU00007"),
+    ("RB+HW", f"+HW={RelayBoardEmulator.HARDWARE_VERSION}"),
+    ("RB+FW", f"+FW={RelayBoardEmulator.FIRMWARE_VERSION}"),
+    ("RB+GET", "+GET=1-O,2-O,3-O"),
+    ("RB+SET=2-C", "+SET"),
+    ("RB+SET=4-C", "+ERR"),
+    ("RB+SET=1-X", "+ERR"),
+    ("RB+SET=1", "+ERR"),
+    ("RB+ALL=C", "+ALL"),
+    ("RB+ALL=X", "+ERR"),
+    ("RB+FOO", "+ERR"),
+    ("FOO", None),
+])
+def test_handle(request_line: str, response: str) -> None:
+    emulator = RelayBoardEmulator("RB00EMU00007", relay_count=3)
+    assert emulator.handle(request_line) == response
+
+
+def test_handle_changes_relays() -> None:
+    emulator = RelayBoardEmulator(relay_count=3)
+    emulator.handle("RB+SET=1-C,3-C")
+    assert emulator.get_relay_state() == {"open": [2], "close": [1, 3]}
+    # an invalid entry rejects the whole request
+    emulator.handle("RB+SET=2-C,4-C")
+    assert emulator.handle("RB+GET") == "+GET=1-C,2-O,3-C"
+    emulator.press_button()
+    assert emulator.handle("RB+GET") == "+GET=1-O,2-C,3-O"
+
+
+def test_boot_ignores_requests() -> None:
+    emulator = RelayBoardEmulator()
+    emulator.boot(0.2)
+    assert emulator.handle("RB+SERIAL") is None
+    time.sleep(0.25)
+    assert emulator.handle("RB+SERIAL") == "+SERIAL=RB00EMU00001"
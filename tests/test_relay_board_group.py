@@ -0,0 +1,42 @@
+"""test_relay_board_group.py: RelayBoardGroup and synchronized commits."""
+import pytest
+
+from relay_board_py.relay_board import RelayBoardException
+from relay_board_py.relay_board_group import RelayBoardGroup
+
+
+@pytest.fixture
+def group(start_emulators):
+    """Return an opened group of two emulated relay-boards (aliases A, B)."""
+    emulators = start_emulators(2)
+    group = RelayBoardGroup({"A": emulators[0].serial_number, "B": emulators[1].serial_number})
+    group.open()
+    yield group
+    group.close()
+
+
+def test_addresses(group):
+    """Relays are addressed by alias:relay or by flat index."""
+    assert group.relay_count == 20
+    assert group.resolve("B:3") == ("B", 3)
+    assert group.resolve(13) == ("B", 3)
+    assert group.get_index("B", 3) == 13
+    for address in ["C:1", "A:11", 0, 21, "x"]:
+        with pytest.raises(RelayBoardException):
+            group.resolve(address)
+    states = group.split_state({"open": "all", "close": ["A:2", 13]})
+    assert states["A"].get_closed() == [2] and states["B"].get_closed() == [3]
+    assert len(states["A"].get_open()) == 9
+
+
+@pytest.mark.parametrize("synchronized", [False, True])
+def test_write_relay_state(group, synchronized):
+    """A group state is written with one request per relay-board."""
+    report = group.write_relay_state({"close": "all", "open": ["A:1", 20]}, verify=True,
+                                     synchronized=synchronized)
+    assert (report is not None) == synchronized
+    if (synchronized):
+        assert set(report.writes) == {"A", "B"} and (report.skew >= 0.0)
+        assert report.to_dict()["errors"] == {}
+    relays = group.read_relays(["A:1", "A:2", "B:10"], refresh=True)
+    assert relays == {"A:1": "open", "A:2": "close", "B:10": "open"}
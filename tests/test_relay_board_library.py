@@ -0,0 +1,79 @@
+"""test_relay_board_library.py: pattern library offset index and its cache."""
+import json
+import os
+
+import pytest
+
+from relay_board_py.relay_board_library import RelayBoardLibrary
+from relay_board_py.relay_board_pattern import RelayBoardPatternException
+
+
+def write_json(path, content) -> str:
+    """Write content as json file, return its path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=4)
+    return str(path)
+
+
+@pytest.fixture
+def library_file(tmp_path) -> str:
+    """Return a library including a second pattern file."""
+    write_json(tmp_path / "inc.json", {
+        "aliases": {"B": "RB00D30GR9J5"},
+        "patterns": {"P2": {"B": {"close": [2]}}, "Ü": {"B": {"open": "all"}}}})
+    return write_json(tmp_path / "main.json", {
+        "includes": ["inc.json"],
+        "aliases": {"A": "RB00D30GR9J2"},
+        "patterns": {"P1": {"A": {"close": [1], "open": [2, 3]}}},
+        "sequences": {"S1": [{"pattern": "P1"}, {"wait": 0.1}, {"pattern": "P2"}]}})
+
+
+def test_patterns_loaded_on_demand(library_file, tmp_path):
+    """Patterns are read from their offsets when used, includes share the namespace."""
+    library = RelayBoardLibrary.from_file(library_file, str(tmp_path / "cache"))
+    assert library.aliases == {"A": "RB00D30GR9J2", "B": "RB00D30GR9J5"}
+    assert sorted(library.patterns) == ["P1", "P2", "Ü"]
+    assert library.patterns.loaded == {}
+    assert library.get_pattern("P2") == {"B": {"close": [2]}}
+    assert list(library.patterns.loaded) == ["P2"]
+    assert library.patterns["Ü"] == {"B": {"open": "all"}}
+    assert library.validate() == 3
+    assert "P1" in library.patterns and "P3" not in library.patterns
+
+
+def test_index_cache_invalidated_by_change(library_file, tmp_path, monkeypatch):
+    """The cached index is used while the file is unchanged, rebuilt after a change."""
+    cache_dir = str(tmp_path / "cache")
+    RelayBoardLibrary.from_file(library_file, cache_dir)
+    index_file = RelayBoardLibrary.index_file
+    calls = []
+    monkeypatch.setattr(RelayBoardLibrary, "index_file",
+                        staticmethod(lambda *args: calls.append(args) or index_file(*args)))
+    RelayBoardLibrary.from_file(library_file, cache_dir)
+    assert calls == []
+    inc = str(tmp_path / "inc.json")
+    write_json(inc, {"aliases": {"B": "RB00D30GR9J5"},
+                     "patterns": {"P2": {"B": {"close": [7, 8]}}}})
+    os.utime(inc, ns=(1, 1))
+    library = RelayBoardLibrary.from_file(library_file, cache_dir)
+    assert len(calls) == 1
+    assert sorted(library.patterns) == ["P1", "P2"]
+    assert library.get_pattern("P2") == {"B": {"close": [7, 8]}}
+
+
+def test_invalid_pattern_found_on_use(library_file, tmp_path):
+    """An invalid pattern doesn't fail loading, but its use and validate()."""
+    write_json(tmp_path / "inc.json", {"aliases": {"B": "RB00D30GR9J5"},
+                                       "patterns": {"P2": {"B": {"close": [2]}},
+                                                    "bad": {"B": {"close": "none"}}}})
+    library = RelayBoardLibrary.from_file(library_file, str(tmp_path / "cache"))
+    assert library.get_pattern("P1") == {"A": {"close": [1], "open": [2, 3]}}
+    with pytest.raises(RelayBoardPatternException, match="bad"):
+        library.validate()
+
+
+def test_redefined_pattern(library_file, tmp_path):
+    """A pattern must not be defined in two files."""
+    write_json(tmp_path / "inc.json", {"patterns": {"P1": {"A": {"close": [1]}}}})
+    with pytest.raises(RelayBoardPatternException, match="P1 redefined"):
+        RelayBoardLibrary.from_file(library_file, str(tmp_path / "cache"))
@@ -0,0 +1,46 @@
+"""test_relay_board_pattern.py: pattern validation, RelayState patterns."""
+import pytest
+
+from relay_board_py.relay_board import RelayBoard
+from relay_board_py.relay_board_pattern import RelayBoardPattern, RelayBoardPatternException
+from relay_board_py.relay_board_plan import RelayBoardPlan
+from relay_board_py.relay_state import RelayState
+
+ALIASES = {"A": "RB00D30GR9J5"}
+
+
+@pytest.mark.parametrize("state", [
+    {"shut": [1]},
+    {"open": "none"},
+    {"open": [1.5]},
+    {"close": 1},
+    [1, 2],
+])
+def test_invalid_states(state):
+    """States must be dicts of "open"/"close" to a list of relays or "all"."""
+    with pytest.raises(RelayBoardPatternException):
+        RelayBoardPattern(ALIASES, {"P": {"A": state}})
+
+
+def test_relay_state_patterns():
+    """RelayState objects are valid states, kept as given."""
+    state = RelayState.from_dict({"close": [1, 2], "open": [3]})
+    relay_board_pattern = RelayBoardPattern(ALIASES, {"P": {"A": state}})
+    assert relay_board_pattern.get_pattern()["A"] is state
+    assert relay_board_pattern.get_relay_states()["A"] == state
+    plan = RelayBoardPlan.compile(relay_board_pattern)
+    assert plan.get_pattern("P") == {"A": {"open": [3], "close": [1, 2]}}
+    assert plan.get_commands("P")["A"].headers == ["SET"]
+
+
+def test_from_serial_number(emulator):
+    """A single relay-board pattern by open/close or RelayState."""
+    relay_board_pattern = RelayBoardPattern.from_serial_number("RB00D30GR9J5", [1], "all")
+    assert relay_board_pattern.get_pattern() == {"A": {"open": [1], "close": "all"}}
+    with pytest.raises(RelayBoardPatternException):
+        RelayBoardPattern.from_serial_number("RB00D30GR9J5", [1],
+                                             relay_state=RelayState.from_dict({"close": [2]}))
+    relay_board_pattern = RelayBoardPattern.from_serial_number(
+        emulator.serial_number, relay_state=RelayState.from_dict({"close": [2, 4]}))
+    RelayBoard.raise_for_results(RelayBoard.run_pattern(relay_board_pattern, verify=True))
+    assert [emulator.relays[relay] for relay in [1, 2, 4]] == ["O", "C", "C"]
@@ -0,0 +1,71 @@
+"""test_relay_board_plan.py: compiled pattern plans and their caches."""
+import json
+import marshal
+import os
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard, RelayBoardCommands
+from relay_board_py.relay_board_plan import RelayBoardPlan
+
+
+@pytest.fixture(autouse=True)
+def plans(monkeypatch):
+    """Give each test an empty in-process cache."""
+    monkeypatch.setattr(RelayBoardPlan, "plans", type(RelayBoardPlan.plans)())
+
+
+def write_pattern_file(path, serial_number: str = "RB00D30GR9J5", relay: int = 1) -> str:
+    """Write a pattern file of alias A, return its path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"aliases": {"A": serial_number},
+                   "patterns": {"P1": {"A": {"close": [relay, 2], "open": [2]}},
+                                "P2": {"A": {"open": "all"}}}}, f)
+    return str(path)
+
+
+def test_pattern_and_commands(tmp_path):
+    """get_pattern returns the source pattern, get_commands the compiled one."""
+    plan = RelayBoardPlan.from_file(write_pattern_file(tmp_path / "p.json"), str(tmp_path))
+    assert plan.get_pattern("P1") == {"A": {"close": [1, 2], "open": [2]}}
+    assert plan.get_relay_states("P1")["A"].get_closed() == [1]
+    commands = plan.get_commands("P1")["A"]
+    assert isinstance(commands, RelayBoardCommands) and (commands.headers == ["SET"])
+    # loaded from the disk cache: the same patterns
+    RelayBoardPlan.plans.clear()
+    cached = RelayBoardPlan.from_file(str(tmp_path / "p.json"), str(tmp_path))
+    assert cached is not plan
+    assert cached.get_pattern("P2") == {"A": {"open": "all"}}
+    assert cached.get_commands("P1")["A"].data == commands.data
+
+
+def test_in_process_cache_is_bounded(tmp_path, monkeypatch):
+    """The least recently used plans are dropped."""
+    monkeypatch.setattr(RelayBoardPlan, "CACHE_SIZE", 2)
+    files = [write_pattern_file(tmp_path / f"p{i}.json", relay=i + 1) for i in range(3)]
+    first = RelayBoardPlan.from_file(files[0], str(tmp_path))
+    RelayBoardPlan.from_file(files[1], str(tmp_path))
+    assert RelayBoardPlan.from_file(files[0], str(tmp_path)) is first
+    RelayBoardPlan.from_file(files[2], str(tmp_path))
+    assert len(RelayBoardPlan.plans) == 2
+    assert first.digest in RelayBoardPlan.plans
+
+
+def test_failed_save_removes_temporary_file(tmp_path, monkeypatch):
+    """A plan which can't be written leaves nothing in the cache directory."""
+    def dump(data, f) -> None:
+        f.write(b"partial")
+        raise ValueError("unmarshallable object")
+
+    monkeypatch.setattr(marshal, "dump", dump)
+    cache_dir = tmp_path / "cache"
+    RelayBoardPlan.from_file(write_pattern_file(tmp_path / "p.json"), str(cache_dir))
+    assert os.listdir(cache_dir) == []
+
+
+def test_run_pattern(emulator, tmp_path):
+    """Compiled patterns are written like the source patterns."""
+    plan = RelayBoardPlan.from_file(
+        write_pattern_file(tmp_path / "p.json", emulator.serial_number), str(tmp_path))
+    RelayBoard.raise_for_results(RelayBoard.run_pattern(plan, "P1", verify=True))
+    assert [emulator.relays[relay] for relay in [1, 2, 3]] == ["C", "O", "O"]
@@ -0,0 +1,30 @@
+"""test_relay_board_session.py: RelayBoardSession (stream and daemon commands)."""
+import json
+
+from relay_board_py.relay_board_session import RelayBoardSession
+
+
+def test_commands_keep_relay_board_open(emulator):
+    """Invalid commands keep the relay-board open, a failed port drops it."""
+    session = RelayBoardSession()
+    serial_number = emulator.serial_number
+    try:
+        result = session.execute({"cmd": "set", "serial_number": serial_number,
+                                  "state": {"close": [1]}, "id": 7})
+        assert result["ok"] and (result["id"] == 7) and (emulator.relays[1] == "C")
+        relay_board = session.relay_boards[serial_number]
+        for state in [{"close": [42]}, {"shut": [1]}]:
+            result = session.execute({"cmd": "set", "serial_number": serial_number,
+                                      "state": state})
+            assert not result["ok"]
+            assert session.relay_boards[serial_number] is relay_board
+        result = json.loads(session.execute_json(
+            json.dumps({"cmd": "get", "serial_number": serial_number})))
+        assert result["state"]["close"] == [1]
+        emulator.stop()
+        result = session.execute({"cmd": "set", "serial_number": serial_number,
+                                  "state": {"close": [2]}})
+        assert not result["ok"]
+        assert serial_number not in session.relay_boards
+    finally:
+        session.close()
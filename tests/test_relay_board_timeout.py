@@ -0,0 +1,93 @@
+"""test_relay_board_timeout.py: AdaptiveTimeout and the retries of RelayBoard."""
+import time
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard, RelayBoardTimeoutException
+from relay_board_py.relay_board_timeout import AdaptiveTimeout, AdaptiveTimeoutException
+
+
+def test_ceiling_without_measurements():
+    """Without round trips the ceiling is used."""
+    timeout = AdaptiveTimeout(0.01, 0.5)
+    assert timeout.get() == 0.5
+    assert timeout.to_dict()["p50"] is None
+
+
+def test_follows_round_trips():
+    """FACTOR times the maximum (few samples) or the percentile, bounded by floor/ceiling."""
+    timeout = AdaptiveTimeout(0.01, 0.5)
+    timeout.record(0.02)
+    assert timeout.get() == pytest.approx(0.02 * AdaptiveTimeout.FACTOR)
+    timeout.record(0.001)
+    assert timeout.get() == pytest.approx(0.02 * AdaptiveTimeout.FACTOR)
+    for _ in range(AdaptiveTimeout.SAMPLES):
+        timeout.record(0.001)
+    # the outlier dropped out of the window
+    assert timeout.get() == 0.01
+    for _ in range(AdaptiveTimeout.SAMPLES):
+        timeout.record(1.0)
+    assert timeout.get() == 0.5
+    assert timeout.to_dict()["samples"] == AdaptiveTimeout.SAMPLES
+
+
+def test_percentile():
+    """Nearest rank percentile of sorted samples."""
+    samples = [float(i) for i in range(1, 101)]
+    assert AdaptiveTimeout.get_percentile(samples, 0.5) == 50.0
+    assert AdaptiveTimeout.get_percentile(samples, 0.99) == 99.0
+    assert AdaptiveTimeout.get_percentile(samples, 1.0) == 100.0
+    assert AdaptiveTimeout.get_percentile([3.0], 0.0) == 3.0
+
+
+def test_bounds():
+    """0 < floor <= ceiling is required, configure recomputes the timeout."""
+    with pytest.raises(AdaptiveTimeoutException):
+        AdaptiveTimeout(0.0, 1.0)
+    with pytest.raises(AdaptiveTimeoutException):
+        AdaptiveTimeout(0.5, 0.1)
+    timeout = AdaptiveTimeout(0.01, 0.5)
+    timeout.configure(ceiling=0.2)
+    assert timeout.get() == 0.2
+    with pytest.raises(AdaptiveTimeoutException):
+        timeout.configure(floor=0.3)
+
+
+def test_shared_by_serial_number():
+    """RelayBoard objects of a relay-board share their AdaptiveTimeout."""
+    timeout = AdaptiveTimeout.by_serial_number("RB00TEST0001")
+    assert AdaptiveTimeout.by_serial_number("RB00TEST0001") is timeout
+    assert AdaptiveTimeout.by_serial_number("RB00TEST0002") is not timeout
+
+
+def test_retry_backoff():
+    """A retry waits BACKOFF times longer, bounded by the ceiling."""
+    timeout = AdaptiveTimeout(0.01, 0.5)
+    assert timeout.get_retry(0.05) == pytest.approx(0.05 * AdaptiveTimeout.BACKOFF)
+    assert timeout.get_retry(0.4) == 0.5
+    assert timeout.get_retry(0.8) == 0.8
+
+
+def test_explicit_timeout_kept_by_retry(start_emulators):
+    """Retries of a request with an explicit timeout don't wait for the ceiling."""
+    emulator = start_emulators(1, 0.3)[0]
+    relay_board = RelayBoard(emulator.serial_number)
+    relay_board.hardware.open()
+    try:
+        start = time.monotonic()
+        with pytest.raises(RelayBoardTimeoutException):
+            relay_board.request("SERIAL", timeout=0.05)
+        assert time.monotonic() - start < 0.25
+    finally:
+        relay_board.close()
+
+
+def test_cli_bounds_per_relay_board(emulator):
+    """--timeout-floor/--timeout-ceiling configure the used relay-boards, not the defaults."""
+    RelayBoard.main(["-s", emulator.serial_number, "-c", "1", "--no-daemon",
+                     "--timeout-floor", "0.02", "--timeout-ceiling", "0.3"])
+    timeout = AdaptiveTimeout.by_serial_number(emulator.serial_number)
+    assert (timeout.floor, timeout.ceiling) == (0.02, 0.3)
+    assert (AdaptiveTimeout.FLOOR, AdaptiveTimeout.CEILING) == (0.05, 0.5)
+    assert AdaptiveTimeout().ceiling == 0.5
+    timeout.configure(AdaptiveTimeout.FLOOR, AdaptiveTimeout.CEILING)
@@ -0,0 +1,69 @@
+"""test_relay_state.py: RelayState bit logic."""
+import pytest
+
+from relay_board_py.relay_state import RelayState, RelayStateException
+
+
+def test_from_dict_applies_keys_in_order():
+    """A later key overrides an earlier one, "all" requires all_mask."""
+    state = RelayState.from_dict({"close": [1, 2, 3], "open": [2]})
+    assert state.to_dict() == {"open": [2], "close": [1, 3]}
+    state = RelayState.from_dict({"open": "all", "close": [10]}, RelayState.get_mask(10))
+    assert state.get_open() == list(range(1, 10)) and state.get_closed() == [10]
+    with pytest.raises(RelayStateException):
+        RelayState.from_dict({"open": "all"})
+    with pytest.raises(RelayStateException):
+        RelayState.from_dict({"shut": [1]})
+    with pytest.raises(RelayStateException):
+        RelayState.from_dict({"close": [0]})
+
+
+def test_mapping_and_equality():
+    """RelayState reads like the dict form, is hashable and immutable."""
+    state = RelayState.from_dict({"close": [1, 7], "open": [2]})
+    assert dict(state) == {"open": [2], "close": [1, 7]}
+    assert state == {"open": [2], "close": [7, 1]}
+    assert state != {"open": [1]}
+    assert len({state, RelayState.from_relays({1: "close", 2: "open", 7: "close"})}) == 1
+    assert state.to_relays() == {1: "close", 2: "open", 7: "close"}
+    assert state.get_relay(2) == "open" and state.get_relay(3) is None
+    with pytest.raises(AttributeError):
+        state.mask = 0
+
+
+def test_union_diff_issubset():
+    """union applies on top, diff is what changes, issubset compares values."""
+    current = RelayState.from_dict({"close": [1, 2], "open": [3]})
+    target = RelayState.from_dict({"close": [2, 3], "open": [4]})
+    assert (current | target).to_dict() == {"open": [4], "close": [1, 2, 3]}
+    assert current.diff(target).to_dict() == {"open": [4], "close": [3]}
+    assert current.diff(current) == RelayState()
+    assert not target.issubset(current)
+    assert RelayState.from_dict({"close": [2]}).issubset(current)
+    assert not RelayState.from_dict({"open": [2]}).issubset(current)
+
+
+def test_requests():
+    """A state is written by one SET request, or ALL if it sets a whole relay-board."""
+    all_mask = RelayState.get_mask(10)
+    assert RelayState().to_requests(all_mask) == []
+    state = RelayState.from_dict({"close": [1], "open": [3]})
+    assert state.to_set_payload() == "1-C,3-O"
+    assert state.to_requests(all_mask) == [("SET", "1-C,3-O")]
+    assert RelayState(all_mask, all_mask).to_requests(all_mask) == [("ALL", "C")]
+    assert RelayState(all_mask, 0).to_requests(all_mask) == [("ALL", "O")]
+    assert RelayState(all_mask, 1).to_requests(all_mask)[0][0] == "SET"
+    assert RelayState(all_mask, 0).to_requests()[0][0] == "SET"
+
+
+@pytest.mark.parametrize("payload", ["1-O,2-C,10-C", "1-C"])
+def test_parse(payload):
+    """GET payloads are parsed back to their SET payload."""
+    assert RelayState.parse(payload).to_set_payload() == payload
+
+
+@pytest.mark.parametrize("payload", ["", "1-X", "1-c", "1O", "0-C", "a-C", "-C", "1-C,", "1-O,2"])
+def test_parse_invalid(payload):
+    """Anything but <relay>-O/<relay>-C is rejected."""
+    with pytest.raises(RelayStateException):
+        RelayState.parse(payload)
@@ -0,0 +1,179 @@
+"""test_serial_interface.py: PortLock and the background reader of Device."""
+import os
+import threading
+import time
+from typing import List
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard
+from relay_board_py.serial_interface import Device, PortLock, SerialInterfaceException
+
+
+def wait_for(condition, timeout: float = 2.0) -> None:
+    """Wait until condition() is true."""
+    deadline = time.monotonic() + timeout
+    while (not condition()):
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.001)
+
+
+def test_port_lock_reentrant():
+    """The owner may acquire again, others wait until every acquisition is released."""
+    port_lock = PortLock.get("/tmp/test-port-lock-reentrant")
+    assert PortLock.get("/tmp/test-port-lock-reentrant") is port_lock
+    port_lock.acquire()
+    port_lock.acquire()
+    assert port_lock.count == 2
+    port_lock.release()
+    errors: List[Exception] = []
+
+    def other() -> None:
+        try:
+            port_lock.acquire(timeout=0.05)
+        except SerialInterfaceException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    port_lock.release()
+    thread = threading.Thread(target=lambda: (port_lock.acquire(timeout=1.0),
+                                              port_lock.release()))
+    thread.start()
+    thread.join()
+    assert (port_lock.owner is None) and (port_lock.count == 0)
+
+
+def test_port_lock_fifo():
+    """Waiting threads get the lock in arrival order."""
+    port_lock = PortLock.get("/tmp/test-port-lock-fifo")
+    port_lock.acquire()
+    order: List[int] = []
+    threads = []
+    for i in range(8):
+        def waiter(i: int = i) -> None:
+            waited = port_lock.acquire(timeout=5.0)
+            assert waited > 0.0
+            order.append(i)
+            port_lock.release()
+        threads.append(threading.Thread(target=waiter))
+        threads[-1].start()
+        wait_for(lambda: len(port_lock.queue) == i + 1)
+    port_lock.release()
+    for thread in threads:
+        thread.join()
+    assert order == list(range(8))
+
+
+def test_port_lock_flock(emulator):
+    """The flock serializes handles of the port like other processes."""
+    fds = [os.open(emulator.port, os.O_RDWR | os.O_NOCTTY) for _ in range(2)]
+    try:
+        # a PortLock of its own, as in another process
+        mine = PortLock(emulator.port)
+        other = PortLock(emulator.port)
+        mine.acquire(fds[0])
+        with pytest.raises(SerialInterfaceException, match="another process"):
+            other.acquire(fds[1], timeout=0.05)
+        assert other.owner is None
+        mine.release()
+        other.acquire(fds[1], timeout=0.5)
+        other.release()
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+
+def test_lock_drops_stale_input(emulator):
+    """Data nobody waits for is dropped when the port is locked."""
+    relay_board = RelayBoard(emulator.serial_number)
+    relay_board.open()
+    try:
+        emulator.send_frame("+LATE=1")
+        wait_for(lambda: relay_board.hardware.serial_device.ser.in_waiting > 0)
+        assert relay_board.request("SERIAL") == emulator.serial_number
+    finally:
+        relay_board.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="the reader requires posix")
+def test_reader_passes_every_frame(emulator):
+    """Regression: the reader stopped after READER_EMPTY_LIMIT unsolicited frames."""
+    relay_board = RelayBoard(emulator.serial_number)
+    relay_board.open()
+    frames: List[str] = []
+    relay_board.subscribe(lambda event: frames.append(event.frame))
+    try:
+        count = Device.READER_EMPTY_LIMIT + 50
+        for i in range(count):
+            emulator.send_frame(f"+F={i}")
+            time.sleep(0.001)
+        wait_for(lambda: len(frames) >= count)
+        assert frames == [f"+F={i}" for i in range(count)]
+        reader = relay_board.hardware.serial_device.reader
+        assert (reader is not None) and reader.is_alive()
+        # requests still get their responses
+        assert relay_board.request("SERIAL") == emulator.serial_number
+    finally:
+        relay_board.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="the reader requires posix")
+def test_reader_restarts_after_exit(emulator):
+    """A reader stopped by itself reports an error and is started again by subscribe."""
+    relay_board = RelayBoard(emulator.serial_number)
+    relay_board.open()
+    events = []
+    relay_board.subscribe(events.append)
+    device = relay_board.hardware.serial_device
+    try:
+        # exit without stop_reader, as if the port failed
+        os.write(device.reader_wakeup[1], b"x")
+        wait_for(lambda: device.reader is None)
+        assert device.reader_wakeup is None
+        assert [event.kind for event in events] == ["error"]
+        relay_board.subscribe(events.append)
+        assert device.reader is not None
+        emulator.send_frame("+AGAIN")
+        wait_for(lambda: any(event.kind == "frame" for event in events))
+    finally:
+        relay_board.close()
+    assert device.reader is None
+
+
+def test_port_lock_try_acquire():
+    """Polling waiters keep their turn by a token, owners may be other than threads."""
+    port_lock = PortLock.get("/tmp/test-port-lock-try-acquire")
+    first, second, third = object(), object(), object()
+    assert port_lock.try_acquire(owner=first)
+    assert port_lock.try_acquire(owner=first) and (port_lock.count == 2)
+    assert not port_lock.try_acquire(owner=second)
+    token = port_lock.enqueue()
+    port_lock.release(first)
+    port_lock.release(first)
+    assert not port_lock.try_acquire(owner=third)
+    assert port_lock.try_acquire(owner=second, token=token)
+    assert len(port_lock.queue) == 0
+    with pytest.raises(SerialInterfaceException):
+        port_lock.release()
+    port_lock.release(second)
+    # a waiter giving up lets the next one go first
+    token = port_lock.enqueue()
+    port_lock.dequeue(token)
+    assert port_lock.try_acquire(owner=third)
+    port_lock.release(third)
+
+
+def test_read_frame_after_deadline(emulator):
+    """Regression: a frame received in time was dropped if read after the deadline."""
+    device = Device.by_serial_number(emulator.serial_number[4:12]).copy()
+    device.open()
+    try:
+        emulator.send_frame("+LATE=1")
+        wait_for(lambda: device.ser.in_waiting > 0)
+        assert device.read_frame(time.monotonic() - 1.0) == b"+LATE=1\n"
+        assert device.read_frame(time.monotonic() - 1.0) == b""
+    finally:
+        device.close()
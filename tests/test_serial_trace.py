@@ -0,0 +1,87 @@
+"""test_serial_trace.py: trace file format, recording and replay."""
+import os
+from typing import Any, List
+
+import pytest
+
+from relay_board_py.relay_board import RelayBoard
+from relay_board_py.serial_interface import Device, device_registry
+from relay_board_py.serial_trace import (ReplayDevice, SerialTrace, SerialTraceException,
+                                         SerialTraceWriter)
+
+
+def test_round_trip(tmp_path):
+    """Records are read back in order, a truncated last record is ignored."""
+    file = str(tmp_path / "t.rbtrace")
+    writer = SerialTraceWriter(file, "/dev/ttyUSB0", "D30GR9J5")
+    writer.record(SerialTrace.WRITE, b"RB+GET\n")
+    writer.record(SerialTrace.READ, b"+GET=1-O\n")
+    writer.record(SerialTrace.RTS, b"\x01")
+    writer.record(SerialTrace.FLUSH)
+    writer.close()
+    records = SerialTrace.read_file(file)
+    assert SerialTrace.get_info(records)["serial_number"] == "D30GR9J5"
+    assert [(kind, data) for (kind, timestamp, data) in records[1:]] == [
+        (b"W", b"RB+GET\n"), (b"R", b"+GET=1-O\n"), (b"r", b"\x01"), (b"F", b"")]
+    timestamps = [timestamp for (kind, timestamp, data) in records]
+    assert timestamps == sorted(timestamps)
+    assert "write" in SerialTrace.format_record(records[1])
+    with open(file, "rb+") as f:
+        f.truncate(os.path.getsize(file) - 1)
+    assert len(SerialTrace.read_file(file)) == len(records) - 1
+    with open(file, "wb") as f:
+        f.write(b"garbage")
+    with pytest.raises(SerialTraceException):
+        SerialTrace.read_file(file)
+
+
+def test_main(tmp_path, caplog):
+    """The trace dump is logged by the module_logger."""
+    file = str(tmp_path / "t.rbtrace")
+    writer = SerialTraceWriter(file, "/dev/ttyUSB0", "D30GR9J5")
+    writer.record(SerialTrace.WRITE, b"RB+GET\n")
+    writer.close()
+    with caplog.at_level("INFO", logger="serial_trace.py"):
+        SerialTrace.main([file])
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0].startswith(f"{file}: ") and messages[0].endswith(", 2 records")
+    assert "RB+GET" in messages[1]
+
+
+def run(serial_number: str) -> List[Any]:
+    """Open, reset, write and read a relay-board, return what was read."""
+    relay_board = RelayBoard(serial_number)
+    relay_board.open()
+    try:
+        relay_board.reset()
+        results: List[Any] = [relay_board.read_info()]
+        for relay in range(1, 11):
+            relay_board.write_relay_state({"close": [relay], "open": [relay % 10 + 1]})
+            results.append(relay_board.read_relay_state().to_dict())
+        results.append(relay_board.request("FW"))
+        return results
+    finally:
+        relay_board.close()
+
+
+def test_record_and_replay(emulator, tmp_path, monkeypatch):
+    """A replay returns the recorded responses without the relay-board."""
+    monkeypatch.setattr(Device, "trace_dir", str(tmp_path))
+    recorded = run(emulator.serial_number)
+    monkeypatch.setattr(Device, "trace_dir", None)
+    emulator.stop()
+    files = os.listdir(str(tmp_path))
+    assert len(files) == 1
+    file = str(tmp_path / files[0])
+    try:
+        ReplayDevice.from_file(file, 0.0).register()
+        assert run(emulator.serial_number) == recorded
+        # the requests must match the recording
+        ReplayDevice.from_file(file, 0.0).register()
+        relay_board = RelayBoard(emulator.serial_number)
+        relay_board.open()
+        relay_board.reset()
+        with pytest.raises(SerialTraceException, match="diverged"):
+            relay_board.request("HW")
+    finally:
+        device_registry.unregister(emulator.serial_number[4:12])